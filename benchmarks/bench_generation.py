@@ -0,0 +1,227 @@
+"""Offline benchmark: end-to-end plan generation against a stubbed LLM.
+
+Usage:
+    python benchmarks/bench_generation.py [--requests 40] [--concurrency 8] [--latency 0.05]
+        [--jitter 0.02] [--tokens-per-second 0] [--error-rate 0] [--rate-limit-rate 0]
+        [--replay recording.jsonl] [--json results.json] [--baseline baseline.json]
+
+Runs MealPlanner with llm_backends.StubLLM, so it needs no GROQ_API_KEY or network, and
+reports throughput and p50/p95/p99 latency for daily plans (uncached and cached), weekly
+plans in both generation modes, and a BatchRunner cohort, plus decode cost for payloads of
+increasing size. Simulated latency and errors come from a seeded generator, so runs are
+comparable. With --baseline, exits non-zero when a scenario's p95 latency, throughput or
+decode time is worse than the baseline by more than --max-regression, so CI can catch
+regressions in concurrency, caching and parsing.
+"""
+from typing import Callable, Dict, List
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from user_profile import UserProfile, ActivityLevel, DietaryPreference, HealthGoal, MealFrequency
+from meal_models import Meal, DailyMealPlan, WeeklyMealPlan
+from meal_planner import MealPlanner, WeeklyGenerationMode
+from plan_cache import LRUPlanCache
+from plan_decoder import decode_plan
+from meal_prompts import render_meal_plan_prompt, render_meal_prompt
+from batch import BatchRunner
+from rate_limit import RateLimiter
+from metrics import Metrics
+from llm_backends import StubLLM, load_recording, synthetic_response
+
+GENDERS = ("Male", "Female")
+FREQUENCIES = (MealFrequency.THREE_MEALS, MealFrequency.FIVE_MEALS, MealFrequency.INTERMITTENT_FASTING)
+
+
+def make_profiles(count: int) -> List[UserProfile]:
+    """Distinct, deterministic profiles, so no two requests share a cache key"""
+    return [
+        UserProfile(
+            age=20 + i % 50,
+            gender=GENDERS[i % 2],
+            weight=55.0 + i,
+            height=160.0 + i % 30,
+            activity_level=list(ActivityLevel)[i % len(ActivityLevel)],
+            dietary_preference=list(DietaryPreference)[i % len(DietaryPreference)],
+            health_goal=list(HealthGoal)[i % len(HealthGoal)],
+            meal_frequency=FREQUENCIES[i % len(FREQUENCIES)],
+        )
+        for i in range(count)
+    ]
+
+
+def percentile(sorted_values: List[float], quantile: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * quantile // 1))
+    return sorted_values[int(rank) - 1]
+
+
+def run_requests(name: str, func: Callable, profiles: List[UserProfile], concurrency: int) -> Dict:
+    latencies: List[float] = []
+    errors = 0
+
+    def timed(profile: UserProfile) -> None:
+        nonlocal errors
+        started = time.perf_counter()
+        try:
+            func(profile)
+        except Exception:
+            errors += 1
+            return
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(timed, profiles))
+    return summarize(name, sorted(latencies), len(profiles), errors, time.perf_counter() - started)
+
+
+def summarize(name: str, latencies: List[float], requests: int, errors: int, wall_seconds: float) -> Dict:
+    result = {
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": wall_seconds,
+        "throughput_per_minute": (requests - errors) / wall_seconds * 60 if wall_seconds else 0.0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+    }
+    line = f"  {name:<22} {result['throughput_per_minute']:>9.1f}/min"
+    if latencies:
+        line += (f"  p50 {result['p50'] * 1000:>8.1f} ms  p95 {result['p95'] * 1000:>8.1f} ms  "
+                 f"p99 {result['p99'] * 1000:>8.1f} ms")
+    print(f"{line}  errors {errors}")
+    return result
+
+
+def make_planner(args, cache=None) -> MealPlanner:
+    options = dict(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second or None,
+                   error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+    llm = StubLLM(responses=load_recording(args.replay), **options) if args.replay else StubLLM(**options)
+    limiter = RateLimiter(max_concurrency=max(20, args.concurrency * 7), initial_concurrency=args.concurrency * 7,
+                          base_backoff=args.backoff, max_backoff=args.backoff * 8)
+    return MealPlanner(llm=llm, cache=cache, rate_limiter=limiter, metrics=Metrics(),
+                       retry_backoff=args.backoff)
+
+
+def bench_generation(args) -> Dict[str, Dict]:
+    profiles = make_profiles(args.requests)
+    weekly_profiles = profiles[:max(1, args.requests // 4)]
+    results = {}
+    print(f"generation (stub latency {args.latency * 1000:.0f} ms + jitter {args.jitter * 1000:.0f} ms, "
+          f"concurrency {args.concurrency})")
+
+    planner = make_planner(args)
+    results["daily"] = run_requests(
+        "daily", lambda p: planner.generate_meal_plan(p, use_cache=False), profiles, args.concurrency)
+
+    cached = make_planner(args, cache=LRUPlanCache())
+    for profile in profiles:
+        try:
+            cached.generate_meal_plan(profile)
+        except Exception:
+            pass
+    results["daily_cached"] = run_requests("daily (cache hits)", cached.generate_meal_plan, profiles, args.concurrency)
+
+    results["weekly_per_day"] = run_requests(
+        "weekly (per day)",
+        lambda p: planner.generate_weekly_meal_plan(p, mode=WeeklyGenerationMode.PER_DAY, use_cache=False),
+        weekly_profiles, args.concurrency)
+    results["weekly_single_shot"] = run_requests(
+        "weekly (single shot)",
+        lambda p: planner.generate_weekly_meal_plan(p, mode=WeeklyGenerationMode.SINGLE_SHOT, use_cache=False),
+        weekly_profiles, args.concurrency)
+
+    with tempfile.TemporaryDirectory() as directory:
+        runner = BatchRunner(make_planner(args), max_concurrency=args.concurrency, base_backoff=args.backoff,
+                             progress=lambda message: None)
+        started = time.perf_counter()
+        summary = runner.run(((str(i), profile) for i, profile in enumerate(profiles)),
+                             os.path.join(directory, "plans.jsonl"), resume=False)
+        results["batch"] = summarize("batch", [], summary.total, summary.failed, time.perf_counter() - started)
+    return results
+
+
+def bench_decoding(repeat: int) -> Dict[str, Dict]:
+    # The stub's answers to real prompts, so sizes track the response shapes the planner decodes
+    # make_profiles cycles meal frequencies: three meals first, then five
+    three_meals, five_meals = make_profiles(2)
+    targets = {"calories": 600, "protein": 40, "carbs": 60, "fats": 20}
+    cases = [
+        ("meal", render_meal_prompt(three_meals, "Lunch", targets), Meal),
+        ("daily_3_meals", render_meal_plan_prompt(three_meals), DailyMealPlan),
+        ("daily_5_meals", render_meal_plan_prompt(five_meals), DailyMealPlan),
+        ("weekly_5_meals", render_meal_plan_prompt(five_meals, weekly=True), WeeklyMealPlan),
+    ]
+    results = {}
+    print("decoding")
+    for name, prompt, plan_type in cases:
+        text = synthetic_response(prompt)
+        fenced = "```json\n" + json.dumps(json.loads(text), indent=2) + "\n```"
+        seconds = min(timeit.repeat(lambda: decode_plan(fenced, plan_type), number=repeat, repeat=3)) / repeat
+        results[f"decode_{name}"] = {"kib": len(fenced) / 1024, "seconds": seconds}
+        print(f"  {name:<22} {len(fenced) / 1024:>6.1f} KiB  {seconds * 1e6:>10.1f} us/op")
+    return results
+
+
+def regressions(results: Dict[str, Dict], baseline: Dict[str, Dict], tolerance: float) -> List[str]:
+    """Metrics worse than the baseline by more than tolerance"""
+    found = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if "seconds" in result and result["seconds"] > base["seconds"] * (1 + tolerance):
+            found.append(f"{name}: {result['seconds'] * 1e6:.1f} us/op vs {base['seconds'] * 1e6:.1f}")
+        if "p95" in result and base["p95"] and result["p95"] > base["p95"] * (1 + tolerance):
+            found.append(f"{name}: p95 {result['p95'] * 1000:.1f} ms vs {base['p95'] * 1000:.1f}")
+        if "throughput_per_minute" in result and \
+                result["throughput_per_minute"] < base["throughput_per_minute"] * (1 - tolerance):
+            found.append(f"{name}: {result['throughput_per_minute']:.1f}/min vs {base['throughput_per_minute']:.1f}")
+    return found
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40, help="daily plans per scenario (a quarter as many weeks)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.05, help="stub seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.02, help="extra uniform random latency, in seconds")
+    parser.add_argument("--tokens-per-second", type=float, default=0, help="stub completion speed; 0 for instant")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of stub calls that fail")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="share of stub calls answered with a 429")
+    parser.add_argument("--backoff", type=float, default=0.05, help="base retry/backoff delay in seconds")
+    parser.add_argument("--replay", help="JSONL recording (from llm_backends.RecordingLLM) to answer from")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--decode-repeat", type=int, default=200)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file from an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="allowed slowdown, as a fraction")
+    args = parser.parse_args()
+
+    results = bench_generation(args)
+    results.update(bench_decoding(args.decode_repeat))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            found = regressions(results, json.load(f), args.max_regression)
+        for regression in found:
+            print(f"REGRESSION {regression}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,86 @@
+"""Import-time budget for the modules the app loads at startup.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 5] [--detail 10]
+
+Imports each module in a fresh interpreter (best of --runs) and fails when one exceeds its
+budget, or when importing it pulls in the LLM stack, which must stay lazy until the first
+generation (MealPlanner.warm_up loads it in the background). Budgets are in milliseconds
+and sized with headroom over a warm-cache run; raise one only with a reason.
+"""
+from typing import List, Tuple
+import argparse
+import os
+import subprocess
+import sys
+
+SRC = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+
+# module -> budget in ms
+BUDGETS = {
+    "user_profile": 100,
+    "meal_planner": 500,
+    "jobs": 500,
+    "metrics": 100,
+}
+
+# Top-level packages that must not be imported until a plan is generated
+LAZY_PACKAGES = ("langchain", "langchain_core", "langchain_groq", "langchain_community", "groq", "httpx")
+
+_PROBE = """
+import sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+loaded = sorted({{name.split(".")[0] for name in sys.modules}} & set({lazy!r}))
+print(elapsed, ",".join(loaded))
+"""
+
+
+def measure(module: str) -> Tuple[float, List[str]]:
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, lazy=LAZY_PACKAGES)],
+        cwd=SRC, capture_output=True, text=True, check=True,
+    ).stdout.split()
+    return float(output[0]), output[1].split(",") if len(output) > 1 else []
+
+
+def heaviest(module: str, count: int) -> List[Tuple[int, str]]:
+    """(cumulative microseconds, name) of the slowest imports, from python -X importtime"""
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=SRC, capture_output=True, text=True, check=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[1].strip().isdigit():
+            rows.append((int(parts[1]), parts[2].strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--detail", type=int, default=0, help="show the N slowest imports of each module")
+    args = parser.parse_args()
+
+    failures = []
+    for module, budget in BUDGETS.items():
+        runs = [measure(module) for _ in range(args.runs)]
+        milliseconds = min(seconds for seconds, _ in runs) * 1000
+        loaded = runs[0][1]
+        status = "ok" if milliseconds <= budget and not loaded else "FAIL"
+        print(f"  {module:<14} {milliseconds:>7.1f} ms  (budget {budget} ms)  {status}")
+        if milliseconds > budget:
+            failures.append(f"{module} took {milliseconds:.0f} ms, budget {budget} ms")
+        if loaded:
+            failures.append(f"{module} imports {', '.join(loaded)} eagerly")
+        for microseconds, name in heaviest(module, args.detail) if args.detail else ():
+            print(f"      {microseconds / 1000:>7.1f} ms  {name}")
+
+    for failure in failures:
+        print(f"OVER BUDGET {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
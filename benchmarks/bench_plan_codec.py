@@ -0,0 +1,108 @@
+"""Microbenchmark: plan_codec's binary plan files against pydantic JSON.
+
+Usage:
+    python benchmarks/bench_plan_codec.py [--plans 200] [--repeat 5] [--json results.json]
+
+Builds a cohort of weekly plans (the stub LLM's answers for varied profiles, so meal names and
+ingredients repeat across days and users as real plans do) and compares plan_codec with
+model_dump_json / model_validate_json on:
+    size     the whole cohort as one plan file, as compact JSON lines and as indented JSON
+    encode   serializing the cohort
+    decode   deserializing the cohort, and one plan read from a memory-mapped file
+Every decoded plan is checked against the original.
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from user_profile import UserProfile, ActivityLevel, DietaryPreference, HealthGoal, MealFrequency
+from meal_models import WeeklyMealPlan
+from meal_prompts import render_meal_plan_prompt
+from llm_backends import synthetic_response
+from plan_codec import PlanFile, decode_plans, encode_plans, write_plan_file
+
+FREQUENCIES = (MealFrequency.THREE_MEALS, MealFrequency.FIVE_MEALS, MealFrequency.INTERMITTENT_FASTING)
+
+
+def make_plans(count: int) -> List[WeeklyMealPlan]:
+    plans = []
+    for i in range(count):
+        profile = UserProfile(age=20 + i % 50, gender=("Male", "Female")[i % 2], weight=55.0 + i % 60,
+                              height=160.0 + i % 30, activity_level=list(ActivityLevel)[i % len(ActivityLevel)],
+                              dietary_preference=list(DietaryPreference)[i % len(DietaryPreference)],
+                              health_goal=list(HealthGoal)[i % len(HealthGoal)],
+                              meal_frequency=FREQUENCIES[i % len(FREQUENCIES)])
+        response = synthetic_response(render_meal_plan_prompt(profile, weekly=True), random.Random(i))
+        plans.append(WeeklyMealPlan.model_validate_json(response))
+    return plans
+
+
+def best_time(func: Callable, repeat: int) -> float:
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=200, help="weekly plans in the cohort")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    plans = make_plans(args.plans)
+    encoded = encode_plans(plans)
+    json_lines = [plan.model_dump_json() for plan in plans]
+    if decode_plans(encoded) != plans:
+        print("FAIL decoded plans differ from the originals")
+        return 1
+
+    results: Dict[str, Dict] = {}
+    sizes = {
+        "plan_codec": len(encoded),
+        "json_lines": sum(len(line) + 1 for line in json_lines),
+        "json_indented": sum(len(plan.model_dump_json(indent=2)) + 1 for plan in plans),
+    }
+    print(f"size of {args.plans} weekly plans")
+    for name, size in sizes.items():
+        print(f"  {name:<16} {size / 1024:>9.1f} KiB  {size / sizes['plan_codec']:>5.2f}x")
+    results["size_bytes"] = sizes
+
+    timings = {
+        "encode_codec": best_time(lambda: encode_plans(plans), args.repeat),
+        "encode_json": best_time(lambda: [plan.model_dump_json() for plan in plans], args.repeat),
+        "decode_codec": best_time(lambda: decode_plans(encoded), args.repeat),
+        "decode_json": best_time(lambda: [WeeklyMealPlan.model_validate_json(line) for line in json_lines],
+                                 args.repeat),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "plans.mplan")
+        write_plan_file(path, plans)
+        middle = args.plans // 2
+        with PlanFile.open(path) as plan_file:
+            if plan_file[middle] != plans[middle]:
+                print("FAIL plan read from the memory-mapped file differs")
+                return 1
+            timings["open_mmap_read_one"] = best_time(lambda: PlanFile.open(path).close(), args.repeat) + \
+                best_time(lambda: plan_file[middle], args.repeat)
+        timings["decode_json_one"] = best_time(lambda: WeeklyMealPlan.model_validate_json(json_lines[middle]),
+                                               args.repeat)
+
+    print("time")
+    for name, seconds in timings.items():
+        print(f"  {name:<20} {seconds * 1000:>9.2f} ms")
+    results["seconds"] = timings
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
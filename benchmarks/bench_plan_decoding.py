@@ -0,0 +1,83 @@
+"""Microbenchmark: decoding LLM responses into plan models.
+
+Usage:
+    python benchmarks/bench_plan_decoding.py [--repeat 200] [--baseline-repeat 1]
+
+Compares the previous LangChain PydanticOutputParser path, pydantic's JSON mode
+(model_validate_json) and plan_decoder.decode_plan on a large
+single-shot weekly payload and on a daily payload. The LangChain parser is
+superlinear on fenced, indented responses (tens of seconds for a weekly plan),
+so it gets its own, smaller repeat count.
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from langchain.output_parsers import PydanticOutputParser
+
+from meal_models import DailyMealPlan, WeeklyMealPlan
+from plan_decoder import decode_plan, extract_json, orjson
+
+MEAL_TYPES = ["Breakfast", "Morning Snack", "Lunch", "Afternoon Snack", "Dinner"]
+
+
+def make_meal(day: int, meal_type: str) -> dict:
+    return {
+        "name": f"Day {day + 1} {meal_type} bowl with roasted vegetables",
+        "meal_type": meal_type,
+        "ingredients": [f"{grams} g ingredient {i}" for i, grams in enumerate(range(40, 400, 30))],
+        "instructions": [f"Step {i}: prepare and combine the ingredients carefully" for i in range(1, 9)],
+        "nutrition": {"calories": 512.5, "protein": 31.2, "carbs": 55.8, "fats": 17.4},
+        "prep_time": 25,
+    }
+
+
+def make_day(day: int) -> dict:
+    meals = [make_meal(day, meal_type) for meal_type in reversed(MEAL_TYPES)]
+    return {
+        "meals": meals,
+        "total_calories": 2562.5,
+        "total_protein": 156.0,
+        "total_carbs": 279.0,
+        "total_fats": 87.0,
+    }
+
+
+def fenced(payload: dict) -> str:
+    # LLMs commonly wrap their JSON in a markdown fence
+    return "```json\n" + json.dumps(payload, indent=2) + "\n```"
+
+
+def bench(label: str, func, repeat: int, rounds: int = 3) -> float:
+    seconds = min(timeit.repeat(func, number=repeat, repeat=rounds)) / repeat
+    print(f"  {label:<34} {seconds * 1e6:>10.1f} us/op")
+    return seconds
+
+
+def run_case(name: str, text: str, plan_type, repeat: int, baseline_repeat: int) -> None:
+    print(f"{name} ({len(text) / 1024:.1f} KiB)")
+    parser = PydanticOutputParser(pydantic_object=plan_type)
+    baseline = bench("PydanticOutputParser.parse", lambda: parser.parse(text), baseline_repeat, rounds=1)
+    bench("model_validate_json", lambda: plan_type.model_validate_json(extract_json(text)), repeat)
+    fast = bench("decode_plan", lambda: decode_plan(text, plan_type), repeat)
+    print(f"  speedup vs PydanticOutputParser: {baseline / fast:.1f}x")
+    assert decode_plan(text, plan_type) == parser.parse(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--baseline-repeat", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"JSON backend: {'orjson' if orjson is not None else 'json'}")
+    run_case("weekly", fenced({"daily_plans": [make_day(day) for day in range(7)]}), WeeklyMealPlan, args.repeat, args.baseline_repeat)
+    run_case("daily", fenced(make_day(0)), DailyMealPlan, args.repeat, args.baseline_repeat)
+
+
+if __name__ == "__main__":
+    main()
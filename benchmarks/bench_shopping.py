@@ -0,0 +1,97 @@
+"""Microbenchmark: shopping lists and batch-prep tasks for a cohort of weekly plans.
+
+Usage:
+    python benchmarks/bench_shopping.py [--plans 1000] [--repeat 5] [--json results.json]
+
+Builds weekly plans from the local recipe engine (meals repeat across days and users, as served
+plans do) and from the stub LLM (almost every meal distinct), then times shopping_list and
+batch_prep over each cohort:
+    cold    parse caches cleared first, so every distinct line and meal is parsed once
+    warm    caches filled, the steady state of a long-running export
+"""
+from typing import Callable, Dict, List
+import argparse
+import json
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from user_profile import UserProfile, ActivityLevel, DietaryPreference, HealthGoal, MealFrequency
+from meal_models import WeeklyMealPlan
+from meal_prompts import render_meal_plan_prompt
+from llm_backends import synthetic_response
+from recipe_engine import RecipeEngine
+import shopping
+from shopping import batch_prep, shopping_list
+
+FREQUENCIES = (MealFrequency.THREE_MEALS, MealFrequency.FIVE_MEALS, MealFrequency.INTERMITTENT_FASTING)
+# Diets the bundled catalog can fill every slot for
+DIETS = (DietaryPreference.NONE, DietaryPreference.VEGETARIAN, DietaryPreference.MEDITERRANEAN)
+
+
+def make_profile(i: int) -> UserProfile:
+    return UserProfile(age=20 + i % 50, gender=("Male", "Female")[i % 2], weight=55.0 + i % 60,
+                       height=160.0 + i % 30, activity_level=list(ActivityLevel)[i % len(ActivityLevel)],
+                       dietary_preference=DIETS[i % len(DIETS)], health_goal=list(HealthGoal)[i % len(HealthGoal)],
+                       meal_frequency=FREQUENCIES[i % len(FREQUENCIES)])
+
+
+def make_cohorts(count: int) -> Dict[str, List[WeeklyMealPlan]]:
+    engine = RecipeEngine()
+    profiles = [make_profile(i) for i in range(count)]
+    return {
+        "recipe_engine": [engine.generate_weekly_plan(profile) for profile in profiles],
+        "stub_llm": [WeeklyMealPlan.model_validate_json(
+            synthetic_response(render_meal_plan_prompt(profile, weekly=True), random.Random(i)))
+            for i, profile in enumerate(profiles)],
+    }
+
+
+def clear_caches() -> None:
+    shopping.parse_ingredient.cache_clear()
+    shopping._parse_meal.cache_clear()
+    shopping._instruction_action.cache_clear()
+
+
+def export(plans: List[WeeklyMealPlan]) -> None:
+    for plan in plans:
+        shopping_list(plan)
+        batch_prep(plan)
+
+
+def best_time(func: Callable, repeat: int, setup: Callable = None) -> float:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        times.append(timeit.timeit(func, number=1))
+    return min(times)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--plans", type=int, default=1000, help="weekly plans per cohort")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    print(f"{'cohort':<16} {'pass':<6} {'plans/s':>10} {'us/plan':>9}")
+    for name, plans in make_cohorts(args.plans).items():
+        for label, setup in (("cold", clear_caches), ("warm", None)):
+            seconds = best_time(lambda: export(plans), args.repeat, setup)
+            results[f"{name}_{label}"] = {"plans_per_second": len(plans) / seconds,
+                                          "us_per_plan": seconds / len(plans) * 1e6}
+            print(f"{name:<16} {label:<6} {len(plans) / seconds:>10.0f} {seconds / len(plans) * 1e6:>9.1f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+"""Nutrition analytics over daily and weekly plans.
+
+Plans are flattened once into a meal x nutrient matrix; day and plan totals, deviations from
+the profile's targets, adherence scores and checks of the LLM's stated totals are then a few
+vectorized NumPy passes, whether over one week or a batch of thousands.
+"""
+from typing import Dict, List, Optional, Sequence, Union
+from dataclasses import dataclass
+
+import numpy as np
+
+from user_profile import UserProfile
+from profile_batch import UserProfileBatch
+from meal_models import TOTAL_FIELDS, DailyMealPlan, WeeklyMealPlan
+
+NUTRIENTS = tuple(TOTAL_FIELDS.values())
+
+# A stated total is wrong when it differs from the sum of its meals by more than both of these
+TOTAL_MISMATCH_RTOL = 0.05
+TOTAL_MISMATCH_ATOL = 1.0
+
+Plan = Union[DailyMealPlan, WeeklyMealPlan]
+
+
+@dataclass
+class NutritionMatrix:
+    """Meal x nutrient values of one or more plans, with the index arrays to group them by day and plan"""
+    values: np.ndarray          # (meals, nutrients), in NUTRIENTS order; missing values are 0 like sum_totals
+    meal_types: List[str]       # per meal
+    day_starts: np.ndarray      # (days,) index of each day's first meal
+    stated_totals: np.ndarray   # (days, nutrients) the plans' total_* fields
+    plan_starts: np.ndarray     # (plans,) index of each plan's first day
+    day_plan: np.ndarray        # (days,) plan each day belongs to
+    day_numbers: np.ndarray     # (days,) position of each day in its plan
+
+    @classmethod
+    def from_plans(cls, plans: Sequence[Plan]) -> "NutritionMatrix":
+        """Flatten plans; a daily plan counts as a one-day week"""
+        rows, meal_types, day_starts, stated, plan_starts = [], [], [], [], []
+        for plan in plans:
+            plan_starts.append(len(day_starts))
+            for daily_plan in plan.daily_plans if isinstance(plan, WeeklyMealPlan) else (plan,):
+                day_starts.append(len(rows))
+                stated.append([getattr(daily_plan, total) for total in TOTAL_FIELDS])
+                for meal in daily_plan.meals:
+                    rows.append([meal.nutrition.get(nutrient, 0.0) for nutrient in NUTRIENTS])
+                    meal_types.append(meal.meal_type)
+        plan_starts = np.array(plan_starts, dtype=np.int64)
+        days_per_plan = np.diff(np.append(plan_starts, len(day_starts)))
+        day_plan = np.repeat(np.arange(len(plan_starts)), days_per_plan)
+        return cls(
+            values=np.array(rows, dtype=np.float64).reshape(len(rows), len(NUTRIENTS)),
+            meal_types=meal_types,
+            day_starts=np.array(day_starts, dtype=np.int64),
+            stated_totals=np.array(stated, dtype=np.float64).reshape(len(day_starts), len(NUTRIENTS)),
+            plan_starts=plan_starts,
+            day_plan=day_plan,
+            day_numbers=np.arange(len(day_starts)) - np.repeat(plan_starts, days_per_plan),
+        )
+
+    @property
+    def num_plans(self) -> int:
+        return len(self.plan_starts)
+
+    @property
+    def days_per_plan(self) -> np.ndarray:
+        return np.diff(np.append(self.plan_starts, len(self.day_starts)))
+
+    def day_totals(self) -> np.ndarray:
+        """(days, nutrients) sums of each day's meals"""
+        if not len(self.day_starts):
+            return np.zeros((0, len(NUTRIENTS)))
+        return np.add.reduceat(self.values, self.day_starts, axis=0)
+
+    def plan_totals(self, day_totals: Optional[np.ndarray] = None) -> np.ndarray:
+        """(plans, nutrients) sums over each plan's days"""
+        if day_totals is None:
+            day_totals = self.day_totals()
+        if not len(self.plan_starts):
+            return np.zeros((0, len(NUTRIENTS)))
+        return np.add.reduceat(day_totals, self.plan_starts, axis=0)
+
+    def total_mismatches(self, day_totals: Optional[np.ndarray] = None, rtol: float = TOTAL_MISMATCH_RTOL,
+                         atol: float = TOTAL_MISMATCH_ATOL) -> np.ndarray:
+        """(days, nutrients) True where a stated total_* value disagrees with the sum of the meals"""
+        if day_totals is None:
+            day_totals = self.day_totals()
+        return np.abs(self.stated_totals - day_totals) > np.maximum(atol, rtol * np.abs(day_totals))
+
+
+def target_matrix(profiles: Union[UserProfile, Sequence[UserProfile]], num_plans: int) -> np.ndarray:
+    """(plans, nutrients) daily targets, from one profile for every plan or one profile per plan"""
+    profiles = [profiles] if isinstance(profiles, UserProfile) else list(profiles)
+    if len(profiles) not in (1, num_plans):
+        raise ValueError("Pass one profile, or one per plan")
+    results = UserProfileBatch.from_profiles(profiles).calculate_all()
+    targets = np.column_stack([results["target_calories"], results["protein"], results["carbs"], results["fats"]])
+    return np.broadcast_to(targets, (num_plans, len(NUTRIENTS)))
+
+
+def adherence_scores(deviations: np.ndarray) -> np.ndarray:
+    """1 when every nutrient is on target, falling linearly to 0 as the mean absolute deviation reaches 100%"""
+    return 1.0 - np.minimum(np.abs(deviations), 1.0).mean(axis=-1)
+
+
+@dataclass
+class NutritionReport:
+    """Totals, deviations and adherence for a batch of plans; per-day arrays follow NutritionMatrix's day order"""
+    matrix: NutritionMatrix
+    day_totals: np.ndarray         # (days, nutrients) summed from meals
+    plan_totals: np.ndarray        # (plans, nutrients)
+    targets: np.ndarray            # (plans, nutrients) daily targets
+    day_deviations: np.ndarray     # (days, nutrients) (actual - target) / target
+    plan_deviations: np.ndarray    # (plans, nutrients) of the plan's total against target x days
+    day_adherence: np.ndarray      # (days,) in [0, 1]
+    plan_adherence: np.ndarray     # (plans,) mean of the plan's days
+    mismatches: np.ndarray         # (days, nutrients) stated totals that disagree with the meals
+
+    def mismatched_days(self, plan: int = 0) -> Dict[int, List[str]]:
+        """day number -> total_* fields of one plan that disagree with its meals"""
+        found = {}
+        for day in np.flatnonzero((self.matrix.day_plan == plan) & self.mismatches.any(axis=1)):
+            found[int(self.matrix.day_numbers[day])] = [
+                total for total, mismatch in zip(TOTAL_FIELDS, self.mismatches[day]) if mismatch]
+        return found
+
+    def to_dataframe(self):
+        """One row per day: plan, day, actual totals, deviations, adherence and mismatch flag"""
+        import pandas as pd
+        data = {"plan": self.matrix.day_plan, "day": self.matrix.day_numbers + 1}
+        for column, nutrient in enumerate(NUTRIENTS):
+            data[nutrient] = self.day_totals[:, column]
+            data[f"{nutrient}_target"] = self.targets[self.matrix.day_plan, column]
+            data[f"{nutrient}_deviation"] = self.day_deviations[:, column]
+        data["adherence"] = self.day_adherence
+        data["totals_mismatch"] = self.mismatches.any(axis=1)
+        return pd.DataFrame(data)
+
+
+def analyze_plans(plans: Union[Plan, Sequence[Plan]],
+                  profiles: Union[UserProfile, Sequence[UserProfile]]) -> NutritionReport:
+    """Compare plans with the targets of the profile(s) they were made for"""
+    plans = [plans] if isinstance(plans, (DailyMealPlan, WeeklyMealPlan)) else list(plans)
+    matrix = NutritionMatrix.from_plans(plans)
+    targets = target_matrix(profiles, matrix.num_plans)
+    day_totals = matrix.day_totals()
+    plan_totals = matrix.plan_totals(day_totals)
+    day_deviations = day_totals / targets[matrix.day_plan] - 1.0
+    plan_deviations = plan_totals / (targets * matrix.days_per_plan[:, None]) - 1.0
+    day_adherence = adherence_scores(day_deviations)
+    plan_adherence = (np.add.reduceat(day_adherence, matrix.plan_starts) / matrix.days_per_plan
+                      if matrix.num_plans else np.zeros(0))
+    return NutritionReport(
+        matrix=matrix,
+        day_totals=day_totals,
+        plan_totals=plan_totals,
+        targets=targets,
+        day_deviations=day_deviations,
+        plan_deviations=plan_deviations,
+        day_adherence=day_adherence,
+        plan_adherence=plan_adherence,
+        mismatches=matrix.total_mismatches(day_totals),
+    )
+
+
+def summary_figure(report: NutritionReport, plan: int = 0):
+    """Plotly figure for one plan: calories per day against target, and each macro's deviation"""
+    from plotly.subplots import make_subplots
+    import plotly.graph_objects as go
+
+    days = np.flatnonzero(report.matrix.day_plan == plan)
+    labels = [f"Day {number + 1}" for number in report.matrix.day_numbers[days]]
+    figure = make_subplots(rows=1, cols=2, subplot_titles=("Calories", "Macro deviation from target"))
+    figure.add_trace(go.Bar(x=labels, y=report.day_totals[days, 0], name="Calories",
+                            marker_color=["#e45756" if mismatch else "#4c78a8"
+                                          for mismatch in report.mismatches[days].any(axis=1)]),
+                     row=1, col=1)
+    figure.add_hline(y=report.targets[plan, 0], line_dash="dash", annotation_text="target", row=1, col=1)
+    for column, nutrient in enumerate(NUTRIENTS[1:], start=1):
+        figure.add_trace(go.Bar(x=labels, y=report.day_deviations[days, column] * 100, name=nutrient.title()),
+                         row=1, col=2)
+    figure.update_yaxes(ticksuffix="%", row=1, col=2)
+    figure.update_layout(barmode="group", height=360, margin=dict(t=40, b=20, l=20, r=20))
+    return figure
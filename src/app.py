@@ -1,7 +1,17 @@
+import os
+import threading
+import uuid
 import streamlit as st
 from user_profile import UserProfile, ActivityLevel, DietaryPreference, HealthGoal, MealFrequency, FoodPreference, CookingSkill
-from meal_planner import MealPlanner
+from meal_planner import MealPlanner, PlanSource, Meal, DailyMealPlan, WeeklyMealPlan
 from meal_planner import meal_order
+from plan_cache import LRUPlanCache, SQLitePlanCache, make_profile_key
+from similarity_cache import SimilarityPlanCache
+from jobs import JobManager, JobQueue, DONE, FAILED, QUEUED
+from speculation import Speculator
+from metrics import Metrics, start_http_server
+from analytics import analyze_plans, summary_figure
+from shopping import batch_prep, shopping_list, shopping_list_csv
 
 # Set page config with custom theme
 st.set_page_config(
@@ -72,7 +82,297 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+@st.cache_resource
+def get_plan_cache():
+    """Process-wide plan cache shared by all sessions (on disk when PLAN_CACHE_PATH is set)"""
+    cache_path = os.getenv("PLAN_CACHE_PATH")
+    if cache_path:
+        return SQLitePlanCache(cache_path)
+    return LRUPlanCache()
+
+@st.cache_resource
+def get_plan_store():
+    """Server-side store of the plans users generated (and edited), keyed by profile hash.
+
+    Unlike the plan cache, which is keyed by prompt, entries here include meal swaps and
+    survive a browser refresh (on disk when PLAN_STORE_PATH is set).
+    """
+    store_path = os.getenv("PLAN_STORE_PATH")
+    if store_path:
+        return SQLitePlanCache(store_path)
+    return LRUPlanCache(max_entries=1024)
+
+def load_saved_plan(plan_key: str, weekly: bool):
+    """Plan already generated for this profile in this session or, failing that, on this server"""
+    plans = st.session_state.setdefault("plans", {})
+    if plan_key not in plans:
+        stored_plan = get_plan_store().get(plan_key, WeeklyMealPlan if weekly else DailyMealPlan)
+        if stored_plan is None:
+            return None
+        plans[plan_key] = stored_plan
+    return plans[plan_key]
+
+def save_plan(plan_key: str, plan):
+    st.session_state.setdefault("plans", {})[plan_key] = plan
+    get_plan_store().set(plan_key, plan)
+
+@st.cache_resource
+def get_meal_planner() -> MealPlanner:
+    """One MealPlanner, with its pooled Groq client, reused across reruns and sessions"""
+    source = PlanSource(os.getenv("MEAL_PLAN_SOURCE", PlanSource.LLM.value))
+    llm_timeout = os.getenv("LLM_TIMEOUT_SECONDS")
+    metrics = Metrics(tracing=True) if os.getenv("OTEL_TRACING") else None
+    # Near matches share the plan cache's backend; their keys never collide with exact ones
+    planner = MealPlanner(cache=get_plan_cache(), similarity_cache=SimilarityPlanCache(get_plan_cache()),
+                          source=source, llm_timeout=float(llm_timeout) if llm_timeout else None, metrics=metrics,
+                          steer_variety=bool(os.getenv("STEER_WEEKLY_VARIETY")))
+    # LangChain and the Groq client load while the user fills in the profile, not on the first click
+    threading.Thread(target=planner.warm_up, name="planner-warm-up", daemon=True).start()
+    return planner
+
+@st.cache_resource
+def start_metrics_endpoint(port: int):
+    """Prometheus endpoint for the planner's metrics; started once per server process"""
+    return start_http_server(port, get_meal_planner().metrics)
+
+def render_debug_panel():
+    """Stage timings, token counts, cache hit rate and rate-limiter state, for operators"""
+    planner = get_meal_planner()
+    snapshot = planner.metrics.snapshot()
+    counters = snapshot["counters"]
+    with st.sidebar.expander("🛠️ Generation metrics", expanded=True):
+        hit_rate = snapshot["cache_hit_rate"]
+        col1, col2 = st.columns(2)
+        near_hit_rate = snapshot["near_hit_rate"]
+        col1.metric("Cache hit rate", "–" if hit_rate is None else f"{hit_rate:.0%}",
+                    help=None if near_hit_rate is None else f"{near_hit_rate:.0%} served from a similar profile, rescaled")
+        col2.metric("LLM calls", int(counters.get(("llm_calls_total", ()), 0)))
+        col1.metric("Prompt tokens", int(counters.get(("llm_prompt_tokens_total", ()), 0)))
+        col2.metric("Completion tokens", int(counters.get(("llm_completion_tokens_total", ()), 0)))
+        col1.metric("Retries", int(counters.get(("retries_total", ()), 0)))
+        col2.metric("Fallbacks", int(counters.get(("fallbacks_total", ()), 0)))
+
+        rows = []
+        for (name, labels), summary in sorted(snapshot["histograms"].items()):
+            rows.append({
+                "stage": dict(labels).get("stage", name.replace("_seconds", "")),
+                "count": summary["count"],
+                "mean ms": round(summary["mean"] * 1000, 1),
+                "p50 ms": round(summary["p50"] * 1000, 1),
+                "p95 ms": round(summary["p95"] * 1000, 1),
+                "max ms": round(summary["max"] * 1000, 1),
+            })
+        if rows:
+            st.dataframe(rows, hide_index=True, use_container_width=True)
+        if planner.rate_limiter is not None:
+            st.caption("Rate limiter")
+            st.json(planner.rate_limiter.snapshot(), expanded=False)
+        st.caption("Job queue")
+        st.json(get_job_manager().queue.counts(), expanded=False)
+        if speculation_tokens_per_minute() > 0:
+            st.caption("Speculation")
+            st.json(get_speculator().snapshot(), expanded=False)
+
+# Seconds between checks on a pending generation job
+JOB_POLL_SECONDS = 1.0
+
+@st.cache_resource
+def get_job_manager() -> JobManager:
+    """Worker pool that runs plan generation off the Streamlit script threads"""
+    queue_path = os.getenv("JOB_QUEUE_PATH")
+    return JobManager(get_meal_planner(), JobQueue(queue_path) if queue_path else None,
+                      max_workers=int(os.getenv("GENERATION_WORKERS", "4")))
+
+# Share of the key's token quota speculative plans may use when SPECULATION_TOKENS_PER_MINUTE is unset
+SPECULATION_QUOTA_SHARE = 0.1
+DEFAULT_SPECULATION_TOKENS_PER_MINUTE = 3000
+
+def speculation_tokens_per_minute() -> float:
+    """Token budget for speculative plans; 0 disables them (local plans need no speculation)"""
+    if os.getenv("MEAL_PLAN_SOURCE") == PlanSource.LOCAL.value:
+        return 0.0
+    tokens_per_minute = os.getenv("SPECULATION_TOKENS_PER_MINUTE")
+    if tokens_per_minute is not None:
+        return float(tokens_per_minute)
+    quota = os.getenv("GROQ_TOKENS_PER_MINUTE")
+    return float(quota) * SPECULATION_QUOTA_SHARE if quota else DEFAULT_SPECULATION_TOKENS_PER_MINUTE
+
+@st.cache_resource
+def get_speculator() -> Speculator:
+    """Starts daily plans before the Generate click for users who opt in"""
+    return Speculator(get_job_manager(), speculation_tokens_per_minute())
+
+def speculation_toggled():
+    st.session_state.speculation_toggled = True
+
+def render_job_progress(job, weekly: bool):
+    """Show a pending job's status and whatever it has produced so far"""
+    if job.status == QUEUED:
+        st.info("⏳ Your meal plan is queued and will start in a moment...")
+    else:
+        st.info(f"🧙‍♂️ Creating your perfect {'weekly' if weekly else 'daily'} meal plan... This might take a moment.")
+
+    if weekly:
+        st.subheader("🗓️ Your Weekly Meal Plan")
+        finished_days = {day_index: DailyMealPlan.model_validate(daily_plan) for day_index, daily_plan in job.partial}
+        for day_index in range(7):
+            with st.expander(f"Day {day_index + 1}", expanded=day_index in finished_days):
+                if day_index in finished_days:
+                    render_daily_plan(finished_days[day_index], collapsible=False)
+                else:
+                    st.info("⏳ Preparing this day...")
+    else:
+        st.subheader("🍽️ Your Daily Meal Plan")
+        cols = st.columns(3)
+        for idx, meal in enumerate(job.partial):
+            with cols[idx % 3]:
+                render_meal_card(Meal.model_validate(meal), collapsible=True)
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_pending_job(plan_key: str, weekly: bool):
+    """Poll a pending job, rerunning only this fragment until the job finishes.
+
+    A finished job triggers one full rerun, where main() saves the plan or shows the error.
+    """
+    job_id = st.session_state.get("pending_jobs", {}).get(plan_key)
+    job = get_job_manager().status(job_id) if job_id is not None else None
+    if job is None or job.finished:
+        st.rerun(scope="app")
+    render_job_progress(job, weekly)
+
+def swap_meal(plan_key: str, meal_index: int, day=None):
+    """Button callback: ask for one meal of a saved plan to be replaced.
+
+    The LLM call runs in render_saved_plan, under a spinner next to the plan, not in the callback.
+    """
+    st.session_state.pending_swap = (plan_key, meal_index, day)
+
+def render_meal_card(meal, collapsible: bool = True, swap_key: str = None, swap_args: tuple = ()):
+    """Render one meal card; details go in an expander unless already inside one.
+
+    With a swap_key the card gets a button that swaps just this meal via swap_meal(*swap_args).
+    """
+    with st.container():
+        st.markdown(f"### {meal.meal_type.title()}")
+        st.markdown(f"**{meal.name}**")
+        if swap_key is not None:
+            st.button("🔄 Swap", key=swap_key, on_click=swap_meal, args=swap_args,
+                      help="Replace only this meal; the rest of the plan stays the same")
+
+        details = st.expander("View Details") if collapsible else st.container()
+        with details:
+            st.markdown("#### 📝 Instructions")
+            for i, step in enumerate(meal.instructions, 1):
+                st.write(f"{i}. {step}")
+
+            st.markdown("#### 🥗 Ingredients")
+            for ingredient in meal.ingredients:
+                st.write(f"• {ingredient}")
+
+            st.markdown("#### 📊 Nutrition")
+            nutrition_cols = st.columns(4)
+            with nutrition_cols[0]:
+                st.metric("Calories", f"{meal.nutrition['calories']:.0f}")
+            with nutrition_cols[1]:
+                st.metric("Protein", f"{meal.nutrition['protein']:.1f}g")
+            with nutrition_cols[2]:
+                st.metric("Carbs", f"{meal.nutrition['carbs']:.1f}g")
+            with nutrition_cols[3]:
+                st.metric("Fats", f"{meal.nutrition['fats']:.1f}g")
+
+            st.info(f"⏱️ Prep Time: {meal.prep_time} minutes")
+
+def render_daily_plan(daily_plan, collapsible: bool = True, swap_plan_key: str = None, day=None):
+    """Render a day's meals as a grid of cards sorted by time.
+
+    swap_plan_key is the key of the saved plan the day belongs to; with it every card gets a swap button.
+    """
+    sorted_meals = sorted(enumerate(daily_plan.meals),
+                          key=lambda x: meal_order.get(x[1].meal_type.lower(), 99))
+
+    cols = st.columns(min(3, len(sorted_meals)))
+    for idx, (meal_index, meal) in enumerate(sorted_meals):
+        with cols[idx % 3]:
+            if swap_plan_key is not None:
+                render_meal_card(meal, collapsible=collapsible, swap_key=f"swap_{day}_{meal_index}",
+                                 swap_args=(swap_plan_key, meal_index, day))
+            else:
+                render_meal_card(meal, collapsible=collapsible)
+
+@st.cache_data(max_entries=256)
+def nutrition_summary(plan_json: str, weekly: bool, profile: dict):
+    """Figure, adherence and mismatched LLM totals for a plan; cached on its JSON, so reruns and
+    other sessions viewing the same plan reuse it and a meal swap recomputes it"""
+    plan = (WeeklyMealPlan if weekly else DailyMealPlan).model_validate_json(plan_json)
+    report = analyze_plans(plan, UserProfile.from_dict(profile))
+    return summary_figure(report), float(report.plan_adherence[0]), report.mismatched_days()
+
+def render_nutrition_summary(user_profile, meal_plan):
+    weekly = isinstance(meal_plan, WeeklyMealPlan)
+    figure, adherence, mismatched_days = nutrition_summary(meal_plan.model_dump_json(), weekly,
+                                                           user_profile.to_dict())
+    with st.expander("📊 Nutrition summary"):
+        st.metric("Adherence to your targets", f"{adherence:.0%}",
+                  help="100% when every day's calories and macros match your targets exactly")
+        st.plotly_chart(figure, use_container_width=True)
+        for day, totals in mismatched_days.items():
+            where = f"Day {day + 1}'s" if weekly else "The"
+            fields = ", ".join(total.replace("total_", "") for total in totals)
+            st.warning(f"{where} stated totals ({fields}) don't match its meals; the summary uses the meals' sum.")
+
+def render_shopping_list(meal_plan):
+    """Merged shopping list and the prep worth doing once for several meals"""
+    weekly = isinstance(meal_plan, WeeklyMealPlan)
+    items = shopping_list(meal_plan)
+    daily_plans = meal_plan.daily_plans if weekly else [meal_plan]
+    with st.expander("🛒 Shopping list & batch prep"):
+        st.dataframe([{"Item": item.item, "Quantity": "" if item.quantity is None else f"{item.quantity:g}",
+                       "Unit": item.unit} for item in items], hide_index=True, use_container_width=True)
+        st.download_button("⬇️ Download shopping list (CSV)", shopping_list_csv(items),
+                           file_name="shopping_list.csv", mime="text/csv")
+        tasks = batch_prep(meal_plan)
+        if tasks:
+            st.markdown("**Prep once, use in several meals**")
+        for task in tasks:
+            meals = ", ".join(
+                (f"Day {day + 1} " if weekly else "") + daily_plans[day].meals[meal_index].meal_type
+                for day, meal_index in task.meals)
+            st.write(f"• {task.description}: {meals}")
+
+def render_saved_plan(plan_key: str, user_profile, meal_plan):
+    """Render a saved plan without calling the planner, with a swap button on every meal"""
+    swap = st.session_state.pop("pending_swap", None)
+    if swap is not None and swap[0] == plan_key:
+        _, meal_index, day = swap
+        with st.spinner("🔄 Swapping that meal..."):
+            try:
+                meal_plan = get_meal_planner().regenerate_meal(user_profile, meal_plan, meal_index, day=day)
+                save_plan(plan_key, meal_plan)
+            except Exception as e:
+                st.error(f"Oops! Something went wrong while swapping that meal: {str(e)}")
+
+    if isinstance(meal_plan, WeeklyMealPlan):
+        st.subheader("🗓️ Your Weekly Meal Plan")
+        for day_index, daily_plan in enumerate(meal_plan.daily_plans):
+            with st.expander(f"Day {day_index + 1}"):
+                render_daily_plan(daily_plan, collapsible=False, swap_plan_key=plan_key, day=day_index)
+    else:
+        st.subheader("🍽️ Your Daily Meal Plan")
+        render_daily_plan(meal_plan, collapsible=True, swap_plan_key=plan_key)
+
+    render_nutrition_summary(user_profile, meal_plan)
+    render_shopping_list(meal_plan)
+
+    st.markdown("---")
+    st.success(f"🎉 Your personalized {'weekly' if isinstance(meal_plan, WeeklyMealPlan) else 'daily'} meal plan is ready! Swap any meal you don't fancy, or adjust your preferences and generate a new plan anytime.")
+
 def main():
+    metrics_port = os.getenv("METRICS_PORT")
+    if metrics_port:
+        start_metrics_endpoint(int(metrics_port))
+    if os.getenv("SHOW_DEBUG_PANEL") or st.query_params.get("debug"):
+        render_debug_panel()
+
     # Header section
     col1, col2 = st.columns([3, 1])
     with col1:
@@ -87,6 +387,11 @@ def main():
     # Profile Tab
     with tab1:
         st.header("Let's Get to Know You")
+        speculative = speculation_tokens_per_minute() > 0 and st.toggle(
+            "⚡ Start on my plan while I fill this in", on_change=speculation_toggled,
+            help="Your daily plan is prepared in the background as soon as your answers settle, "
+                 "so it's ready when you reach the Generate tab"
+        )
         
         col1, col2 = st.columns(2)
         with col1:
@@ -233,113 +538,82 @@ def main():
             help="Choose whether you want a meal plan for a single day or for the entire week"
         )
 
-        generate_button = st.button("✨ Generate My Personalized Meal Plan", type="primary", use_container_width=True)
+        user_profile = UserProfile(
+            age=age,
+            gender=gender,
+            weight=weight,
+            height=height,
+            activity_level=ActivityLevel(activity),
+            dietary_preference=DietaryPreference(diet_pref),
+            health_goal=HealthGoal(goal),
+            meal_frequency=MealFrequency(meal_freq),
+            food_preference=FoodPreference(food_pref[0] if food_pref else "anything"),
+            cooking_skill=CookingSkill(cooking_skill),
+            allergies=allergies,
+            preferred_cuisines=cuisines,
+            disliked_foods=disliked_foods,
+            meal_prep_time=meal_prep_time
+        )
 
-        if generate_button:
-            try:
-                # Create user profile
-                user_profile = UserProfile(
-                    age=age,
-                    gender=gender,
-                    weight=weight,
-                    height=height,
-                    activity_level=ActivityLevel(activity),
-                    dietary_preference=DietaryPreference(diet_pref),
-                    health_goal=HealthGoal(goal),
-                    meal_frequency=MealFrequency(meal_freq),
-                    food_preference=FoodPreference(food_pref[0] if food_pref else "anything"),
-                    cooking_skill=CookingSkill(cooking_skill),
-                    allergies=allergies,
-                    preferred_cuisines=cuisines,
-                    disliked_foods=disliked_foods,
-                    meal_prep_time=meal_prep_time
-                )
+        # Reruns (expanding a day, moving a slider and back) re-render the saved plan instead of
+        # generating a new one; only the button below calls the planner
+        weekly = plan_duration == "Weekly Plan"
+        plan_key = make_profile_key(user_profile.to_dict(), "weekly" if weekly else "daily")
+        saved_plan = load_saved_plan(plan_key, weekly)
+        user_id = st.session_state.setdefault("user_id", uuid.uuid4().hex)
+
+        daily_key = make_profile_key(user_profile.to_dict(), "daily")
+        toggled = st.session_state.pop("speculation_toggled", False)
+        try:
+            if speculative and load_saved_plan(daily_key, weekly=False) is None:
+                get_speculator().observe(user_id, user_profile, daily_key, edited=toggled)
+            elif toggled:
+                get_speculator().forget(user_id)
+        except Exception:
+            # Speculation is best effort; a planner that can't start surfaces on the button instead
+            speculative = False
+
+        # Generation runs as a background job; this script only submits it and polls for progress
+        pending_jobs = st.session_state.setdefault("pending_jobs", {})
+        job = get_job_manager().status(pending_jobs[plan_key]) if plan_key in pending_jobs else None
+        if job is None or job.finished:
+            pending_jobs.pop(plan_key, None)
+            if job is not None and job.status == DONE:
+                save_plan(plan_key, job.plan)
+                saved_plan = job.plan
+            elif job is not None and job.status == FAILED:
+                st.error(f"Oops! Something went wrong while creating your meal plan: {job.error}")
+            job = None
 
-                # Generate meal plan with loading animation
-                with st.spinner(f"🧙‍♂️ Creating your perfect {'weekly' if plan_duration == 'Weekly Plan' else 'daily'} meal plan... This might take a moment."):
-                    meal_planner = MealPlanner()
-                    if plan_duration == "Weekly Plan":
-                        weekly_plan = meal_planner.generate_weekly_meal_plan(user_profile)
-                        st.subheader("🗓️ Your Weekly Meal Plan")
-                        
-                        # Display each day's meals
-                        for day_num, daily_plan in enumerate(weekly_plan.daily_plans, 1):
-                            with st.expander(f"Day {day_num}"):
-                                # Sort meals by time
-                                sorted_meals = sorted(daily_plan.meals, 
-                                                   key=lambda x: meal_order.get(x.meal_type.lower(), 99))
-
-                                # Create meal cards in a grid
-                                cols = st.columns(min(3, len(sorted_meals)))
-                                for idx, meal in enumerate(sorted_meals):
-                                    with cols[idx % 3]:
-                                        with st.container():
-                                            st.markdown(f"### {meal.meal_type.title()}")
-                                            st.markdown(f"**{meal.name}**")
-
-                                            st.markdown("#### 📝 Instructions")
-                                            for i, step in enumerate(meal.instructions, 1):
-                                                st.write(f"{i}. {step}")
-
-                                            st.markdown("#### 🥗 Ingredients")
-                                            for ingredient in meal.ingredients:
-                                                st.write(f"• {ingredient}")
-
-                                            st.markdown("#### 📊 Nutrition")
-                                            nutrition_cols = st.columns(4)
-                                            with nutrition_cols[0]:
-                                                st.metric("Calories", f"{meal.nutrition['calories']:.0f}")
-                                            with nutrition_cols[1]:
-                                                st.metric("Protein", f"{meal.nutrition['protein']:.1f}g")
-                                            with nutrition_cols[2]:
-                                                st.metric("Carbs", f"{meal.nutrition['carbs']:.1f}g")
-                                            with nutrition_cols[3]:
-                                                st.metric("Fats", f"{meal.nutrition['fats']:.1f}g")
-                                            st.info(f"⏱️ Prep Time: {meal.prep_time} minutes")
-                    else:
-                        daily_plan = meal_planner.generate_meal_plan(user_profile)
-                        st.subheader("🍽️ Your Daily Meal Plan")
-                        
-                        # Sort meals by time
-                        sorted_meals = sorted(daily_plan.meals, 
-                                           key=lambda x: meal_order.get(x.meal_type.lower(), 99))
-
-                        # Create meal cards in a grid
-                        cols = st.columns(min(3, len(sorted_meals)))
-                        for idx, meal in enumerate(sorted_meals):
-                            with cols[idx % 3]:
-                                with st.container():
-                                    st.markdown(f"### {meal.meal_type.title()}")
-                                    st.markdown(f"**{meal.name}**")
-                                    
-                                    with st.expander("View Details"):
-                                        st.markdown("#### 📝 Instructions")
-                                        for i, step in enumerate(meal.instructions, 1):
-                                            st.write(f"{i}. {step}")
-                                        
-                                        st.markdown("#### 🥗 Ingredients")
-                                        for ingredient in meal.ingredients:
-                                            st.write(f"• {ingredient}")
-                                        
-                                        st.markdown("#### 📊 Nutrition")
-                                        nutrition_cols = st.columns(4)
-                                        with nutrition_cols[0]:
-                                            st.metric("Calories", f"{meal.nutrition['calories']:.0f}")
-                                        with nutrition_cols[1]:
-                                            st.metric("Protein", f"{meal.nutrition['protein']:.1f}g")
-                                        with nutrition_cols[2]:
-                                            st.metric("Carbs", f"{meal.nutrition['carbs']:.1f}g")
-                                        with nutrition_cols[3]:
-                                            st.metric("Fats", f"{meal.nutrition['fats']:.1f}g")
-                                        
-                                        st.info(f"⏱️ Prep Time: {meal.prep_time} minutes")
-
-                # Add completion message at the end of Generate Plan tab
-                st.markdown("---")
-                st.success(f"🎉 Your personalized {'weekly' if plan_duration == 'Weekly Plan' else 'daily'} meal plan is ready! Feel free to adjust your preferences and generate a new plan anytime.")
+        if saved_plan is None:
+            generate_button = st.button("✨ Generate My Personalized Meal Plan", type="primary",
+                                        use_container_width=True, disabled=job is not None)
+        else:
+            generate_button = st.button("🔄 Regenerate Plan", type="primary", use_container_width=True,
+                                        disabled=job is not None,
+                                        help="Replace the saved plan for this profile with a new one")
 
+        if generate_button:
+            try:
+                speculated = None
+                if speculative and not weekly and saved_plan is None:
+                    speculated = get_speculator().adopt(user_id, plan_key)
+                if speculated is not None and speculated.status == DONE:
+                    save_plan(plan_key, speculated.plan)
+                    saved_plan = speculated.plan
+                else:
+                    # Regenerating must not be answered from the plan cache. Submitting the plan a
+                    # speculative job is still working on adopts that job.
+                    pending_jobs[plan_key] = get_job_manager().submit(user_id, user_profile, weekly=weekly,
+                                                                      use_cache=saved_plan is None)
+                    job = get_job_manager().status(pending_jobs[plan_key])
             except Exception as e:
                 st.error(f"Oops! Something went wrong while creating your meal plan: {str(e)}")
 
+        if job is not None:
+            render_pending_job(plan_key, weekly)
+        elif saved_plan is not None:
+            render_saved_plan(plan_key, user_profile, saved_plan)
+
 if __name__ == "__main__":
     main()
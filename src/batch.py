@@ -0,0 +1,244 @@
+"""Headless bulk plan generation for cohorts of user profiles.
+
+Usage:
+    python src/batch.py profiles.csv -o plans.jsonl [--weekly] [--concurrency 8]
+
+Profiles are read from CSV or JSONL (one UserProfile field per column/key, plus an
+optional "id") and processed in bounded chunks, so memory stays flat for any input size.
+Results are appended to the output JSONL as they finish; an invalid row gets an error
+record and the run continues. A rerun with the same output file resumes by skipping ids
+that already succeeded.
+"""
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+
+from user_profile import UserProfile
+from meal_planner import MealPlanner, PlanSource
+from rate_limit import limiter_gave_up, retry_after_seconds
+from llm_backends import RecordingLLM, StubLLM
+
+# Profiles read, deduplicated and generated at a time; identical prompts are only merged within a chunk
+DEFAULT_CHUNK_SIZE = 1000
+
+
+@dataclass
+class BatchSummary:
+    total: int = 0
+    skipped: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    deduplicated: int = 0
+    elapsed_seconds: float = 0.0
+
+    @property
+    def plans_per_minute(self) -> float:
+        done = self.succeeded + self.failed
+        return done / self.elapsed_seconds * 60 if self.elapsed_seconds else 0.0
+
+
+def read_profiles(path: str) -> Iterator[Tuple[str, Union[UserProfile, ValueError]]]:
+    """Yield (id, UserProfile) from a .csv or .jsonl file; rows without an id use their line number.
+
+    A row that is not a valid profile yields (id, ValueError) instead, so one bad row does not end the batch.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (line for line in f if line.strip())
+        for row_number, row in enumerate(rows, 1):
+            try:
+                if isinstance(row, str):
+                    row = json.loads(row)
+                if not isinstance(row, dict):
+                    raise ValueError("expected an object of profile fields")
+                profile = UserProfile.from_dict(row)
+            except (ValueError, TypeError) as e:
+                profile = ValueError(f"Invalid profile on row {row_number} of {path}: {str(e)}")
+            row_id = row.get("id") if isinstance(row, dict) else None
+            yield str(row_id or row_number), profile
+
+
+def completed_ids(output_path: str) -> Set[str]:
+    """Ids already written successfully to an output file, used to resume an interrupted run"""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write can leave a truncated last line
+                continue
+            if record.get("status") == "ok":
+                done.add(str(record["id"]))
+    return done
+
+
+class BatchRunner:
+    """Generate plans for many profiles with bounded concurrency and rate-limit-aware backoff"""
+
+    def __init__(self, planner: MealPlanner, weekly: bool = False, max_concurrency: int = 8,
+                 max_attempts: int = 5, base_backoff: float = 2.0, max_backoff: float = 60.0,
+                 progress: Optional[Callable[[str], None]] = None, progress_interval: float = 5.0,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.planner = planner
+        self.weekly = weekly
+        self.max_concurrency = max_concurrency
+        self.chunk_size = chunk_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.progress = progress or (lambda message: print(message, file=sys.stderr, flush=True))
+        self.progress_interval = progress_interval
+        # A 429 on any worker pauses every worker until this time
+        self._resume_at = 0.0
+        self._resume_lock = threading.Lock()
+        self._last_report = time.monotonic()
+
+    def _wait_for_rate_limit(self) -> None:
+        delay = self._resume_at - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _back_off(self, attempt: int, retry_after: Optional[float]) -> None:
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        delay = max(retry_after or 0.0, random.uniform(delay / 2, delay))
+        with self._resume_lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + delay)
+
+    def _generate(self, profile: UserProfile):
+        last_error = None
+        for attempt in range(self.max_attempts):
+            self._wait_for_rate_limit()
+            try:
+                if self.weekly:
+                    return self.planner.generate_weekly_meal_plan(profile)
+                return self.planner.generate_meal_plan(profile)
+            except Exception as e:
+                last_error = e
+                # The planner's rate limiter already backed off and retried its 429s; only a raw
+                # 429 it did not absorb is retried here
+                retry_after = None if limiter_gave_up(e) else retry_after_seconds(e)
+                if retry_after is None:
+                    # Not a rate limit; the planner already retried transient failures
+                    break
+                self._back_off(attempt, retry_after)
+        raise last_error
+
+    def run(self, profiles: Iterable[Tuple[str, Union[UserProfile, Exception]]], output_path: str,
+            resume: bool = True) -> BatchSummary:
+        """Generate plans for every profile, appending one JSON line per profile id to output_path.
+
+        profiles is consumed chunk_size entries at a time; an entry whose profile is an exception
+        (an invalid row from read_profiles) is written as an error record without generating.
+        """
+        summary = BatchSummary()
+        started = time.monotonic()
+        done = completed_ids(output_path) if resume else set()
+        self._last_report = started
+
+        profiles = iter(profiles)
+        with open(output_path, "a" if resume else "w", encoding="utf-8") as output, \
+                ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="batch") as executor:
+            while True:
+                chunk = list(itertools.islice(profiles, self.chunk_size))
+                if not chunk:
+                    break
+                self._run_chunk(chunk, done, output, executor, summary, started)
+
+        summary.elapsed_seconds = time.monotonic() - started
+        self.progress(self._format_progress(summary))
+        return summary
+
+    def _run_chunk(self, chunk: List[Tuple[str, Union[UserProfile, Exception]]], done: Set[str], output,
+                   executor: ThreadPoolExecutor, summary: BatchSummary, started: float) -> None:
+        # Identical prompts within the chunk are generated once and fanned out to every id
+        groups: Dict[str, Tuple[UserProfile, List[str]]] = {}
+        invalid = []
+        for profile_id, profile in chunk:
+            summary.total += 1
+            if profile_id in done:
+                summary.skipped += 1
+                continue
+            if isinstance(profile, Exception):
+                invalid.append({"id": profile_id, "status": "error", "error": str(profile)})
+                continue
+            key = self.planner.plan_key(profile, weekly=self.weekly)
+            if key in groups:
+                groups[key][1].append(profile_id)
+                summary.deduplicated += 1
+            else:
+                groups[key] = (profile, [profile_id])
+        if invalid:
+            summary.failed += len(invalid)
+            self._write(output, invalid, summary, started)
+
+        futures = {executor.submit(self._generate, profile): (key, ids) for key, (profile, ids) in groups.items()}
+        for future in as_completed(futures):
+            key, ids = futures[future]
+            try:
+                plan = future.result().model_dump()
+                records = [{"id": profile_id, "status": "ok", "plan_key": key, "plan": plan} for profile_id in ids]
+                summary.succeeded += len(ids)
+            except Exception as e:
+                records = [{"id": profile_id, "status": "error", "plan_key": key, "error": str(e)} for profile_id in ids]
+                summary.failed += len(ids)
+            self._write(output, records, summary, started)
+
+    def _write(self, output, records: List[dict], summary: BatchSummary, started: float) -> None:
+        for record in records:
+            output.write(json.dumps(record) + "\n")
+        output.flush()
+
+        summary.elapsed_seconds = time.monotonic() - started
+        if time.monotonic() - self._last_report >= self.progress_interval:
+            self._last_report = time.monotonic()
+            self.progress(self._format_progress(summary))
+
+    @staticmethod
+    def _format_progress(summary: BatchSummary) -> str:
+        remaining = summary.total - summary.skipped
+        done = summary.succeeded + summary.failed
+        return (f"[batch] {done}/{remaining} plans ({summary.failed} failed, {summary.deduplicated} deduplicated, "
+                f"{summary.skipped} resumed) - {summary.plans_per_minute:.1f} plans/min")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate meal plans for a batch of user profiles")
+    parser.add_argument("profiles", help="CSV or JSONL file of user profiles")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to append results to")
+    parser.add_argument("--weekly", action="store_true", help="generate weekly instead of daily plans")
+    parser.add_argument("--concurrency", type=int, default=8, help="profiles generated in parallel")
+    parser.add_argument("--source", choices=[source.value for source in PlanSource], default=PlanSource.LLM.value)
+    parser.add_argument("--no-resume", action="store_true", help="overwrite the output instead of resuming")
+    parser.add_argument("--record", help="append every LLM prompt/response to this JSONL file for later replay")
+    parser.add_argument("--replay", help="answer from a --record file with a stub LLM instead of calling Groq")
+    args = parser.parse_args(argv)
+
+    planner = MealPlanner(source=PlanSource(args.source),
+                          llm=StubLLM.from_recording(args.replay) if args.replay else None)
+    if args.record and planner.llm is not None:
+        planner.llm = RecordingLLM(planner.llm, args.record)
+    runner = BatchRunner(planner, weekly=args.weekly, max_concurrency=args.concurrency)
+    summary = runner.run(read_profiles(args.profiles), args.output, resume=not args.no_resume)
+    return 1 if summary.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,312 @@
+"""Background plan generation backed by a SQLite job queue.
+
+Callers submit a profile and get a job id back immediately; a pool of worker threads owned by
+JobManager runs the MealPlanner calls. The queue lives in SQLite, so no broker is needed and
+jobs orphaned by a crashed process are re-queued on startup.
+
+Scheduling: daily plans always go before weekly ones, and both before speculative plans started
+ahead of a click (see speculation.py); within a priority, the user served longest ago goes first,
+and no user has more than max_jobs_per_user jobs running at once.
+"""
+from typing import Dict, List, Optional, Union
+from dataclasses import dataclass, field
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from user_profile import UserProfile
+from meal_models import DailyMealPlan, WeeklyMealPlan
+from meal_planner import MealPlanner
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+# Lower runs first: a daily plan is one short call, a week is seven, and a speculative plan may
+# never be asked for
+JOB_PRIORITIES = {"daily": 0, "weekly": 1}
+SPECULATIVE_PRIORITY = 2
+
+
+@dataclass
+class Job:
+    id: str
+    user_id: str
+    kind: str
+    status: str
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    error: Optional[str] = None
+    plan: Optional[Union[DailyMealPlan, WeeklyMealPlan]] = None
+    # Results streamed so far: meal dicts for a daily job, [day_index, daily plan dict] pairs for a weekly one
+    partial: List = field(default_factory=list)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATUSES
+
+
+class JobQueue:
+    """SQLite-backed job table; safe to share between threads and between processes using one file"""
+
+    def __init__(self, path: str = ":memory:", ttl_seconds: Optional[float] = 24 * 60 * 60):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            if path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT UNIQUE NOT NULL,
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    request_key TEXT NOT NULL,
+                    profile TEXT NOT NULL,
+                    use_cache INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    partial TEXT NOT NULL DEFAULT '[]',
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority, seq)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_user ON jobs (user_id, status)")
+
+    def enqueue(self, user_id: str, user_profile: UserProfile, weekly: bool, request_key: str,
+                use_cache: bool = True, speculative: bool = False) -> str:
+        """Queue a job, or return the id of the user's identical job that is still queued or running.
+
+        An identical speculative job is adopted: it keeps its place and progress, and moves up to
+        this request's priority.
+        """
+        kind = "weekly" if weekly else "daily"
+        priority = SPECULATIVE_PRIORITY if speculative else JOB_PRIORITIES[kind]
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT id, priority FROM jobs WHERE user_id = ? AND request_key = ? AND status IN (?, ?)",
+                (user_id, request_key, QUEUED, RUNNING),
+            ).fetchone()
+            if row is not None:
+                if priority < row[1]:
+                    self._conn.execute("UPDATE jobs SET priority = ? WHERE id = ?", (priority, row[0]))
+                return row[0]
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                """INSERT INTO jobs (id, user_id, kind, priority, request_key, profile, use_cache, status, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (job_id, user_id, kind, priority, request_key, json.dumps(user_profile.to_dict()),
+                 int(use_cache), QUEUED, time.time()),
+            )
+        return job_id
+
+    def claim(self, max_jobs_per_user: int) -> Optional[tuple]:
+        """Atomically mark the next runnable job as running and return it, or None if nothing is runnable"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    """SELECT id, user_id, kind, profile, use_cache FROM jobs AS j
+                       WHERE status = ?
+                         AND (SELECT COUNT(*) FROM jobs WHERE user_id = j.user_id AND status = ?) < ?
+                       ORDER BY priority,
+                                COALESCE((SELECT MAX(started_at) FROM jobs WHERE user_id = j.user_id), 0),
+                                seq
+                       LIMIT 1""",
+                    (QUEUED, RUNNING, max_jobs_per_user),
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("UPDATE jobs SET status = ?, started_at = ? WHERE id = ?",
+                                       (RUNNING, time.time(), row[0]))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def update_partial(self, job_id: str, partial: List) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE jobs SET partial = ? WHERE id = ?", (json.dumps(partial), job_id))
+
+    def finish(self, job_id: str, result: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Record a job's plan JSON or error; a job cancelled while running stays cancelled"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (DONE if error is None else FAILED, result, error, time.time(), job_id, RUNNING),
+            )
+
+    def cancel(self, job_id: str) -> None:
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+            )
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            row = self._conn.execute(
+                """SELECT id, user_id, kind, status, created_at, started_at, finished_at, error, result, partial
+                   FROM jobs WHERE id = ?""",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        job_id, user_id, kind, status, created_at, started_at, finished_at, error, result, partial = row
+        plan = None
+        if result is not None:
+            plan = (WeeklyMealPlan if kind == "weekly" else DailyMealPlan).model_validate_json(result)
+        return Job(id=job_id, user_id=user_id, kind=kind, status=status, created_at=created_at,
+                   started_at=started_at, finished_at=finished_at, error=error, plan=plan,
+                   partial=json.loads(partial))
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+    def requeue_stale(self, older_than: float) -> int:
+        """Put jobs that have been running for longer than older_than seconds (orphaned by a crashed process) back in the queue"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE jobs SET status = ?, started_at = NULL, partial = '[]' WHERE status = ? AND started_at < ?",
+                (QUEUED, RUNNING, time.time() - older_than),
+            ).rowcount
+
+    def purge(self) -> None:
+        """Delete finished jobs older than ttl_seconds"""
+        if self.ttl_seconds is None:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({', '.join('?' * len(FINISHED_STATUSES))}) AND finished_at < ?",
+                (*FINISHED_STATUSES, time.time() - self.ttl_seconds),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class JobManager:
+    """Runs queued generation jobs on a bounded pool of worker threads"""
+
+    def __init__(self, planner: MealPlanner, queue: Optional[JobQueue] = None, max_workers: int = 4,
+                 max_jobs_per_user: int = 1, poll_interval: float = 1.0, requeue_after: float = 600.0):
+        """
+        max_workers: plans generated at once across all users
+        max_jobs_per_user: plans generated at once for one user; the rest of their jobs wait
+        poll_interval: how often idle workers check the queue for jobs submitted by other processes
+        requeue_after: on startup, jobs running for longer than this many seconds are assumed
+            orphaned by a crashed process and queued again
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_jobs_per_user < 1:
+            raise ValueError("max_jobs_per_user must be at least 1")
+        self.planner = planner
+        self.queue = queue or JobQueue()
+        self.max_workers = max_workers
+        self.max_jobs_per_user = max_jobs_per_user
+        self.poll_interval = poll_interval
+        self._wakeup = threading.Condition()
+        self._stopping = False
+        self.queue.requeue_stale(requeue_after)
+        self.queue.purge()
+        self._workers = [
+            threading.Thread(target=self._work, name=f"plan-job-{i}", daemon=True) for i in range(max_workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(self, user_id: str, user_profile: UserProfile, weekly: bool = False, use_cache: bool = True,
+               speculative: bool = False) -> str:
+        """Queue a plan for user_profile and return its job id without waiting for it.
+
+        speculative: run only after every requested plan; submitting the same plan later without
+            the flag adopts the job
+        """
+        request_key = self.planner.plan_key(user_profile, weekly=weekly)
+        job_id = self.queue.enqueue(user_id, user_profile, weekly, request_key, use_cache=use_cache,
+                                    speculative=speculative)
+        with self._wakeup:
+            self._wakeup.notify()
+        return job_id
+
+    def status(self, job_id: str) -> Optional[Job]:
+        return self.queue.get(job_id)
+
+    def cancel(self, job_id: str) -> None:
+        """Cancel a job; one already running finishes its LLM calls but its result is discarded"""
+        self.queue.cancel(job_id)
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Job:
+        """Block until a job finishes (for scripts and tests; the UI polls status instead)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.status(job_id)
+            if job is None:
+                raise KeyError(f"Unknown job {job_id}")
+            if job.finished:
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {job_id} still {job.status} after {timeout} seconds")
+            time.sleep(0.05)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers after their current jobs"""
+        with self._wakeup:
+            self._stopping = True
+            self._wakeup.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _work(self) -> None:
+        while True:
+            with self._wakeup:
+                if self._stopping:
+                    return
+            row = self.queue.claim(self.max_jobs_per_user)
+            if row is None:
+                with self._wakeup:
+                    if not self._stopping:
+                        self._wakeup.wait(self.poll_interval)
+                continue
+            self._run(*row)
+            # A finished job may unblock another job from the same user
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def _run(self, job_id: str, user_id: str, kind: str, profile_json: str, use_cache: int) -> None:
+        try:
+            user_profile = UserProfile.from_dict(json.loads(profile_json))
+            partial: List = []
+
+            def publish(item) -> None:
+                partial.append(item)
+                self.queue.update_partial(job_id, partial)
+
+            if kind == "weekly":
+                stream = self.planner.stream_weekly_meal_plan(user_profile, use_cache=bool(use_cache))
+                for day_index, daily_plan in stream:
+                    publish([day_index, daily_plan.model_dump()])
+            else:
+                stream = self.planner.stream_meal_plan(user_profile, use_cache=bool(use_cache))
+                for meal in stream:
+                    publish(meal.model_dump())
+            self.queue.finish(job_id, result=stream.plan.model_dump_json())
+        except Exception as e:
+            self.queue.finish(job_id, error=str(e))
@@ -0,0 +1,232 @@
+"""LLM backends other than the live Groq client.
+
+MealPlanner accepts any object with LangChain's chat-model interface - invoke(messages)
+returning a message with .content, and stream(messages) yielding chunks - through its llm=
+argument. This module provides two:
+
+- RecordingLLM wraps a real model and appends every prompt/response pair to a JSONL file.
+- StubLLM answers offline and deterministically, replaying a recording (or synthesizing valid
+  plans from the prompt) with configurable latency, jitter, token rate and error rate, so
+  benchmarks and tests need neither a network nor a GROQ_API_KEY.
+"""
+from typing import Callable, Dict, List, Optional
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from user_profile import MealFrequency
+from recipe_engine import MEAL_SLOTS
+from meal_prompts import MEAL_FORMAT, WEEKLY_PLAN_FORMAT, estimate_tokens, prompt_text
+
+# Tokens per streamed chunk; roughly what Groq sends
+STREAM_CHUNK_TOKENS = 4
+
+_MEAL_REQUEST = re.compile(r"Create only the (.+?) for this plan")
+_MEAL_CALORIES = re.compile(r"- Calories: (\d+(?:\.\d+)?)")
+_MEAL_FREQUENCY = re.compile(r"- Meal frequency: (\w+)")
+_CALORIE_TARGET = re.compile(r"- Daily calorie target: (\d+(?:\.\d+)?)")
+
+_ADJECTIVES = ("Roasted", "Grilled", "Spiced", "Herbed", "Zesty", "Smoky", "Creamy", "Crispy", "Braised", "Seared")
+_FOODS = (
+    "chicken", "salmon", "tofu", "lentils", "chickpeas", "quinoa", "brown rice", "oats", "spinach", "kale",
+    "broccoli", "sweet potato", "black beans", "turkey", "eggs", "greek yogurt", "almonds", "walnuts",
+    "avocado", "tomato", "bell pepper", "zucchini", "mushrooms", "cod", "shrimp", "tempeh", "barley",
+    "cauliflower", "carrots", "berries", "banana", "apple", "cottage cheese", "feta", "couscous", "peas",
+    "asparagus", "green beans", "buckwheat", "pumpkin seeds",
+)
+
+
+class StubLLMError(RuntimeError):
+    """Simulated provider failure; status_code 429 marks a simulated rate limit"""
+
+    def __init__(self, message: str, status_code: int = 500):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def prompt_key(prompt) -> str:
+    """Stable hash of a prompt, used to match replayed responses to requests"""
+    text = prompt if isinstance(prompt, str) else prompt_text(prompt)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def load_recording(path: str) -> Dict[str, List[str]]:
+    """prompt_key -> responses in the order they were recorded"""
+    responses: Dict[str, List[str]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                record = json.loads(line)
+                responses.setdefault(record["prompt_key"], []).append(record["response"])
+    return responses
+
+
+def _synthetic_meal(rng: random.Random, meal_type: str, calories: float) -> dict:
+    foods = rng.sample(_FOODS, 4)
+    return {
+        "name": f"{rng.choice(_ADJECTIVES)} {foods[0]} with {foods[1]}".title(),
+        "meal_type": meal_type,
+        "ingredients": [f"{rng.randrange(50, 250, 10)} g {food}" for food in foods],
+        "instructions": [f"Prepare the {foods[0]}", f"Cook with the {foods[1]} and {foods[2]}", f"Serve topped with {foods[3]}"],
+        "nutrition": {
+            "calories": round(calories),
+            "protein": round(calories * 0.3 / 4),
+            "carbs": round(calories * 0.4 / 4),
+            "fats": round(calories * 0.3 / 9),
+        },
+        "prep_time": rng.randrange(10, 45, 5),
+    }
+
+
+def _synthetic_day(rng: random.Random, meal_frequency: MealFrequency, target_calories: float) -> dict:
+    slots = MEAL_SLOTS.get(meal_frequency, MEAL_SLOTS[MealFrequency.THREE_MEALS])
+    meals = [_synthetic_meal(rng, label, target_calories * share) for label, _, share in slots]
+    return {
+        "meals": meals,
+        "total_calories": sum(meal["nutrition"]["calories"] for meal in meals),
+        "total_protein": sum(meal["nutrition"]["protein"] for meal in meals),
+        "total_carbs": sum(meal["nutrition"]["carbs"] for meal in meals),
+        "total_fats": sum(meal["nutrition"]["fats"] for meal in meals),
+    }
+
+
+def synthetic_response(prompt, rng: Optional[random.Random] = None) -> str:
+    """A valid JSON answer to a daily, weekly or single-meal prompt, shaped by the profile in it"""
+    rng = rng or random.Random(0)
+    text = prompt if isinstance(prompt, str) else prompt_text(prompt)
+    if MEAL_FORMAT in text:
+        meal_type = _MEAL_REQUEST.search(text)
+        calories = _MEAL_CALORIES.search(text)
+        return json.dumps(_synthetic_meal(rng, meal_type.group(1) if meal_type else "Lunch",
+                                          float(calories.group(1)) if calories else 500.0))
+
+    frequency = _MEAL_FREQUENCY.search(text)
+    try:
+        meal_frequency = MealFrequency(frequency.group(1)) if frequency else MealFrequency.THREE_MEALS
+    except ValueError:
+        meal_frequency = MealFrequency.THREE_MEALS
+    target = _CALORIE_TARGET.search(text)
+    target_calories = float(target.group(1)) if target else 2000.0
+    if WEEKLY_PLAN_FORMAT in text:
+        return json.dumps({"daily_plans": [_synthetic_day(rng, meal_frequency, target_calories) for _ in range(7)]})
+    return json.dumps(_synthetic_day(rng, meal_frequency, target_calories))
+
+
+class StubLLM:
+    """Deterministic offline stand-in for a chat model.
+
+    Responses come from `responses` (a recording from load_recording, replayed per prompt in
+    order and then cycled) or, for prompts with no recording, from `respond` (synthetic_response
+    by default). Each call sleeps latency + uniform(0, jitter) seconds before the first token,
+    then streams the completion at tokens_per_second. error_rate and rate_limit_rate make that
+    share of calls fail, with StubLLMError and with a 429 StubLLMError respectively. Failures and
+    jitter come from a seeded generator, so a run is reproducible for a given call order.
+    """
+
+    def __init__(self, responses: Optional[Dict[str, List[str]]] = None,
+                 respond: Optional[Callable[[object, random.Random], str]] = None,
+                 latency: float = 0.0, jitter: float = 0.0, tokens_per_second: Optional[float] = None,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        if latency < 0 or jitter < 0:
+            raise ValueError("latency and jitter cannot be negative")
+        if not 0 <= error_rate + rate_limit_rate <= 1:
+            raise ValueError("error_rate + rate_limit_rate must be between 0 and 1")
+        self.responses = responses or {}
+        self.respond = respond or synthetic_response
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.model_name = "stub"
+        self.calls = 0
+        self._replayed: Dict[str, int] = {}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_recording(cls, path: str, **options) -> "StubLLM":
+        return cls(responses=load_recording(path), **options)
+
+    def _next_response(self, prompt) -> tuple:
+        """(response text, delay before the first token, error to raise or None)"""
+        with self._lock:
+            self.calls += 1
+            delay = self.latency + (self._rng.uniform(0, self.jitter) if self.jitter else 0.0)
+            roll = self._rng.random()
+            if roll < self.rate_limit_rate:
+                return "", delay, StubLLMError("Rate limit reached (simulated)", status_code=429)
+            if roll < self.rate_limit_rate + self.error_rate:
+                return "", delay, StubLLMError("Simulated provider error")
+            key = prompt_key(prompt)
+            recorded = self.responses.get(key)
+            if recorded:
+                index = self._replayed.get(key, 0)
+                self._replayed[key] = index + 1
+                return recorded[index % len(recorded)], delay, None
+            # Generated under the lock so the seeded sequence does not depend on thread timing
+            return self.respond(prompt, self._rng), delay, None
+
+    def _usage(self, prompt, text: str) -> dict:
+        prompt_tokens = estimate_tokens(prompt if isinstance(prompt, str) else prompt_text(prompt))
+        completion_tokens = estimate_tokens(text)
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens}
+
+    def invoke(self, prompt, **kwargs) -> AIMessage:
+        text, delay, error = self._next_response(prompt)
+        if self.tokens_per_second and error is None:
+            delay += estimate_tokens(text) / self.tokens_per_second
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        return AIMessage(content=text, usage_metadata=self._usage(prompt, text))
+
+    def stream(self, prompt, **kwargs):
+        text, delay, error = self._next_response(prompt)
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        chunk_chars = STREAM_CHUNK_TOKENS * 4
+        chunk_delay = STREAM_CHUNK_TOKENS / self.tokens_per_second if self.tokens_per_second else 0.0
+        for start in range(0, len(text), chunk_chars):
+            if chunk_delay:
+                time.sleep(chunk_delay)
+            yield AIMessageChunk(content=text[start:start + chunk_chars])
+        # Like Groq, usage arrives with the last chunk
+        yield AIMessageChunk(content="", usage_metadata=self._usage(prompt, text))
+
+
+class RecordingLLM:
+    """Wraps a chat model and appends {prompt_key, prompt, response} to a JSONL file for StubLLM to replay"""
+
+    def __init__(self, llm, path: str):
+        self.llm = llm
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _record(self, prompt, response: str) -> None:
+        text = prompt if isinstance(prompt, str) else prompt_text(prompt)
+        line = json.dumps({"prompt_key": prompt_key(prompt), "prompt": text, "response": response})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    def invoke(self, prompt, **kwargs):
+        response = self.llm.invoke(prompt, **kwargs)
+        self._record(prompt, response.content if hasattr(response, "content") else str(response))
+        return response
+
+    def stream(self, prompt, **kwargs):
+        parts = []
+        for chunk in self.llm.stream(prompt, **kwargs):
+            parts.append(chunk.content if hasattr(chunk, "content") else str(chunk))
+            yield chunk
+        self._record(prompt, "".join(parts))
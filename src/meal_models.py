@@ -0,0 +1,150 @@
+from typing import List, Dict
+import re
+from pydantic import BaseModel, Field, model_validator
+
+meal_order = {
+    "breakfast": 0,
+    "morning snack": 1,
+    "lunch": 2,
+    "afternoon snack": 3,
+    "dinner": 4,
+    "first meal": 0,
+    "second meal": 1,
+    "final meal": 2,
+    "early morning meal": 0,
+    "mid-morning meal": 1,
+    "midday meal": 2,
+    "afternoon meal": 3,
+    "evening meal": 4
+}
+
+# DailyMealPlan total field for each nutrient key in Meal.nutrition
+TOTAL_FIELDS = {
+    "total_calories": "calories",
+    "total_protein": "protein",
+    "total_carbs": "carbs",
+    "total_fats": "fats",
+}
+
+_UNICODE_FRACTIONS = {"½": " 1/2", "⅓": " 1/3", "⅔": " 2/3", "¼": " 1/4", "¾": " 3/4", "⅛": " 1/8"}
+_AMOUNT = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+# Leading amount of an ingredient line, or range of amounts ("1-2 cups")
+_LEADING_AMOUNT = re.compile(rf"^\s*(?P<low>{_AMOUNT})(?:(?P<sep>\s*(?:-|–|to)\s*)(?P<high>{_AMOUNT}))?")
+# Fractions that amounts under 10 are rounded to when within _FRACTION_TOLERANCE
+_FRACTIONS = ((1 / 4, "1/4"), (1 / 3, "1/3"), (1 / 2, "1/2"), (2 / 3, "2/3"), (3 / 4, "3/4"))
+_FRACTION_TOLERANCE = 0.04
+
+class Meal(BaseModel):
+    name: str = Field(description="Name of the meal")
+    meal_type: str = Field(description="Type of meal (e.g., breakfast, lunch, dinner, morning snack, afternoon snack)")
+    ingredients: List[str] = Field(description="List of ingredients needed")
+    instructions: List[str] = Field(description="Step by step cooking instructions")
+    nutrition: Dict[str, float] = Field(description="Nutritional information including calories, protein, carbs, and fats")
+    prep_time: int = Field(description="Estimated preparation time in minutes")
+
+    def scaled(self, portion: float) -> "Meal":
+        """Copy of this meal at `portion` times its quantities: the leading amount of every
+        ingredient line and the nutrition are scaled"""
+        if portion == 1.0:
+            return self.model_copy(deep=True)
+        ingredients = [scale_ingredient(ingredient, portion) for ingredient in self.ingredients]
+        nutrition = {nutrient: round(value * portion, 1) for nutrient, value in self.nutrition.items()}
+        return self.model_copy(update={"ingredients": ingredients, "nutrition": nutrition}, deep=True)
+
+class DailyMealPlan(BaseModel):
+    breakfast: Meal
+    lunch: Meal
+    dinner: Meal
+    snacks: List[Meal] = Field(default_factory=list)
+
+    @model_validator(mode="before")
+    @classmethod
+    def _group_meals(cls, data):
+        # Convert meals list to specific meal types. Running as a validator (rather than in
+        # __init__) means nested daily plans inside a WeeklyMealPlan are converted too.
+        if isinstance(data, dict) and 'meals' in data:
+            data = dict(data)
+            meals = data.pop('meals')
+            # Sort meals based on meal_order
+            sorted_meals = sorted(meals, key=lambda x: meal_order.get(x['meal_type'].lower(), 999))
+            
+            # Process meals in the correct order. Meals stay as raw dicts here so field
+            # validation constructs each Meal exactly once.
+            for meal in sorted_meals:
+                meal_type = meal['meal_type'].lower()
+                if meal_type in ['breakfast', 'first meal', 'early morning meal']:
+                    data['breakfast'] = meal
+                elif meal_type in ['lunch', 'second meal', 'midday meal']:
+                    data['lunch'] = meal
+                elif meal_type in ['dinner', 'final meal', 'evening meal']:
+                    data['dinner'] = meal
+                else:
+                    if 'snacks' not in data:
+                        data['snacks'] = []
+                    data['snacks'].append(meal)
+        return data
+
+    @property
+    def meals(self) -> List[Meal]:
+        """Return all meals for the day including snacks"""
+        return [self.breakfast, self.lunch, self.dinner] + self.snacks
+
+    def with_meal(self, index: int, meal: Meal) -> "DailyMealPlan":
+        """Copy of this plan with meals[index] replaced and totals recomputed from meal nutrition"""
+        meals = self.meals
+        meals[index] = meal
+        return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **sum_totals(meals))
+
+    def scaled(self, portion: float) -> "DailyMealPlan":
+        """Copy of this plan with every meal's portion scaled and totals recomputed"""
+        meals = [meal.scaled(portion) for meal in self.meals]
+        return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **sum_totals(meals))
+    total_calories: float = Field(description="Total calories for all meals")
+    total_protein: float = Field(description="Total protein in grams")
+    total_carbs: float = Field(description="Total carbs in grams")
+    total_fats: float = Field(description="Total fats in grams")
+
+class WeeklyMealPlan(BaseModel):
+    daily_plans: List[DailyMealPlan] = Field(description="List of daily meal plans for the week")
+
+def sum_totals(meals: List[Meal]) -> Dict[str, float]:
+    """DailyMealPlan total_* values computed from the meals' nutrition"""
+    return {
+        total: round(sum(meal.nutrition.get(nutrient, 0.0) for meal in meals), 1)
+        for total, nutrient in TOTAL_FIELDS.items()
+    }
+
+def parse_amount(text: str) -> float:
+    """Value of an amount like "2", "1.5", "3/4" or "1 1/2" """
+    total = 0.0
+    for part in text.split():
+        numerator, _, denominator = part.partition("/")
+        total += float(numerator) / float(denominator) if denominator else float(numerator)
+    return total
+
+def format_amount(value: float) -> str:
+    """Kitchen-style amount: whole numbers from 10 up, "1 1/2"-style fractions or one decimal below"""
+    if value >= 10:
+        return str(round(value))
+    nearest = round(value)
+    if nearest and abs(value - nearest) <= _FRACTION_TOLERANCE:
+        return str(nearest)
+    whole = int(value)
+    for fraction, text in _FRACTIONS:
+        if abs(value - whole - fraction) <= _FRACTION_TOLERANCE:
+            return f"{whole} {text}" if whole else text
+    return format(value, ".1f") if value >= 1 else format(value, ".2g")
+
+def scale_ingredient(line: str, portion: float) -> str:
+    """An ingredient line with its leading amount (or range) multiplied by portion, e.g.
+    ("1/2 cup oats", 1.5) -> "3/4 cup oats"; lines without one ("salt, to taste") are unchanged"""
+    normalized = line
+    for fraction, replacement in _UNICODE_FRACTIONS.items():
+        normalized = normalized.replace(fraction, replacement)
+    match = _LEADING_AMOUNT.match(normalized)
+    if not match:
+        return line
+    amount = format_amount(parse_amount(match.group("low")) * portion)
+    if match.group("high"):
+        amount += match.group("sep") + format_amount(parse_amount(match.group("high")) * portion)
+    return amount + normalized[match.end():]
@@ -1,234 +1,770 @@
-from typing import List, Dict
-from langchain_groq import ChatGroq
-from langchain.prompts import ChatPromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Generator, List, Dict, Optional, Tuple, Type, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from enum import Enum
 from dotenv import load_dotenv
 import os
+import threading
+import time
 
 from user_profile import UserProfile, DietaryPreference, MealFrequency
+from meal_models import meal_order, Meal, DailyMealPlan, WeeklyMealPlan
+from plan_cache import PlanCache, make_cache_key
+from similarity_cache import SimilarityPlanCache
+from recipe_engine import RecipeEngine
+from meal_stream import IncrementalMealParser, PlanStream
+from plan_decoder import decode_plan
+from rate_limit import RateLimiter, RateLimitedLLM
+from metrics import METRICS, Metrics
+from variety import DEFAULT_SIMILARITY_THRESHOLD, exclusion_list, find_repeats
+from plan_repair import MealRequester, RepairReport, repair_daily_plan, repair_weekly_plan
+from meal_prompts import (PromptPrefixTracker, get_day_prompt_template, get_meal_prompt_template, get_meal_structure,
+                          get_prompt_template, render_day_prompt, render_meal_plan_prompt, render_meal_prompt)
 
-meal_order = {
-    "breakfast": 0,
-    "morning snack": 1,
-    "lunch": 2,
-    "afternoon snack": 3,
-    "dinner": 4,
-    "first meal": 0,
-    "second meal": 1,
-    "final meal": 2,
-    "early morning meal": 0,
-    "mid-morning meal": 1,
-    "midday meal": 2,
-    "afternoon meal": 3,
-    "evening meal": 4
-}
-
-class Meal(BaseModel):
-    name: str = Field(description="Name of the meal")
-    meal_type: str = Field(description="Type of meal (e.g., breakfast, lunch, dinner, morning snack, afternoon snack)")
-    ingredients: List[str] = Field(description="List of ingredients needed")
-    instructions: List[str] = Field(description="Step by step cooking instructions")
-    nutrition: Dict[str, float] = Field(description="Nutritional information including calories, protein, carbs, and fats")
-    prep_time: int = Field(description="Estimated preparation time in minutes")
-
-class DailyMealPlan(BaseModel):
-    breakfast: Meal
-    lunch: Meal
-    dinner: Meal
-    snacks: List[Meal] = Field(default_factory=list)
-
-    def __init__(self, **data):
-        # Convert meals list to specific meal types
-        if 'meals' in data:
-            meals = data.pop('meals')
-            # Sort meals based on meal_order
-            sorted_meals = sorted(meals, key=lambda x: meal_order.get(x['meal_type'].lower(), 999))
-            
-            # Process meals in the correct order
-            for meal in sorted_meals:
-                meal_type = meal['meal_type'].lower()
-                if meal_type in ['breakfast', 'first meal', 'early morning meal']:
-                    data['breakfast'] = Meal(**meal)
-                elif meal_type in ['lunch', 'second meal', 'midday meal']:
-                    data['lunch'] = Meal(**meal)
-                elif meal_type in ['dinner', 'final meal', 'evening meal']:
-                    data['dinner'] = Meal(**meal)
-                else:
-                    if 'snacks' not in data:
-                        data['snacks'] = []
-                    data['snacks'].append(Meal(**meal))
-        super().__init__(**data)
+# The LLM client stack (langchain_groq, groq, httpx) takes about a second to import, so it is
+# loaded when the first plan is generated, or earlier by MealPlanner.warm_up
+if TYPE_CHECKING:
+    import httpx
+    from langchain_groq import ChatGroq
+
+Plan = Union[DailyMealPlan, WeeklyMealPlan]
+
+DAYS_PER_WEEK = 7
+# A swapped meal is never asked to fit in less than this share of the daily targets
+MIN_MEAL_SHARE = 0.1
+
+class PlanSource(Enum):
+    LLM = "llm"                              # always ask the LLM
+    LOCAL = "local"                          # answer entirely from the local recipe engine
+    LLM_WITH_FALLBACK = "llm_with_fallback"  # ask the LLM, use the local engine if it fails or times out
+
+class WeeklyGenerationMode(Enum):
+    PER_DAY = "per_day"          # seven independent daily prompts, run concurrently
+    SINGLE_SHOT = "single_shot"  # one prompt returning all seven days
+
+@dataclass
+class GenerationStats:
+    """Token and latency accounting for one generation request"""
+    mode: str = ""
+    llm_calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    latency_seconds: float = 0.0
+    cache_hit: bool = False
+    near_cache_hit: bool = False    # served from SimilarityPlanCache, rescaled to this profile's targets
+    fallbacks: int = 0
+    shared_prefix_tokens: int = 0   # estimated prompt tokens repeated from the previous request's prefix
+    cached_prompt_tokens: int = 0   # prompt tokens the provider reports as served from its prefix cache
+    repairs: int = 0                # responses fixed by the repair pipeline instead of regenerated
+    repaired_meals: int = 0         # single meals regenerated during those repairs
+    repeated_meals: int = 0         # meals in the finished week that still repeat an earlier day's meal
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
 
     @property
-    def meals(self) -> List[Meal]:
-        """Return all meals for the day including snacks"""
-        return [self.breakfast, self.lunch, self.dinner] + self.snacks
-    total_calories: float = Field(description="Total calories for all meals")
-    total_protein: float = Field(description="Total protein in grams")
-    total_carbs: float = Field(description="Total carbs in grams")
-    total_fats: float = Field(description="Total fats in grams")
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+    def record_call(self, prompt_tokens: int, completion_tokens: int, shared_prefix_tokens: int = 0,
+                    cached_prompt_tokens: int = 0) -> None:
+        with self._lock:
+            self.llm_calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            self.shared_prefix_tokens += shared_prefix_tokens
+            self.cached_prompt_tokens += cached_prompt_tokens
+
+    def record_fallback(self) -> None:
+        with self._lock:
+            self.fallbacks += 1
 
-class WeeklyMealPlan(BaseModel):
-    daily_plans: List[DailyMealPlan] = Field(description="List of daily meal plans for the week")
+    def record_repair(self, repaired_meals: int) -> None:
+        with self._lock:
+            self.repairs += 1
+            self.repaired_meals += repaired_meals
+
+    def record_repeats(self, repeated_meals: int) -> None:
+        with self._lock:
+            self.repeated_meals += repeated_meals
+
+def _response_content(response) -> str:
+    """Extract the text content from an LLM response"""
+    if isinstance(response, tuple):
+        response = response[0]
+    return response.content if hasattr(response, 'content') else str(response)
+
+def _cached_prompt_tokens(response) -> int:
+    """Prompt tokens the provider served from its prefix cache, when it reports them"""
+    if isinstance(response, tuple):
+        response = response[0]
+    usage = getattr(response, 'usage_metadata', None) or {}
+    cached = (usage.get('input_token_details') or {}).get('cache_read')
+    if cached is None:
+        token_usage = (getattr(response, 'response_metadata', None) or {}).get('token_usage') or {}
+        cached = (token_usage.get('prompt_tokens_details') or {}).get('cached_tokens')
+    return cached or 0
+
+def _token_usage(response) -> tuple:
+    """Return (prompt_tokens, completion_tokens) reported by the provider, or zeros"""
+    if isinstance(response, tuple):
+        response = response[0]
+    usage = getattr(response, 'usage_metadata', None)
+    if usage:
+        return usage.get('input_tokens', 0), usage.get('output_tokens', 0)
+    token_usage = (getattr(response, 'response_metadata', None) or {}).get('token_usage') or {}
+    return token_usage.get('prompt_tokens', 0), token_usage.get('completion_tokens', 0)
+
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+DEFAULT_TEMPERATURE = 0.5
+HTTP_POOL_SIZE = 20
+HTTP_KEEPALIVE_SECONDS = 120.0
+
+def build_http_client(pool_size: int = HTTP_POOL_SIZE) -> "httpx.Client":
+    """HTTP client with a keep-alive connection pool, so repeated LLM calls reuse TLS connections"""
+    import httpx
+    return httpx.Client(
+        limits=httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size,
+            keepalive_expiry=HTTP_KEEPALIVE_SECONDS,
+        ),
+        timeout=httpx.Timeout(60.0, connect=10.0),
+    )
 
 class MealPlanner:
-    def __init__(self):
-        load_dotenv()
-        self.groq_api_key = os.getenv('GROQ_API_KEY')
-        if not self.groq_api_key:
-            raise ValueError("GROQ_API_KEY not found in environment variables")
-        
-        self.llm = ChatGroq(api_key=self.groq_api_key,
-        model = "llama-3.3-70b-versatile",
-        temperature = 0.5)
-        self.daily_plan_parser = PydanticOutputParser(pydantic_object=DailyMealPlan)
-        self.weekly_plan_parser = PydanticOutputParser(pydantic_object=WeeklyMealPlan)
+    def __init__(self, max_concurrency: int = DAYS_PER_WEEK, max_retries: int = 2, retry_backoff: float = 1.0,
+                 cache: Optional[PlanCache] = None, http_client: Optional["httpx.Client"] = None,
+                 source: PlanSource = PlanSource.LLM, recipe_engine: Optional[RecipeEngine] = None,
+                 llm_timeout: Optional[float] = None, repair: bool = True,
+                 variety_threshold: Optional[float] = DEFAULT_SIMILARITY_THRESHOLD, steer_variety: bool = False,
+                 rate_limiter: Optional[RateLimiter] = None, metrics: Optional[Metrics] = None, llm=None,
+                 similarity_cache: Optional[SimilarityPlanCache] = None):
+        """
+        A MealPlanner holds no per-request state, so one instance can be shared across threads and sessions.
+
+        source: where plans come from; LOCAL needs no GROQ_API_KEY
+        llm: chat model to use instead of Groq, e.g. llm_backends.StubLLM for offline runs; needs no
+            GROQ_API_KEY
+        recipe_engine: local engine used by LOCAL and LLM_WITH_FALLBACK; defaults to the bundled catalog
+        llm_timeout: per-request LLM timeout in seconds; with LLM_WITH_FALLBACK a slow call falls back locally
+        repair: fix responses that fail validation locally, asking the LLM only for missing or invalid
+            meals, instead of regenerating the whole plan
+        variety_threshold: ingredient-set similarity at which a weekly meal counts as a repeat of an
+            earlier day's meal, for the repeated_meals stat; None skips the count
+        steer_variety: generate per-day weeks in waves of 1, 2 and 4 days whose prompts list the
+            meals of the waves before, so later days avoid repeats. Still seven LLM calls, but three
+            sequential rounds instead of one, so a week takes about three times as long; off by default
+        cache: optional plan cache; hits skip both the LLM call and response parsing
+        similarity_cache: optional near-match cache consulted after an exact miss; serves a plan
+            generated for a profile with the same constraints and similar targets, rescaled
+        http_client: HTTP client for the Groq API; defaults to a pooled keep-alive client
+        rate_limiter: paces every LLM call against the key's request/token quotas, adapts how many
+            calls run at once and retries 429s; defaults to one configured from GROQ_REQUESTS_PER_MINUTE
+            and GROQ_TOKENS_PER_MINUTE. Share one limiter between planners using the same key.
+        metrics: registry for stage timings, token counts, cache hits and retries; defaults to the
+            process-wide METRICS
+        max_concurrency: number of days of a weekly plan generated in parallel
+        max_retries: extra attempts for a single day before the weekly plan fails
+        retry_backoff: base delay in seconds between retries (doubled on each attempt)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        if max_retries < 0:
+            raise ValueError("max_retries cannot be negative")
+        self.source = source
+        self.recipe_engine = recipe_engine
+        if source != PlanSource.LLM and self.recipe_engine is None:
+            self.recipe_engine = RecipeEngine()
+
+        self.model_name = DEFAULT_MODEL
+        self.temperature = DEFAULT_TEMPERATURE
+        self.http_client = http_client
+        self.rate_limiter = None
+        self._llm = None
+        self._llm_factory = None
+        self._llm_lock = threading.Lock()
+        if source != PlanSource.LOCAL:
+            pool_size = max(HTTP_POOL_SIZE, max_concurrency)
+            self.rate_limiter = rate_limiter or RateLimiter.from_env(max_concurrency=pool_size,
+                                                                     initial_concurrency=max_concurrency)
+            if llm is not None:
+                self._llm = RateLimitedLLM(llm, self.rate_limiter)
+            else:
+                # The key is checked now so a missing one fails at startup, not at the first request
+                load_dotenv()
+                self.groq_api_key = os.getenv('GROQ_API_KEY')
+                if not self.groq_api_key:
+                    raise ValueError("GROQ_API_KEY not found in environment variables")
+                self._llm_factory = lambda: self._build_groq_llm(pool_size, llm_timeout)
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.cache = cache
+        self.similarity_cache = similarity_cache
+        self.repair = repair
+        self.variety_threshold = variety_threshold
+        self.steer_variety = steer_variety
+        self.prompt_prefix_tracker = PromptPrefixTracker()
+        self.metrics = metrics if metrics is not None else METRICS
+        if self.rate_limiter is not None:
+            limiter = self.rate_limiter
+            self.metrics.register_callback("llm_concurrency_limit", "gauge",
+                                           "Parallel LLM calls currently allowed by the rate limiter",
+                                           lambda: limiter.concurrency.limit)
+            self.metrics.register_callback("llm_throttles_total", "counter",
+                                           "LLM calls rejected by the provider with a 429", lambda: limiter.throttles)
+
+    @property
+    def llm(self):
+        """The rate-limited chat model; the Groq client is built, and LangChain imported, on first use"""
+        if self._llm is None and self._llm_factory is not None:
+            with self._llm_lock:
+                if self._llm is None:
+                    self._llm = RateLimitedLLM(self._llm_factory(), self.rate_limiter)
+        return self._llm
+
+    @llm.setter
+    def llm(self, llm) -> None:
+        self._llm = llm
+
+    def warm_up(self) -> None:
+        """Import the LLM stack, build the client and compile every prompt template ahead of the first request.
+
+        Meant for a background thread at startup; without it the first generation pays these costs.
+        """
+        for meal_frequency in MealFrequency:
+            for weekly in (False, True):
+                get_prompt_template(meal_frequency, weekly)
+            get_day_prompt_template(meal_frequency)
+        get_meal_prompt_template()
+        self.llm
+
+    def _build_groq_llm(self, pool_size: int, llm_timeout: Optional[float]) -> "ChatGroq":
+        from langchain_groq import ChatGroq
+
+        llm_options = {"timeout": llm_timeout} if llm_timeout is not None else {}
+        self.http_client = self.http_client or build_http_client(pool_size)
+        # Every response's x-ratelimit-* headers update the limiter, streamed ones included
+        event_hooks = self.http_client.event_hooks
+        event_hooks["response"] = [*event_hooks.get("response", []), self.rate_limiter.observe_response]
+        self.http_client.event_hooks = event_hooks
+        # The SDK's own retries would hide 429s from the limiter, so it retries them instead
+        return ChatGroq(api_key=self.groq_api_key,
+            model = self.model_name,
+            temperature = self.temperature,
+            http_client = self.http_client,
+            max_retries = 0,
+            **llm_options)
 
     def _get_meal_structure(self, meal_frequency: MealFrequency) -> str:
-        meal_structures = {
-            MealFrequency.THREE_MEALS: """
-                - Breakfast (morning)
-                - Lunch (midday)
-                - Dinner (evening)""",
-            MealFrequency.FIVE_MEALS: """
-                - Breakfast (early morning)
-                - Morning Snack (mid-morning)
-                - Lunch (midday)
-                - Afternoon Snack (mid-afternoon)
-                - Dinner (evening)""",
-            MealFrequency.INTERMITTENT_FASTING: """
-                For 16/8 Intermittent Fasting schedule (16 hours fasting, 8 hours eating window):
-                - First Meal (12:00 PM - Breaking fast)
-                - Second Meal (3:00 PM - Midday meal)
-                - Final Meal (7:00 PM - Last meal before fasting)
-                
-                Note: Meals should be substantial and nutrient-dense to meet daily requirements within the eating window.""",
-            MealFrequency.CUSTOM: """
-                - Early Morning Meal
-                - Mid-Morning Meal
-                - Midday Meal
-                - Afternoon Meal
-                - Evening Meal"""
-        }
-        return meal_structures.get(meal_frequency, meal_structures[MealFrequency.THREE_MEALS])
+        return get_meal_structure(meal_frequency)
 
-    def _create_meal_plan_prompt(self, user_profile: UserProfile) -> str:
-        meal_structure = self._get_meal_structure(user_profile.meal_frequency)
-        
-        base_prompt = f"""You are a professional nutritionist and meal planner. Create a daily meal plan that meets the following requirements:
-            - Matches the user's dietary preferences and restrictions
-            - Meets caloric and macronutrient targets
-            - Includes healthy, balanced meals
-            - Provides variety and is practical to prepare
-            - Considers the user's cooking skill level and available prep time
-            - Follows this specific meal structure:{meal_structure}
-            - Incorporates preferred cuisines and avoids disliked foods"""
-
-        if user_profile.meal_frequency == MealFrequency.INTERMITTENT_FASTING:
-            base_prompt += """
-            
-            For Intermittent Fasting:
-            - Design exactly 3 substantial meals within the 8-hour eating window
-            - First meal should break the fast and be easily digestible
-            - Space meals ~3 hours apart
-            - Ensure each meal is nutrient-dense and satisfying
-            - Include protein in each meal to maintain satiety
-            - Consider adding healthy fats for sustained energy
-            - Include complex carbs for sustained energy
-            - Ensure the last meal is substantial enough to sustain through the fasting period"""
-        
-        prompt_template = ChatPromptTemplate.from_messages([
-            ("system", base_prompt),
-            ("user", """Please create a daily meal plan for a user with the following profile:
-            - Dietary preference: {dietary_preference}
-            - Meal frequency: {meal_frequency}
-            - Food preferences: {food_preference}
-            - Cooking skill level: {cooking_skill}
-            - Available meal prep time: {meal_prep_time} minutes
-            - Preferred cuisines: {preferred_cuisines}
-            - Disliked foods: {disliked_foods}
-            - Daily calorie target: {target_calories}
-            - Protein target: {protein_target}g
-            - Carbs target: {carbs_target}g
-            - Fats target: {fats_target}g
-            - Any allergies: {allergies}
-            
-            Format the response as a JSON object with:
-            - meals: list of meal objects, each containing:
-              - name: string
-              - meal_type: string (e.g., "First Meal", "Second Meal", "Final Meal" for IF)
-              - ingredients: list of strings
-              - instructions: list of strings (each string being one step)
-              - nutrition: object with calories, protein, carbs, and fats as numbers
-              - prep_time: number (in minutes)
-            - total_calories: number
-            - total_protein: number
-            - total_carbs: number
-            - total_fats: number""")
-        ])
-
-        macros = user_profile.calculate_macros()
-        allergies = user_profile.allergies if user_profile.allergies else "None"
-        disliked_foods = user_profile.disliked_foods if user_profile.disliked_foods else "None"
-        preferred_cuisines = user_profile.preferred_cuisines if user_profile.preferred_cuisines else "No specific preferences"
-
-        return prompt_template.format_messages(
-            dietary_preference=user_profile.dietary_preference.value,
-            meal_frequency=user_profile.meal_frequency.value,
-            food_preference=user_profile.food_preference.value,
-            cooking_skill=user_profile.cooking_skill.value,
-            meal_prep_time=user_profile.meal_prep_time,
-            preferred_cuisines=preferred_cuisines,
-            disliked_foods=disliked_foods,
-            target_calories=user_profile.calculate_target_calories(),
-            protein_target=macros['protein'],
-            carbs_target=macros['carbs'],
-            fats_target=macros['fats'],
-            allergies=allergies
-        )
-
-    def generate_meal_plan(self, user_profile: UserProfile) -> DailyMealPlan:
+    def _create_meal_plan_prompt(self, user_profile: UserProfile, weekly: bool = False) -> List:
+        """Render the prompt from the memoized template for the profile's meal frequency"""
+        with self.metrics.stage("prompt"):
+            return render_meal_plan_prompt(user_profile, weekly=weekly)
+
+    def _create_day_prompt(self, user_profile: UserProfile, day: int, avoid_meals: List[str]) -> List:
+        with self.metrics.stage("prompt"):
+            return render_day_prompt(user_profile, day, avoid_meals)
+
+    def close(self) -> None:
+        """Release pooled HTTP connections"""
+        if self.http_client is not None:
+            self.http_client.close()
+
+    def _cache_key(self, prompt, scope: str) -> str:
+        return make_cache_key(prompt, self.model_name, self.temperature, scope=scope)
+
+    def plan_key(self, user_profile: UserProfile, weekly: bool = False) -> str:
+        """Content hash of the request a profile produces; profiles with equal keys get interchangeable plans"""
+        return self._cache_key(self._create_meal_plan_prompt(user_profile), "weekly" if weekly else "daily")
+
+    def _record_llm_call(self, stats: Optional[GenerationStats], prompt_tokens: int, completion_tokens: int,
+                         shared_prefix_tokens: int, cached_prompt_tokens: int) -> None:
+        self.metrics.inc("llm_calls_total")
+        self.metrics.inc("llm_prompt_tokens_total", prompt_tokens)
+        self.metrics.inc("llm_completion_tokens_total", completion_tokens)
+        if stats is not None:
+            stats.record_call(prompt_tokens, completion_tokens, shared_prefix_tokens=shared_prefix_tokens,
+                              cached_prompt_tokens=cached_prompt_tokens)
+
+    def _record_cache_lookup(self, result: str) -> None:
+        self.metrics.inc("cache_requests_total", labels=(("result", result),))
+
+    def _cached_plan(self, user_profile: UserProfile, cache_key: Optional[str], plan_type: Type[Plan],
+                     stats: Optional[GenerationStats]) -> Optional[Plan]:
+        """Look a plan up in the exact cache, then in the near-match cache, recording the outcome"""
+        plan = self.cache.get(cache_key, plan_type) if cache_key is not None else None
+        if plan is not None:
+            self._record_cache_lookup("hit")
+        elif self.similarity_cache is not None:
+            plan = self.similarity_cache.get(user_profile, plan_type, self.model_name, self.temperature)
+            if plan is not None:
+                self._record_cache_lookup("near_hit")
+                if stats is not None:
+                    stats.near_cache_hit = True
+        if plan is None:
+            self._record_cache_lookup("miss")
+        elif stats is not None:
+            stats.cache_hit = True
+        return plan
+
+    def _store_plan(self, user_profile: UserProfile, cache_key: Optional[str], plan: Plan) -> None:
+        if cache_key is not None:
+            self.cache.set(cache_key, plan)
+        if self.similarity_cache is not None:
+            self.similarity_cache.set(user_profile, plan, self.model_name, self.temperature)
+
+    def _use_cache(self, use_cache: bool) -> bool:
+        return use_cache and (self.cache is not None or self.similarity_cache is not None)
+
+    def _lookup_key(self, prompt, scope: str) -> Optional[str]:
+        return self._cache_key(prompt, scope) if self.cache is not None else None
+
+    def _record_fallback(self, stats: Optional[GenerationStats]) -> None:
+        self.metrics.inc("fallbacks_total")
+        if stats is not None:
+            stats.record_fallback()
+
+    def _record_repair(self, stats: Optional[GenerationStats], report: RepairReport) -> None:
+        self.metrics.inc("repairs_total")
+        if stats is not None:
+            stats.record_repair(len(report.regenerated_meals))
+
+    def _invoke_llm(self, prompt, stats: Optional[GenerationStats] = None) -> str:
+        """Call the LLM and return the response text, recording token usage in stats"""
+        shared_prefix_tokens = self.prompt_prefix_tracker.observe(prompt)
+        with self.metrics.stage("llm"):
+            response = self.llm.invoke(prompt)
+        self._record_llm_call(stats, *_token_usage(response), shared_prefix_tokens=shared_prefix_tokens,
+                              cached_prompt_tokens=_cached_prompt_tokens(response))
+        return _response_content(response)
+
+    def generate_meal_plan(self, user_profile: UserProfile, use_cache: bool = True,
+                           stats: Optional[GenerationStats] = None) -> DailyMealPlan:
         """Generate a daily meal plan based on user profile and preferences"""
-        prompt = self._create_meal_plan_prompt(user_profile)
-        response = self.llm.invoke(prompt)
+        if self.source == PlanSource.LOCAL:
+            return self.recipe_engine.generate_daily_plan(user_profile)
+        try:
+            return self._generate_llm_meal_plan(user_profile, use_cache, stats)
+        except Exception:
+            if self.source != PlanSource.LLM_WITH_FALLBACK:
+                raise
+            self._record_fallback(stats)
+            return self.recipe_engine.generate_daily_plan(user_profile)
+
+    def _generate_llm_meal_plan(self, user_profile: UserProfile, use_cache: bool,
+                                stats: Optional[GenerationStats], prompt: Optional[List] = None) -> DailyMealPlan:
+        started = time.perf_counter()
+        prompt = prompt if prompt is not None else self._create_meal_plan_prompt(user_profile)
+
+        caching = self._use_cache(use_cache)
+        cache_key = self._lookup_key(prompt, "daily") if caching else None
+        if caching:
+            cached_plan = self._cached_plan(user_profile, cache_key, DailyMealPlan, stats)
+            if cached_plan is not None:
+                if stats is not None:
+                    stats.latency_seconds = time.perf_counter() - started
+                return cached_plan
+
+        response_content = self._invoke_llm(prompt, stats)
         
         try:
-            # Ensure we're working with the content string
-            if isinstance(response, tuple):
-                response_content = response[0].content if hasattr(response[0], 'content') else str(response[0])
-            else:
-                response_content = response.content if hasattr(response, 'content') else str(response)
-            
-            # Parse the response
-            parsed_plan = self.daily_plan_parser.parse(response_content)
-            
-            # Validate the parsed plan
-            if not isinstance(parsed_plan, DailyMealPlan):
-                raise ValueError("Failed to parse response into DailyMealPlan")
-            
+            parsed_plan = self._decode_daily_plan(response_content, user_profile, stats)
+
+            if caching:
+                self._store_plan(user_profile, cache_key, parsed_plan)
             return parsed_plan
         except Exception as e:
             raise ValueError(f"Failed to generate meal plan: {str(e)}")
+        finally:
+            if stats is not None:
+                stats.latency_seconds = time.perf_counter() - started
+
+    @staticmethod
+    def _daily_targets(user_profile: UserProfile) -> Dict[str, float]:
+        """Daily calorie and macro targets keyed like Meal.nutrition"""
+        return {"calories": user_profile.calculate_target_calories(), **user_profile.calculate_macros()}
+
+    def _generate_single_meal(self, user_profile: UserProfile, meal_type: str, budget: Dict[str, float],
+                              avoid_meals: List[str], stats: Optional[GenerationStats]) -> Meal:
+        """Ask the LLM for one meal that fits a calorie/macro budget"""
+        with self.metrics.stage("prompt"):
+            prompt = render_meal_prompt(user_profile, meal_type, budget, avoid_meals)
+        response_content = self._invoke_llm(prompt, stats)
+        with self.metrics.stage("decode"):
+            meal = decode_plan(response_content, Meal)
+        return meal.model_copy(update={"meal_type": meal_type})
+
+    def _meal_requester(self, user_profile: UserProfile, stats: Optional[GenerationStats]) -> MealRequester:
+        targets = self._daily_targets(user_profile)
+
+        def request_meal(meal_type: str, share: float, existing_meals: List[Meal]) -> Meal:
+            budget = {nutrient: value * share for nutrient, value in targets.items()}
+            return self._generate_single_meal(user_profile, meal_type, budget,
+                                              [meal.name for meal in existing_meals], stats)
+        return request_meal
+
+    def _decode_daily_plan(self, response_content: str, user_profile: UserProfile,
+                           stats: Optional[GenerationStats]) -> DailyMealPlan:
+        """Decode a daily response, repairing it rather than failing when it does not validate"""
+        try:
+            with self.metrics.stage("decode"):
+                return decode_plan(response_content, DailyMealPlan)
+        except Exception:
+            if not self.repair:
+                raise
+        report = RepairReport()
+        with self.metrics.stage("repair"):
+            daily_plan = repair_daily_plan(response_content, user_profile.meal_frequency,
+                                           self._meal_requester(user_profile, stats), report)
+        self._record_repair(stats, report)
+        return daily_plan
 
-    def generate_weekly_meal_plan(self, user_profile: UserProfile) -> WeeklyMealPlan:
-        """Generate a weekly meal plan based on user profile and preferences"""
+    def _decode_weekly_plan(self, response_content: str, user_profile: UserProfile,
+                            stats: Optional[GenerationStats]) -> WeeklyMealPlan:
+        """Decode a single-shot weekly response; broken days are repaired and only unrecoverable days regenerated"""
         try:
-            weekly_plan = []
-            for day in range(7):  # Generate 7 days of meal plans
+            with self.metrics.stage("decode"):
+                weekly_plan = decode_plan(response_content, WeeklyMealPlan)
+            if len(weekly_plan.daily_plans) == DAYS_PER_WEEK:
+                return weekly_plan
+            error = ValueError(f"Expected {DAYS_PER_WEEK} days, got {len(weekly_plan.daily_plans)}")
+        except Exception as e:
+            error = e
+        if not self.repair:
+            raise error
+
+        report = RepairReport()
+        with self.metrics.stage("repair"):
+            daily_plans = repair_weekly_plan(response_content, user_profile.meal_frequency, DAYS_PER_WEEK,
+                                             self._meal_requester(user_profile, stats), report)
+        for day in report.dropped_days:
+            avoid_meals = exclusion_list(plan for plan in daily_plans if plan is not None)
+            daily_plans[day] = self._generate_day_with_retries(user_profile, day, stats, avoid_meals)
+        self._record_repair(stats, report)
+        return WeeklyMealPlan(daily_plans=daily_plans)
+
+    def _generate_day_with_retries(self, user_profile: UserProfile, day: int,
+                                   stats: Optional[GenerationStats] = None,
+                                   avoid_meals: Optional[List[str]] = None) -> DailyMealPlan:
+        """Generate one day of a weekly plan, retrying only that day on failure.
+
+        avoid_meals names meals other days already use; the day's prompt asks for different ones.
+        """
+        avoid_meals = avoid_meals or []
+        if self.source == PlanSource.LOCAL:
+            return self.recipe_engine.generate_daily_plan(user_profile, day=day, avoid_names=avoid_meals)
+
+        # With a local fallback there is no point waiting on LLM retries
+        attempts = 1 if self.source == PlanSource.LLM_WITH_FALLBACK else self.max_retries + 1
+        last_error = None
+        started = time.perf_counter()
+        prompt = self._create_day_prompt(user_profile, day, avoid_meals)
+        for attempt in range(attempts):
+            if attempt:
+                self.metrics.inc("retries_total")
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            try:
+                # Days must not come from the daily cache, or all seven would be identical
+                daily_plan = self._generate_llm_meal_plan(user_profile, use_cache=False, stats=stats, prompt=prompt)
+                if not isinstance(daily_plan, DailyMealPlan):
+                    raise ValueError("Invalid daily meal plan generated")
+                self.metrics.observe("day_seconds", time.perf_counter() - started)
+                return daily_plan
+            except Exception as e:
+                last_error = e
+
+        if self.source == PlanSource.LLM_WITH_FALLBACK:
+            self._record_fallback(stats)
+            return self.recipe_engine.generate_daily_plan(user_profile, day=day, avoid_names=avoid_meals)
+        raise ValueError(f"Error generating plan for day {day + 1} after {attempts} attempts: {str(last_error)}") from last_error
+
+    def _day_waves(self) -> List[range]:
+        """Groups of days generated together: the whole week, or 1, 2, then 4 days when steering variety"""
+        if not self.steer_variety:
+            return [range(DAYS_PER_WEEK)]
+        waves = []
+        start, size = 0, 1
+        while start < DAYS_PER_WEEK:
+            waves.append(range(start, min(start + size, DAYS_PER_WEEK)))
+            start, size = start + size, size * 2
+        return waves
+
+    def _iter_week_per_day(self, user_profile: UserProfile, max_concurrency: Optional[int],
+                           stats: Optional[GenerationStats]) -> Generator[Tuple[int, DailyMealPlan], None, WeeklyMealPlan]:
+        """Run the daily generations concurrently, yielding (day, plan) as each finishes.
+
+        With steer_variety, days run in waves and each wave's prompts carry the meals of the waves
+        before it, so later days are steered away from repeats without any extra LLM calls. Either
+        way every yielded day is final.
+        """
+        workers = min(DAYS_PER_WEEK, max_concurrency or self.max_concurrency)
+        daily_plans: List[Optional[DailyMealPlan]] = [None] * DAYS_PER_WEEK
+        errors = []
+
+        # Each day retries independently, so one failing day never discards the ones that succeeded
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="meal-plan-day") as executor:
+            for wave in self._day_waves():
+                avoid_meals = exclusion_list(plan for plan in daily_plans if plan is not None)
+                futures = {
+                    executor.submit(self._generate_day_with_retries, user_profile, day, stats, avoid_meals): day
+                    for day in wave
+                }
+                for future in as_completed(futures):
+                    day = futures[future]
+                    try:
+                        daily_plans[day] = future.result()
+                    except Exception as e:
+                        errors.append((day, e))
+                        continue
+                    yield day, daily_plans[day]
+
+        if errors:
+            errors.sort(key=lambda error: error[0])
+            # Chained to the first failure so callers can still tell a rate limit from other errors
+            raise ValueError("; ".join(str(error) for _, error in errors)) from errors[0][1]
+
+        return WeeklyMealPlan(daily_plans=daily_plans)
+
+    def _generate_week_per_day(self, user_profile: UserProfile, max_concurrency: Optional[int],
+                               stats: Optional[GenerationStats]) -> WeeklyMealPlan:
+        stream = PlanStream(self._iter_week_per_day(user_profile, max_concurrency, stats))
+        for _ in stream:
+            pass
+        return stream.plan
+
+    def _generate_week_single_shot(self, user_profile: UserProfile,
+                                   stats: Optional[GenerationStats]) -> WeeklyMealPlan:
+        """Ask for all seven days in one prompt and decode them as a WeeklyMealPlan"""
+        prompt = self._create_meal_plan_prompt(user_profile, weekly=True)
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                self.metrics.inc("retries_total")
+                time.sleep(self.retry_backoff * (2 ** (attempt - 1)))
+            try:
+                return self._decode_weekly_plan(self._invoke_llm(prompt, stats), user_profile, stats)
+            except Exception as e:
+                last_error = e
+        raise ValueError(f"Single-shot weekly generation failed after {self.max_retries + 1} attempts: {str(last_error)}") from last_error
+
+    def generate_weekly_meal_plan(self, user_profile: UserProfile, max_concurrency: Optional[int] = None,
+                                  mode: WeeklyGenerationMode = WeeklyGenerationMode.PER_DAY,
+                                  stats: Optional[GenerationStats] = None, use_cache: bool = True) -> WeeklyMealPlan:
+        """Generate a weekly meal plan, either as seven concurrent daily calls or one single-shot call"""
+        if self.source == PlanSource.LOCAL:
+            return self._record_repeats(self.recipe_engine.generate_weekly_plan(user_profile), stats)
+
+        started = time.perf_counter()
+        # Always track stats internally so weeks containing fallback days are not cached
+        stats = stats if stats is not None else GenerationStats()
+        stats.mode = mode.value
+
+        caching = self._use_cache(use_cache)
+        cache_key = self.plan_key(user_profile, weekly=True) if caching and self.cache is not None else None
+        if caching:
+            cached_plan = self._cached_plan(user_profile, cache_key, WeeklyMealPlan, stats)
+            if cached_plan is not None:
+                stats.latency_seconds = time.perf_counter() - started
+                return cached_plan
+
+        try:
+            if mode == WeeklyGenerationMode.SINGLE_SHOT:
+                weekly_plan = self._generate_week_single_shot(user_profile, stats)
+            else:
+                weekly_plan = self._generate_week_per_day(user_profile, max_concurrency, stats)
+            self._record_repeats(weekly_plan, stats)
+        except Exception as e:
+            if self.source != PlanSource.LLM_WITH_FALLBACK:
+                raise ValueError(f"Failed to generate weekly meal plan: {str(e)}")
+            self._record_fallback(stats)
+            weekly_plan = self.recipe_engine.generate_weekly_plan(user_profile)
+        finally:
+            stats.latency_seconds = time.perf_counter() - started
+
+        if caching and not stats.fallbacks:
+            self._store_plan(user_profile, cache_key, weekly_plan)
+        return weekly_plan
+
+    def compare_weekly_modes(self, user_profile: UserProfile) -> Dict[WeeklyGenerationMode, GenerationStats]:
+        """Generate an uncached week in every mode and return the token/latency stats of each"""
+        results = {}
+        for mode in WeeklyGenerationMode:
+            stats = GenerationStats()
+            self.generate_weekly_meal_plan(user_profile, mode=mode, stats=stats, use_cache=False)
+            results[mode] = stats
+        return results
+
+    def regenerate_meal(self, user_profile: UserProfile, plan: Union[DailyMealPlan, WeeklyMealPlan],
+                        meal_index: int, day: Optional[int] = None,
+                        stats: Optional[GenerationStats] = None) -> Union[DailyMealPlan, WeeklyMealPlan]:
+        """Swap one meal of an existing plan, leaving the other meals untouched.
+
+        meal_index indexes DailyMealPlan.meals; day selects the day of a WeeklyMealPlan. Only the
+        replacement meal is generated, sized to the calorie/macro budget the other meals leave;
+        the plan's totals are recomputed locally. Returns a new plan of the same type.
+        """
+        if isinstance(plan, WeeklyMealPlan):
+            if day is None or not 0 <= day < len(plan.daily_plans):
+                raise ValueError("A valid day index is required to swap a meal in a weekly plan")
+            daily_plan = self.regenerate_meal(user_profile, plan.daily_plans[day], meal_index, stats=stats)
+            daily_plans = list(plan.daily_plans)
+            daily_plans[day] = daily_plan
+            return WeeklyMealPlan(daily_plans=daily_plans)
+
+        meals = plan.meals
+        if not 0 <= meal_index < len(meals):
+            raise ValueError(f"No meal at index {meal_index}; the plan has {len(meals)} meals")
+
+        started = time.perf_counter()
+        try:
+            new_meal = self._replacement_meal(user_profile, plan, meal_index, [meal.name for meal in meals], stats)
+        except Exception as e:
+            raise ValueError(f"Failed to regenerate {meals[meal_index].meal_type}: {str(e)}")
+        finally:
+            if stats is not None:
+                stats.latency_seconds = time.perf_counter() - started
+        return plan.with_meal(meal_index, new_meal)
+
+    def _replacement_meal(self, user_profile: UserProfile, daily_plan: DailyMealPlan, meal_index: int,
+                          avoid_meals: List[str], stats: Optional[GenerationStats]) -> Meal:
+        """Generate a meal for daily_plan.meals[meal_index], sized to the budget the other meals leave"""
+        meals = daily_plan.meals
+        meal_type = meals[meal_index].meal_type
+        others = meals[:meal_index] + meals[meal_index + 1:]
+        targets = self._daily_targets(user_profile)
+        budget = {
+            nutrient: max(target - sum(meal.nutrition.get(nutrient, 0.0) for meal in others), target * MIN_MEAL_SHARE)
+            for nutrient, target in targets.items()
+        }
+        if self.source == PlanSource.LOCAL:
+            return self.recipe_engine.generate_meal(user_profile, meal_type, budget, avoid_meals)
+        try:
+            return self._generate_single_meal(user_profile, meal_type, budget, avoid_meals, stats)
+        except Exception:
+            if self.source != PlanSource.LLM_WITH_FALLBACK:
+                raise
+            self._record_fallback(stats)
+            return self.recipe_engine.generate_meal(user_profile, meal_type, budget, avoid_meals)
+
+    def _record_repeats(self, weekly_plan: WeeklyMealPlan, stats: Optional[GenerationStats]) -> WeeklyMealPlan:
+        """Count the meals that still repeat an earlier day; the plan itself is left as generated"""
+        if self.variety_threshold is None:
+            return weekly_plan
+        repeated_meals = len(find_repeats(weekly_plan.daily_plans, self.variety_threshold))
+        self.metrics.inc("repeated_meals_total", repeated_meals)
+        if stats is not None:
+            stats.record_repeats(repeated_meals)
+        return weekly_plan
+
+    def _stream_daily(self, user_profile: UserProfile, use_cache: bool,
+                      stats: Optional[GenerationStats]) -> Generator[Meal, None, DailyMealPlan]:
+        if self.source != PlanSource.LOCAL:
+            streamed_meals = 0
+            try:
+                llm_stream = PlanStream(self._stream_llm_daily(user_profile, use_cache, stats))
+                for meal in llm_stream:
+                    streamed_meals += 1
+                    yield meal
+                return llm_stream.plan
+            except Exception:
+                # Meals already on screen can't be swapped for a different local plan
+                if self.source != PlanSource.LLM_WITH_FALLBACK or streamed_meals:
+                    raise
+                self._record_fallback(stats)
+
+        daily_plan = self.recipe_engine.generate_daily_plan(user_profile)
+        yield from daily_plan.meals
+        return daily_plan
+
+    def _stream_llm_daily(self, user_profile: UserProfile, use_cache: bool,
+                          stats: Optional[GenerationStats]) -> Generator[Meal, None, DailyMealPlan]:
+        started = time.perf_counter()
+        prompt = self._create_meal_plan_prompt(user_profile)
+
+        caching = self._use_cache(use_cache)
+        cache_key = self._lookup_key(prompt, "daily") if caching else None
+        if caching:
+            cached_plan = self._cached_plan(user_profile, cache_key, DailyMealPlan, stats)
+            if cached_plan is not None:
+                if stats is not None:
+                    stats.latency_seconds = time.perf_counter() - started
+                yield from cached_plan.meals
+                return cached_plan
+
+        parser = IncrementalMealParser()
+        shared_prefix_tokens = self.prompt_prefix_tracker.observe(prompt)
+        prompt_tokens = completion_tokens = cached_prompt_tokens = 0
+        llm_started = time.perf_counter()
+        for chunk in self.llm.stream(prompt):
+            chunk_prompt_tokens, chunk_completion_tokens = _token_usage(chunk)
+            prompt_tokens += chunk_prompt_tokens
+            completion_tokens += chunk_completion_tokens
+            cached_prompt_tokens += _cached_prompt_tokens(chunk)
+            for meal_data in parser.feed(_response_content(chunk)):
                 try:
-                    daily_plan = self.generate_meal_plan(user_profile)
-                    if not isinstance(daily_plan, DailyMealPlan):
-                        raise ValueError(f"Invalid daily meal plan generated for day {day + 1}")
-                    weekly_plan.append(daily_plan)
-                except Exception as e:
-                    raise ValueError(f"Error generating plan for day {day + 1}: {str(e)}")
-            
-            if not weekly_plan:
-                raise ValueError("No valid daily plans were generated")
-            
-            return WeeklyMealPlan(daily_plans=weekly_plan)
+                    meal = Meal(**meal_data)
+                except Exception:
+                    # An invalid meal surfaces through the full parse below
+                    continue
+                yield meal
+
+        # Time to the last chunk; the consumer's rendering between chunks is included
+        self.metrics.observe("stage_seconds", time.perf_counter() - llm_started, (("stage", "llm"),))
+        self._record_llm_call(stats, prompt_tokens, completion_tokens, shared_prefix_tokens=shared_prefix_tokens,
+                              cached_prompt_tokens=cached_prompt_tokens)
+        if stats is not None:
+            stats.latency_seconds = time.perf_counter() - started
+        try:
+            parsed_plan = self._decode_daily_plan(parser.text, user_profile, stats)
+        except Exception as e:
+            raise ValueError(f"Failed to generate meal plan: {str(e)}")
+
+        if caching:
+            self._store_plan(user_profile, cache_key, parsed_plan)
+        return parsed_plan
+
+    def stream_meal_plan(self, user_profile: UserProfile, stats: Optional[GenerationStats] = None,
+                         use_cache: bool = True) -> PlanStream[Meal, DailyMealPlan]:
+        """Stream a daily meal plan, yielding each Meal as soon as its JSON object is complete.
+
+        The validated DailyMealPlan is available as .plan on the returned stream once iteration ends.
+        """
+        return PlanStream(self._stream_daily(user_profile, use_cache, stats))
+
+    def _stream_weekly(self, user_profile: UserProfile, max_concurrency: Optional[int], use_cache: bool,
+                       stats: Optional[GenerationStats]) -> Generator[Tuple[int, DailyMealPlan], None, WeeklyMealPlan]:
+        stats = stats if stats is not None else GenerationStats()
+        caching = self._use_cache(use_cache) and self.source != PlanSource.LOCAL
+        cache_key = self.plan_key(user_profile, weekly=True) if caching and self.cache is not None else None
+        if caching:
+            cached_plan = self._cached_plan(user_profile, cache_key, WeeklyMealPlan, stats)
+            if cached_plan is not None:
+                yield from enumerate(cached_plan.daily_plans)
+                return cached_plan
+
+        try:
+            weekly_plan = yield from self._iter_week_per_day(user_profile, max_concurrency, stats)
+            self._record_repeats(weekly_plan, stats)
         except Exception as e:
             raise ValueError(f"Failed to generate weekly meal plan: {str(e)}")
 
+        if caching and not stats.fallbacks:
+            self._store_plan(user_profile, cache_key, weekly_plan)
+        return weekly_plan
+
+    def stream_weekly_meal_plan(self, user_profile: UserProfile, max_concurrency: Optional[int] = None,
+                                stats: Optional[GenerationStats] = None,
+                                use_cache: bool = True) -> PlanStream[Tuple[int, DailyMealPlan], WeeklyMealPlan]:
+        """Stream a weekly meal plan, yielding (day_index, DailyMealPlan) as each day finishes.
+
+        Days are generated concurrently, so they may arrive out of order; a yielded day is never
+        changed afterwards. The assembled WeeklyMealPlan is available as .plan on the returned
+        stream once iteration ends.
+        """
+        if stats is not None:
+            stats.mode = WeeklyGenerationMode.PER_DAY.value
+        return PlanStream(self._stream_weekly(user_profile, max_concurrency, use_cache, stats))
+
 # Define meal order for sorting at the top of the file, before the classes
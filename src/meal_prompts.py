@@ -0,0 +1,265 @@
+from typing import TYPE_CHECKING, Dict, List, Sequence
+from functools import lru_cache
+import threading
+
+if TYPE_CHECKING:
+    from langchain.prompts import ChatPromptTemplate
+
+from user_profile import UserProfile, MealFrequency
+
+# Prompts are laid out so the bytes before the first user-specific value are identical for every
+# request: the static system message first, then the plan format and meal structure (fixed per
+# plan kind and meal frequency), and only then the user's profile. Providers that cache prompt
+# prefixes can then reuse everything up to the profile block.
+
+SYSTEM_PROMPT = """You are a professional nutritionist and meal planner. Create meal plans that meet the following requirements:
+            - Matches the user's dietary preferences and restrictions
+            - Meets caloric and macronutrient targets
+            - Includes healthy, balanced meals
+            - Provides variety and is practical to prepare
+            - Considers the user's cooking skill level and available prep time
+            - Follows the requested meal structure
+            - Incorporates preferred cuisines and avoids disliked foods
+
+            Every meal object in a response contains:
+            - name: string
+            - meal_type: string (e.g., "First Meal", "Second Meal", "Final Meal" for IF)
+            - ingredients: list of strings
+            - instructions: list of strings (each string being one step)
+            - nutrition: object with calories, protein, carbs, and fats as numbers
+            - prep_time: number (in minutes)
+
+            Respond with the JSON object only."""
+
+DAILY_PLAN_FORMAT = """Please create a daily meal plan. Format the response as a JSON object with:
+            - meals: list of meal objects
+            - total_calories: number
+            - total_protein: number
+            - total_carbs: number
+            - total_fats: number"""
+
+WEEKLY_PLAN_FORMAT = """Please create a weekly meal plan. Format the response as a JSON object with:
+            - daily_plans: list of exactly 7 day objects (Day 1 to Day 7, with varied meals across days), each containing:
+              - meals: list of meal objects
+              - total_calories: number
+              - total_protein: number
+              - total_carbs: number
+              - total_fats: number"""
+
+MEAL_FORMAT = """Please create one meal to complete an existing meal plan. Format the response as a single JSON meal object."""
+
+# Single-meal requests only need the constraints on the dish itself, not the daily targets
+MEAL_PROFILE_TEMPLATE = """
+
+            The user has the following profile:
+            - Dietary preference: {dietary_preference}
+            - Food preferences: {food_preference}
+            - Cooking skill level: {cooking_skill}
+            - Available meal prep time: {meal_prep_time} minutes
+            - Preferred cuisines: {preferred_cuisines}
+            - Disliked foods: {disliked_foods}
+            - Any allergies: {allergies}"""
+
+MEAL_REQUEST_TEMPLATE = """
+
+            Create only the {meal_type} for this plan, fitting the budget left by the other meals:
+            - Calories: {meal_calories}
+            - Protein: {meal_protein}g
+            - Carbs: {meal_carbs}g
+            - Fats: {meal_fats}g
+            - Do not repeat these meals: {avoid_meals}"""
+
+# Days of a weekly plan generated one prompt per day carry their position and the meals earlier days used
+DAY_REQUEST_TEMPLATE = """
+
+            This is day {day} of a 7-day plan. Do not repeat these meals from other days: {avoid_meals}"""
+
+MEAL_STRUCTURES = {
+    MealFrequency.THREE_MEALS: """
+                - Breakfast (morning)
+                - Lunch (midday)
+                - Dinner (evening)""",
+    MealFrequency.FIVE_MEALS: """
+                - Breakfast (early morning)
+                - Morning Snack (mid-morning)
+                - Lunch (midday)
+                - Afternoon Snack (mid-afternoon)
+                - Dinner (evening)""",
+    MealFrequency.INTERMITTENT_FASTING: """
+                For 16/8 Intermittent Fasting schedule (16 hours fasting, 8 hours eating window):
+                - First Meal (12:00 PM - Breaking fast)
+                - Second Meal (3:00 PM - Midday meal)
+                - Final Meal (7:00 PM - Last meal before fasting)
+
+                Note: Meals should be substantial and nutrient-dense to meet daily requirements within the eating window.""",
+    MealFrequency.CUSTOM: """
+                - Early Morning Meal
+                - Mid-Morning Meal
+                - Midday Meal
+                - Afternoon Meal
+                - Evening Meal"""
+}
+
+INTERMITTENT_FASTING_NOTES = """
+
+            For Intermittent Fasting:
+            - Design exactly 3 substantial meals within the 8-hour eating window
+            - First meal should break the fast and be easily digestible
+            - Space meals ~3 hours apart
+            - Ensure each meal is nutrient-dense and satisfying
+            - Include protein in each meal to maintain satiety
+            - Consider adding healthy fats for sustained energy
+            - Include complex carbs for sustained energy
+            - Ensure the last meal is substantial enough to sustain through the fasting period"""
+
+PROFILE_TEMPLATE = """
+
+            The user has the following profile:
+            - Dietary preference: {dietary_preference}
+            - Meal frequency: {meal_frequency}
+            - Food preferences: {food_preference}
+            - Cooking skill level: {cooking_skill}
+            - Available meal prep time: {meal_prep_time} minutes
+            - Preferred cuisines: {preferred_cuisines}
+            - Disliked foods: {disliked_foods}
+            - Daily calorie target: {target_calories}
+            - Protein target: {protein_target}g
+            - Carbs target: {carbs_target}g
+            - Fats target: {fats_target}g
+            - Any allergies: {allergies}"""
+
+# Rough characters-per-token ratio for English prompt text, used when no tokenizer is available
+CHARS_PER_TOKEN = 4
+
+
+def get_meal_structure(meal_frequency: MealFrequency) -> str:
+    return MEAL_STRUCTURES.get(meal_frequency, MEAL_STRUCTURES[MealFrequency.THREE_MEALS])
+
+
+def static_user_prefix(meal_frequency: MealFrequency, weekly: bool = False) -> str:
+    """The part of the user message that depends only on plan kind and meal frequency"""
+    prefix = (WEEKLY_PLAN_FORMAT if weekly else DAILY_PLAN_FORMAT)
+    prefix += "\n\n            Follow this specific meal structure:" + get_meal_structure(meal_frequency)
+    if meal_frequency == MealFrequency.INTERMITTENT_FASTING:
+        prefix += INTERMITTENT_FASTING_NOTES
+    return prefix
+
+
+@lru_cache(maxsize=None)
+def get_prompt_template(meal_frequency: MealFrequency, weekly: bool = False) -> "ChatPromptTemplate":
+    """Compiled prompt template for a meal frequency and plan kind, built once per process"""
+    # LangChain is imported on first use so that importing this module stays cheap
+    from langchain.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("user", static_user_prefix(meal_frequency, weekly) + PROFILE_TEMPLATE),
+    ])
+
+
+@lru_cache(maxsize=None)
+def get_day_prompt_template(meal_frequency: MealFrequency) -> "ChatPromptTemplate":
+    """Compiled template for one day of a weekly plan; the day request goes after the profile"""
+    from langchain.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("user", static_user_prefix(meal_frequency) + PROFILE_TEMPLATE + DAY_REQUEST_TEMPLATE),
+    ])
+
+
+@lru_cache(maxsize=None)
+def get_meal_prompt_template() -> "ChatPromptTemplate":
+    """Compiled template for a single replacement meal; the meal request goes after the profile"""
+    from langchain.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", SYSTEM_PROMPT),
+        ("user", MEAL_FORMAT + MEAL_PROFILE_TEMPLATE + MEAL_REQUEST_TEMPLATE),
+    ])
+
+
+def profile_prompt_values(user_profile: UserProfile) -> Dict[str, object]:
+    """User-specific template values, rendered at the end of the prompt"""
+    macros = user_profile.calculate_macros()
+    return {
+        "dietary_preference": user_profile.dietary_preference.value,
+        "meal_frequency": user_profile.meal_frequency.value,
+        "food_preference": user_profile.food_preference.value,
+        "cooking_skill": user_profile.cooking_skill.value,
+        "meal_prep_time": user_profile.meal_prep_time,
+        "preferred_cuisines": user_profile.preferred_cuisines if user_profile.preferred_cuisines else "No specific preferences",
+        "disliked_foods": user_profile.disliked_foods if user_profile.disliked_foods else "None",
+        "target_calories": user_profile.calculate_target_calories(),
+        "protein_target": macros['protein'],
+        "carbs_target": macros['carbs'],
+        "fats_target": macros['fats'],
+        "allergies": user_profile.allergies if user_profile.allergies else "None",
+    }
+
+
+def render_meal_plan_prompt(user_profile: UserProfile, weekly: bool = False) -> List:
+    """Render the chat messages for a daily or weekly plan request"""
+    return get_prompt_template(user_profile.meal_frequency, weekly).format_messages(
+        **profile_prompt_values(user_profile)
+    )
+
+
+def render_day_prompt(user_profile: UserProfile, day: int, avoid_meals: Sequence[str] = ()) -> List:
+    """Render the chat messages for day (0-based) of a weekly plan built one day per request"""
+    return get_day_prompt_template(user_profile.meal_frequency).format_messages(
+        day=day + 1,
+        avoid_meals=", ".join(avoid_meals) if avoid_meals else "None",
+        **profile_prompt_values(user_profile)
+    )
+
+
+def render_meal_prompt(user_profile: UserProfile, meal_type: str, budget: Dict[str, float],
+                       avoid_meals: Sequence[str] = ()) -> List:
+    """Render the chat messages asking for one meal with a calorie/macro budget (keys as in Meal.nutrition)"""
+    values = profile_prompt_values(user_profile)
+    return get_meal_prompt_template().format_messages(
+        meal_type=meal_type,
+        meal_calories=round(budget["calories"]),
+        meal_protein=round(budget["protein"]),
+        meal_carbs=round(budget["carbs"]),
+        meal_fats=round(budget["fats"]),
+        avoid_meals=", ".join(avoid_meals) if avoid_meals else "None",
+        **{name: values[name] for name in get_meal_prompt_template().input_variables if name in values}
+    )
+
+
+def prompt_text(messages: Sequence) -> str:
+    """Concatenate rendered messages in the order the provider sees them"""
+    return "\n".join(f"{getattr(message, 'type', '')}:{getattr(message, 'content', message)}" for message in messages)
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate token count of text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def shared_prefix_length(first: str, second: str) -> int:
+    """Number of leading characters two prompts have in common"""
+    limit = min(len(first), len(second))
+    index = 0
+    # Compare in blocks first; prompts share long prefixes, so this avoids a per-character loop
+    block = 256
+    while index + block <= limit and first[index:index + block] == second[index:index + block]:
+        index += block
+    while index < limit and first[index] == second[index]:
+        index += 1
+    return index
+
+
+class PromptPrefixTracker:
+    """Tracks how much of each prompt repeats the previous prompt's prefix"""
+
+    def __init__(self):
+        self._last_text = ""
+        self._lock = threading.Lock()
+
+    def observe(self, messages: Sequence) -> int:
+        """Record a prompt and return the estimated number of tokens it shares with the previous one"""
+        text = prompt_text(messages)
+        with self._lock:
+            shared = shared_prefix_length(self._last_text, text)
+            self._last_text = text
+        return estimate_tokens(text[:shared])
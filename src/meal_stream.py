@@ -0,0 +1,94 @@
+from typing import Generator, Generic, Iterator, List, Optional, TypeVar
+
+from plan_decoder import json_loads
+
+ItemT = TypeVar("ItemT")
+PlanT = TypeVar("PlanT")
+
+
+class IncrementalMealParser:
+    """Incremental JSON scanner that emits each object of a "meals" array as soon as it closes.
+
+    Feed it the raw token stream chunk by chunk; it never re-scans text it has already seen
+    and tolerates leading prose or markdown fences around the JSON document.
+    """
+
+    def __init__(self, array_key: str = "meals"):
+        self.array_key = array_key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_string: Optional[str] = None
+        self._pending_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._object_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far"""
+        return self._text
+
+    def feed(self, chunk: str) -> List[dict]:
+        """Consume a chunk of the stream and return the meal objects completed by it"""
+        self._text += chunk
+        text = self._text
+        completed = []
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._last_string = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                self._pending_key = self._last_string
+            elif ch == "[":
+                self._depth += 1
+                if self._array_depth is None and self._pending_key == self.array_key:
+                    self._array_depth = self._depth
+                self._pending_key = None
+            elif ch == "{":
+                self._depth += 1
+                if self._array_depth is not None and self._depth == self._array_depth + 1:
+                    self._object_start = i
+                self._pending_key = None
+            elif ch == "}":
+                if self._object_start is not None and self._depth == self._array_depth + 1:
+                    try:
+                        completed.append(json_loads(text[self._object_start:i + 1]))
+                    except ValueError:
+                        # Leave malformed meals to the full-document parser at the end of the stream
+                        pass
+                    self._object_start = None
+                self._depth -= 1
+            elif ch == "]":
+                if self._array_depth is not None and self._depth == self._array_depth:
+                    # Allow a later "meals" array (e.g. the next day of a weekly plan)
+                    self._array_depth = None
+                self._depth -= 1
+            elif ch == ",":
+                self._pending_key = None
+        self._pos = len(text)
+        return completed
+
+
+class PlanStream(Generic[ItemT, PlanT]):
+    """Iterable over streamed items; the finished plan is available as .plan once exhausted"""
+
+    def __init__(self, generator: Generator[ItemT, None, PlanT]):
+        self._generator = generator
+        self.plan: Optional[PlanT] = None
+
+    def __iter__(self) -> Iterator[ItemT]:
+        self.plan = yield from self._generator
@@ -0,0 +1,256 @@
+"""In-process metrics for plan generation.
+
+Counters and fixed-bucket histograms kept in a dict under one lock; recording a value costs a
+dict lookup and a bisect, so instrumentation stays on in production. Export them as Prometheus
+text (render_prometheus / start_http_server), and optionally as OpenTelemetry spans around each
+stage when opentelemetry-api is installed.
+"""
+from typing import Callable, Dict, List, Tuple
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import threading
+import time
+
+try:
+    from opentelemetry import trace
+except ImportError:  # optional; stages are still timed without it
+    trace = None
+
+# Histogram bucket upper bounds in seconds, from prompt rendering (sub-millisecond) to LLM calls
+LATENCY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+PREFIX = "meal_plan_"
+
+# name -> (Prometheus type, help text)
+METRIC_HELP = {
+    "stage_seconds": ("histogram", "Time spent in each stage of plan generation"),
+    "stage_errors_total": ("counter", "Stages that raised an exception"),
+    "day_seconds": ("histogram", "Time to generate one day of a weekly plan, retries included"),
+    "llm_calls_total": ("counter", "LLM calls made"),
+    "llm_prompt_tokens_total": ("counter", "Prompt tokens reported by the provider"),
+    "llm_completion_tokens_total": ("counter", "Completion tokens reported by the provider"),
+    "cache_requests_total": ("counter", "Plan cache lookups by result: hit, near_hit (rescaled similar plan) or miss"),
+    "retries_total": ("counter", "Generation attempts repeated after a failure"),
+    "fallbacks_total": ("counter", "Plans or days served by the local recipe engine after an LLM failure"),
+    "repairs_total": ("counter", "Responses repaired instead of regenerated"),
+    "repeated_meals_total": ("counter", "Meals in generated weeks that repeat an earlier day's meal"),
+    "speculations_total": ("counter", "Speculative plans by outcome: started, adopted, superseded or over_budget"),
+}
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.max = 0.0
+
+
+class _Stage:
+    """Context manager timing one stage; also opens a span when tracing is on"""
+    __slots__ = ("metrics", "name", "labels", "started", "span")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Tuple):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+        self.span = None
+
+    def __enter__(self):
+        if self.metrics.tracer is not None:
+            self.span = self.metrics.tracer.start_as_current_span(f"{PREFIX}{self.labels[0][1]}")
+            self.span.__enter__()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.metrics.observe(self.name, time.perf_counter() - self.started, self.labels)
+        if exc_type is not None:
+            self.metrics.inc("stage_errors_total", labels=self.labels)
+        if self.span is not None:
+            self.span.__exit__(exc_type, exc, tb)
+        return False
+
+
+class _NullStage:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Metrics:
+    """Thread-safe registry of counters and latency histograms"""
+
+    def __init__(self, enabled: bool = True, tracing: bool = False):
+        """
+        enabled: False turns every call into a no-op
+        tracing: also emit an OpenTelemetry span per stage; needs opentelemetry-api, and an SDK
+            configured by the application for the spans to go anywhere
+        """
+        if tracing and trace is None:
+            raise ImportError("tracing needs the opentelemetry-api package")
+        self.enabled = enabled
+        self.tracer = trace.get_tracer("meal_planner") if tracing else None
+        self._counters: Dict[Tuple[str, Tuple], float] = {}
+        self._histograms: Dict[Tuple[str, Tuple], _Histogram] = {}
+        self._callbacks: Dict[str, Tuple[str, str, Callable[[], float]]] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, amount: float = 1, labels: Tuple = ()) -> None:
+        if not self.enabled:
+            return
+        key = (name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Tuple = ()) -> None:
+        if not self.enabled:
+            return
+        key = (name, labels)
+        bucket = bisect_left(LATENCY_BUCKETS, value)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram()
+            histogram.counts[bucket] += 1
+            histogram.sum += value
+            histogram.max = max(histogram.max, value)
+
+    def stage(self, stage: str):
+        """Time a block as `with metrics.stage("llm"):`, recorded under stage_seconds{stage=...}"""
+        if not self.enabled:
+            return _NULL_STAGE
+        return _Stage(self, "stage_seconds", (("stage", stage),))
+
+    def register_callback(self, name: str, kind: str, help_text: str, read: Callable[[], float]) -> None:
+        """Export a value owned elsewhere (e.g. the rate limiter's concurrency) at scrape time"""
+        with self._lock:
+            self._callbacks[name] = (kind, help_text, read)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def counter(self, name: str, labels: Tuple = ()) -> float:
+        with self._lock:
+            return self._counters.get((name, labels), 0)
+
+    def snapshot(self) -> dict:
+        """Plain-dict view for the debug panel: counters, and count/mean/p50/p95/max per histogram"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h.counts), h.sum, h.max) for key, h in self._histograms.items()}
+        summaries = {}
+        for (name, labels), (counts, total, maximum) in histograms.items():
+            count = sum(counts)
+            summaries[(name, labels)] = {
+                "count": count,
+                "mean": total / count if count else 0.0,
+                "p50": _bucket_quantile(counts, 0.5, maximum),
+                "p95": _bucket_quantile(counts, 0.95, maximum),
+                "max": maximum,
+            }
+        hits = counters.get(("cache_requests_total", (("result", "hit"),)), 0)
+        near_hits = counters.get(("cache_requests_total", (("result", "near_hit"),)), 0)
+        misses = counters.get(("cache_requests_total", (("result", "miss"),)), 0)
+        return {
+            "counters": counters,
+            "histograms": summaries,
+            "cache_hit_rate": (hits + near_hits) / (hits + near_hits + misses) if hits + near_hits + misses else None,
+            "near_hit_rate": near_hits / (hits + near_hits + misses) if hits + near_hits + misses else None,
+        }
+
+    def render_prometheus(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, (list(h.counts), h.sum)) for key, h in self._histograms.items())
+            callbacks = sorted(self._callbacks.items())
+        lines: List[str] = []
+        declared = set()
+
+        def declare(name: str, kind: str, help_text: str) -> None:
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {PREFIX}{name} {help_text}")
+                lines.append(f"# TYPE {PREFIX}{name} {kind}")
+
+        for (name, labels), value in counters:
+            declare(name, *METRIC_HELP.get(name, ("counter", name)))
+            lines.append(f"{PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+        for (name, labels), (counts, total) in histograms:
+            declare(name, *METRIC_HELP.get(name, ("histogram", name)))
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{PREFIX}{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{PREFIX}{name}_sum{_format_labels(labels)} {_format_value(total)}")
+            lines.append(f"{PREFIX}{name}_count{_format_labels(labels)} {cumulative}")
+        for name, (kind, help_text, read) in callbacks:
+            try:
+                value = read()
+            except Exception:
+                continue
+            declare(name, kind, help_text)
+            lines.append(f"{PREFIX}{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: Tuple) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{key}="{str(value)}"' for key, value in labels)
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _bucket_quantile(counts: List[int], quantile: float, maximum: float) -> float:
+    """Upper bound of the bucket holding the quantile, capped at the largest value seen"""
+    total = sum(counts)
+    if not total:
+        return 0.0
+    rank = quantile * total
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS, counts):
+        cumulative += count
+        if cumulative >= rank:
+            return min(bound, maximum)
+    return maximum
+
+
+# Process-wide registry used unless a component is given its own
+METRICS = Metrics()
+
+
+def start_http_server(port: int, metrics: Metrics = METRICS, addr: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve metrics.render_prometheus() at /metrics on a daemon thread"""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = metrics.render_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((addr, port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,161 @@
+from abc import ABC, abstractmethod
+from typing import Optional, Sequence, Type, TypeVar
+from collections import OrderedDict
+from pydantic import BaseModel
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+PlanT = TypeVar("PlanT", bound=BaseModel)
+
+
+def make_cache_key(messages: Sequence, model: str, temperature: float, scope: str = "daily") -> str:
+    """Build a stable content hash from the rendered prompt messages and model settings"""
+    payload = {
+        "scope": scope,
+        "model": model,
+        "temperature": temperature,
+        "messages": [
+            [getattr(message, "type", "text"), getattr(message, "content", str(message))]
+            for message in messages
+        ],
+    }
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def make_profile_key(profile: dict, scope: str = "daily") -> str:
+    """Stable hash of a user profile (as from UserProfile.to_dict) and plan kind, for storing a user's plan"""
+    encoded = json.dumps({"scope": scope, "profile": profile}, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class PlanCache(ABC):
+    """Base class for plan cache backends"""
+
+    @abstractmethod
+    def get(self, key: str, plan_type: Type[PlanT]) -> Optional[PlanT]:
+        """Return the cached plan for key, or None on a miss or expired entry"""
+
+    @abstractmethod
+    def set(self, key: str, plan: BaseModel) -> None:
+        """Store a validated plan under key"""
+
+    @abstractmethod
+    def clear(self) -> None:
+        """Remove every entry from the cache"""
+
+
+class LRUPlanCache(PlanCache):
+    """In-process LRU cache holding validated plan objects"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: Optional[float] = 24 * 60 * 60):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple[float, BaseModel]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, plan_type: Type[PlanT]) -> Optional[PlanT]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, plan = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            if not isinstance(plan, plan_type):
+                return None
+            self._entries.move_to_end(key)
+        # Hand out a copy so callers can't mutate the cached plan
+        return plan.model_copy(deep=True)
+
+    def set(self, key: str, plan: BaseModel) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), plan.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLitePlanCache(PlanCache):
+    """On-disk cache storing plans as JSON in a SQLite database"""
+
+    def __init__(self, path: str, max_entries: int = 10_000, ttl_seconds: Optional[float] = 7 * 24 * 60 * 60):
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS plan_cache (
+                    key TEXT PRIMARY KEY,
+                    plan_type TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS plan_cache_accessed ON plan_cache (accessed_at)")
+
+    def get(self, key: str, plan_type: Type[PlanT]) -> Optional[PlanT]:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT plan_type, payload, created_at FROM plan_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            stored_type, payload, created_at = row
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM plan_cache WHERE key = ?", (key,))
+                return None
+            if stored_type != plan_type.__name__:
+                return None
+            self._conn.execute("UPDATE plan_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return plan_type.model_validate_json(payload)
+
+    def set(self, key: str, plan: BaseModel) -> None:
+        now = time.time()
+        payload = plan.model_dump_json()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO plan_cache (key, plan_type, payload, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, type(plan).__name__, payload, now, now),
+            )
+            if self.ttl_seconds is not None:
+                self._conn.execute("DELETE FROM plan_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+            # Evict least recently used entries beyond the size bound
+            self._conn.execute(
+                """DELETE FROM plan_cache WHERE key IN (
+                    SELECT key FROM plan_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?
+                )""",
+                (self.max_entries,),
+            )
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM plan_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM plan_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,259 @@
+"""Compact binary storage for collections of plans.
+
+A plan file holds many daily or weekly plans. Every distinct string (meal names, ingredients,
+instructions, unusual meal types) is stored once in a string table and referenced by index;
+the usual meal types are coded by their position in meal_order. Meals, days and plans are
+fixed-width numpy records, with nutrition as float64 columns, so a file opened with PlanFile.open
+is memory-mapped and a plan is decoded from it without reading the rest.
+
+Layout (little-endian, sections 8-byte aligned, in this order):
+    header        magic, format version, plan kind and the size of each section
+    plans         weekly files only: (first day, day count) per plan
+    days          (first meal, meal count, total calories/protein/carbs/fats) per day
+    meals         (name, meal type, ingredient range, instruction range, prep time, nutrition)
+    offsets       num_strings + 1 byte offsets into the string blob
+    refs          string ids of every ingredient and instruction, meal by meal
+    extras        (meal, key, value) for nutrition keys other than NUTRIENTS
+    strings       UTF-8 string blob
+
+Decoded plans compare equal to the ones encoded. Readers reject files whose version they do not
+know; bump FORMAT_VERSION on any layout change.
+"""
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+import math
+import mmap
+import struct
+
+import numpy as np
+
+from meal_models import TOTAL_FIELDS, meal_order, DailyMealPlan, WeeklyMealPlan
+
+MAGIC = b"MPLN"
+FORMAT_VERSION = 1
+
+DAILY, WEEKLY = 0, 1
+
+# Nutrition keys stored as fixed float64 columns; absent values are NaN
+NUTRIENTS = tuple(TOTAL_FIELDS.values())
+
+# Negative meal type codes: -(i + 1) is MEAL_TYPE_LABELS[i]; other meal types are string ids
+MEAL_TYPE_LABELS = tuple(label.title() for label in meal_order)
+_MEAL_TYPE_CODES = {label: -(i + 1) for i, label in enumerate(MEAL_TYPE_LABELS)}
+
+_HEADER = struct.Struct("<4sHBxIIIIIII")
+
+PLAN_DTYPE = np.dtype([("day_start", "<u4"), ("day_count", "<u4")])
+DAY_DTYPE = np.dtype([("meal_start", "<u4"), ("meal_count", "<u4"), ("totals", "<f8", (len(TOTAL_FIELDS),))])
+MEAL_DTYPE = np.dtype([
+    ("name", "<u4"),
+    ("meal_type", "<i4"),
+    ("ingredient_start", "<u4"),
+    ("ingredient_count", "<u4"),
+    ("instruction_start", "<u4"),
+    ("instruction_count", "<u4"),
+    ("prep_time", "<i8"),
+    ("nutrition", "<f8", (len(NUTRIENTS),)),
+])
+EXTRA_DTYPE = np.dtype([("meal", "<u4"), ("key", "<u4"), ("value", "<f8")])
+
+Plan = Union[DailyMealPlan, WeeklyMealPlan]
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def encode_plans(plans: Sequence[Plan]) -> bytes:
+    """Serialize daily or weekly plans (not a mix) into one plan file"""
+    weekly = bool(plans) and isinstance(plans[0], WeeklyMealPlan)
+    plan_type = WeeklyMealPlan if weekly else DailyMealPlan
+    if any(type(plan) is not plan_type for plan in plans):
+        raise ValueError("A plan file holds only daily or only weekly plans")
+
+    # string -> id, in id order
+    strings: Dict[str, int] = {}
+    intern = lambda text: strings.setdefault(text, len(strings))
+    plan_rows, day_rows, meal_rows, refs, extras = [], [], [], [], []
+    for plan in plans:
+        daily_plans = plan.daily_plans if weekly else [plan]
+        plan_rows.append((len(day_rows), len(daily_plans)))
+        for daily_plan in daily_plans:
+            meals = daily_plan.meals
+            day_rows.append((len(meal_rows), len(meals), [getattr(daily_plan, total) for total in TOTAL_FIELDS]))
+            for meal in meals:
+                meal_index = len(meal_rows)
+                meal_type = _MEAL_TYPE_CODES.get(meal.meal_type)
+                if meal_type is None:
+                    meal_type = intern(meal.meal_type)
+                ingredient_start = len(refs)
+                refs.extend([intern(ingredient) for ingredient in meal.ingredients])
+                instruction_start = len(refs)
+                refs.extend([intern(instruction) for instruction in meal.instructions])
+                nutrition = []
+                for nutrient in NUTRIENTS:
+                    value = meal.nutrition.get(nutrient)
+                    if value is not None and math.isnan(value):
+                        # NaN marks an absent column, so a NaN value is kept with the extras
+                        extras.append((meal_index, intern(nutrient), value))
+                        value = None
+                    nutrition.append(math.nan if value is None else value)
+                extras.extend((meal_index, intern(key), value)
+                              for key, value in meal.nutrition.items() if key not in NUTRIENTS)
+                meal_rows.append((intern(meal.name), meal_type, ingredient_start, len(meal.ingredients),
+                                  instruction_start, len(meal.instructions), meal.prep_time, nutrition))
+
+    encoded = [text.encode("utf-8") for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u8")
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    sections = [
+        np.array(plan_rows, dtype=PLAN_DTYPE) if weekly else np.zeros(0, dtype=PLAN_DTYPE),
+        np.array(day_rows, dtype=DAY_DTYPE),
+        np.array(meal_rows, dtype=MEAL_DTYPE),
+        offsets,
+        np.array(refs, dtype="<u4"),
+        np.array(extras, dtype=EXTRA_DTYPE),
+    ]
+    blob = b"".join(encoded)
+    header = _HEADER.pack(MAGIC, FORMAT_VERSION, WEEKLY if weekly else DAILY, len(plans), len(day_rows),
+                          len(meal_rows), len(encoded), len(blob), len(refs), len(extras))
+
+    parts = [header, b"\0" * (_aligned(len(header)) - len(header))]
+    for section in sections:
+        data = section.tobytes()
+        parts.append(data)
+        parts.append(b"\0" * (_aligned(len(data)) - len(data)))
+    parts.append(blob)
+    return b"".join(parts)
+
+
+def write_plan_file(path: str, plans: Sequence[Plan]) -> None:
+    with open(path, "wb") as f:
+        f.write(encode_plans(plans))
+
+
+class PlanFile:
+    """Read access to an encoded plan file; plans are decoded one at a time, on access.
+
+    The sections are numpy views of the buffer, so nothing is copied up front; with open() the
+    buffer is a read-only memory map and only the pages a plan touches are read from disk.
+    """
+
+    def __init__(self, buffer: Union[bytes, memoryview, mmap.mmap]):
+        if len(buffer) < _HEADER.size:
+            raise ValueError("Not a plan file: too short")
+        (magic, version, kind, num_plans, num_days, num_meals, num_strings, string_bytes,
+         num_refs, num_extras) = _HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError("Not a plan file")
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported plan file version: {version}")
+        self.weekly = kind == WEEKLY
+        self._buffer = buffer
+        self._mmap: Optional[mmap.mmap] = None
+        position = _aligned(_HEADER.size)
+
+        def section(dtype, count: int) -> np.ndarray:
+            nonlocal position
+            array = np.frombuffer(buffer, dtype=dtype, count=count, offset=position)
+            position += _aligned(array.nbytes)
+            return array
+
+        self._plans = section(PLAN_DTYPE, num_plans if self.weekly else 0)
+        self._days = section(DAY_DTYPE, num_days)
+        self._meals = section(MEAL_DTYPE, num_meals)
+        self._offsets = section(np.dtype("<u8"), num_strings + 1)
+        self._refs = section(np.dtype("<u4"), num_refs)
+        self._extras = section(EXTRA_DTYPE, num_extras)
+        self._blob = memoryview(buffer)[position:position + string_bytes]
+        if len(self._blob) != string_bytes:
+            raise ValueError("Plan file is truncated")
+        self._num_plans = num_plans
+        self._strings: List[Optional[str]] = [None] * num_strings
+        self._offset_list: Optional[List[int]] = None
+        # meal index -> [(key, value)], only for meals with extra nutrition keys
+        self._extra_nutrition: Dict[int, list] = {}
+        for meal_index, key, value in self._extras.tolist():
+            self._extra_nutrition.setdefault(meal_index, []).append((key, value))
+
+    @classmethod
+    def open(cls, path: str) -> "PlanFile":
+        """Memory-map a plan file; close() (or a with block) releases it"""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        plan_file = cls(mapped)
+        plan_file._mmap = mapped
+        return plan_file
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            # Views into the map must go before it can close
+            self._plans = self._days = self._meals = self._offsets = self._refs = self._extras = None
+            self._blob.release()
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "PlanFile":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self._num_plans
+
+    def __getitem__(self, index: int) -> Plan:
+        if index < 0:
+            index += self._num_plans
+        if not 0 <= index < self._num_plans:
+            raise IndexError("plan index out of range")
+        # Validating plain dicts runs in pydantic-core, which is faster than model_construct
+        if not self.weekly:
+            return DailyMealPlan.model_validate(self._day(index))
+        day_start, day_count = self._plans[index].tolist()
+        return WeeklyMealPlan.model_validate(
+            {"daily_plans": [self._day(day) for day in range(day_start, day_start + day_count)]})
+
+    def __iter__(self) -> Iterator[Plan]:
+        for index in range(self._num_plans):
+            yield self[index]
+
+    def _string(self, string_id: int) -> str:
+        text = self._strings[string_id]
+        if text is None:
+            if self._offset_list is None:
+                self._offset_list = self._offsets.tolist()
+            start, end = self._offset_list[string_id], self._offset_list[string_id + 1]
+            text = self._strings[string_id] = str(self._blob[start:end], "utf-8")
+        return text
+
+    def _day(self, day: int) -> dict:
+        meal_start, meal_count, totals = self._days[day].tolist()
+        rows = self._meals[meal_start:meal_start + meal_count].tolist()
+        # A day's ingredient and instruction refs are contiguous, so they come out in one slice
+        ref_start = rows[0][2]
+        day_refs = self._refs[ref_start:rows[-1][4] + rows[-1][5]].tolist()
+        strings, string = self._strings, self._string
+        meals = []
+        for meal_index, row in enumerate(rows, meal_start):
+            (name, meal_type, ingredient_start, ingredient_count, instruction_start, instruction_count,
+             prep_time, nutrition_values) = row
+            refs = day_refs[ingredient_start - ref_start:instruction_start + instruction_count - ref_start]
+            nutrition = {nutrient: value for nutrient, value in zip(NUTRIENTS, nutrition_values.tolist())
+                         if not math.isnan(value)}
+            for key, value in self._extra_nutrition.get(meal_index, ()):
+                nutrition[string(key)] = value
+            meals.append({
+                "name": string(name),
+                "meal_type": MEAL_TYPE_LABELS[-meal_type - 1] if meal_type < 0 else string(meal_type),
+                "ingredients": [strings[ref] or string(ref) for ref in refs[:ingredient_count]],
+                "instructions": [strings[ref] or string(ref) for ref in refs[ingredient_count:]],
+                "nutrition": nutrition,
+                "prep_time": prep_time,
+            })
+        return {"breakfast": meals[0], "lunch": meals[1], "dinner": meals[2], "snacks": meals[3:],
+                **dict(zip(TOTAL_FIELDS, totals.tolist()))}
+
+
+def decode_plans(data: Union[bytes, memoryview]) -> List[Plan]:
+    """Every plan in an encoded plan file"""
+    return list(PlanFile(data))
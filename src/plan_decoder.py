@@ -0,0 +1,63 @@
+from typing import Type, TypeVar, Union
+import json
+
+from pydantic import BaseModel, ValidationError
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib json module is the fallback
+    orjson = None
+
+PlanT = TypeVar("PlanT", bound=BaseModel)
+
+_FENCE = b"```"
+
+
+def json_loads(data: Union[str, bytes]):
+    """Parse JSON with orjson when it is installed, else the stdlib"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def extract_json(raw: Union[str, bytes]) -> bytes:
+    """Slice the JSON object out of an LLM response, dropping markdown fences and surrounding prose"""
+    data = raw.encode("utf-8") if isinstance(raw, str) else raw
+    data = data.strip()
+    if data.startswith(b"{") and data.endswith(b"}"):
+        return data
+    if data.startswith(_FENCE):
+        # ```json\n{...}\n```
+        data = data[data.find(b"\n") + 1:]
+        end = data.rfind(_FENCE)
+        if end != -1:
+            data = data[:end]
+    start, end = data.find(b"{"), data.rfind(b"}")
+    if start == -1 or end < start:
+        raise ValueError("No JSON object found in response")
+    return data[start:end + 1]
+
+
+def decode_plan(raw: Union[str, bytes], plan_type: Type[PlanT]) -> PlanT:
+    """Decode a raw LLM response into a validated plan in one pass.
+
+    With orjson installed the bytes are parsed by orjson and validated directly; this beats
+    pydantic's JSON mode because DailyMealPlan's before-validator needs Python objects anyway.
+    Without it, pydantic-core parses and validates the bytes itself. Responses that are not
+    valid JSON (e.g. truncated) fall back to LangChain's lenient PydanticOutputParser.
+    """
+    payload = extract_json(raw)
+    try:
+        if orjson is not None:
+            return plan_type.model_validate(orjson.loads(payload))
+        return plan_type.model_validate_json(payload)
+    except ValidationError as e:
+        if not any(error["type"] == "json_invalid" for error in e.errors()):
+            raise
+    except ValueError:
+        # orjson.JSONDecodeError
+        pass
+
+    from langchain.output_parsers import PydanticOutputParser
+    text = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+    return PydanticOutputParser(pydantic_object=plan_type).parse(text)
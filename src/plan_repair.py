@@ -0,0 +1,271 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
+import re
+
+from pydantic import ValidationError
+
+from user_profile import MealFrequency
+from meal_models import meal_order, sum_totals, Meal, DailyMealPlan, TOTAL_FIELDS
+from plan_decoder import extract_json, json_loads
+from recipe_engine import MEAL_SLOTS
+
+# Callback that asks the LLM for a single meal: (meal_type, share of daily calories, meals kept so far) -> Meal
+MealRequester = Callable[[str, float, List[Meal]], Meal]
+
+# Meal types LLMs commonly use that are not in meal_order
+MEAL_TYPE_ALIASES = {
+    "morning meal": "breakfast",
+    "brunch": "lunch",
+    "midday snack": "morning snack",
+    "mid morning snack": "morning snack",
+    "am snack": "morning snack",
+    "snack": "afternoon snack",
+    "pm snack": "afternoon snack",
+    "evening snack": "afternoon snack",
+    "supper": "dinner",
+    "1st meal": "first meal",
+    "2nd meal": "second meal",
+    "last meal": "final meal",
+    "third meal": "final meal",
+    "3rd meal": "final meal",
+}
+
+# DailyMealPlan slot each meal_order type lands in (mirrors DailyMealPlan._group_meals)
+_SLOT_TYPES = {
+    "breakfast": ("breakfast", "first meal", "early morning meal"),
+    "lunch": ("lunch", "second meal", "midday meal"),
+    "dinner": ("dinner", "final meal", "evening meal"),
+}
+REQUIRED_SLOTS = tuple(_SLOT_TYPES)
+
+# A string literal, or a comma directly before a closing bracket
+_TRAILING_COMMA = re.compile(r'("(?:\\.|[^"\\])*")|,(\s*[}\]])')
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+@dataclass
+class RepairReport:
+    """What a repair changed, for logging and stats"""
+    fixes: List[str] = field(default_factory=list)
+    regenerated_meals: List[str] = field(default_factory=list)
+    dropped_days: List[int] = field(default_factory=list)
+
+    @property
+    def repaired(self) -> bool:
+        return bool(self.fixes or self.regenerated_meals or self.dropped_days)
+
+
+def fix_trailing_commas(text: str) -> str:
+    """Remove commas before a closing } or ], leaving string contents untouched"""
+    return _TRAILING_COMMA.sub(lambda m: m.group(1) or m.group(2), text)
+
+
+def parse_lenient(raw: Union[str, bytes], report: Optional[RepairReport] = None) -> Any:
+    """Parse an LLM response as JSON after stripping markdown fences and trailing commas"""
+    payload = extract_json(raw).decode("utf-8")
+    try:
+        return json_loads(payload)
+    except ValueError:
+        fixed = fix_trailing_commas(payload)
+        if fixed == payload:
+            raise
+        if report is not None:
+            report.fixes.append("removed trailing commas")
+        return json_loads(fixed)
+
+
+def _normalize_label(value: str) -> str:
+    return " ".join(value.lower().replace("_", " ").replace("-", " ").strip(" .:").split())
+
+
+_KNOWN_TYPES = {_normalize_label(meal_type): meal_type for meal_type in meal_order}
+
+
+def canonical_meal_type(value: Any) -> Optional[str]:
+    """Map a free-form meal_type onto a meal_order key, or None if it cannot be placed"""
+    if not isinstance(value, str):
+        return None
+    label = _normalize_label(value)
+    if label in _KNOWN_TYPES:
+        return _KNOWN_TYPES[label]
+    if label in MEAL_TYPE_ALIASES:
+        return MEAL_TYPE_ALIASES[label]
+    # "Healthy Breakfast Bowl" -> breakfast; longest names first so "morning snack" beats "snack"
+    for known in sorted(_KNOWN_TYPES, key=len, reverse=True):
+        if known in label:
+            return _KNOWN_TYPES[known]
+    return None
+
+
+def _slot_of(meal_type: str) -> str:
+    for slot, meal_types in _SLOT_TYPES.items():
+        if meal_type in meal_types:
+            return slot
+    return "snack"
+
+
+def _as_list(value: Any) -> Any:
+    if isinstance(value, str):
+        return [line.strip(" -*\t") for line in value.splitlines() if line.strip(" -*\t")]
+    return value
+
+
+def _as_number(value: Any) -> Any:
+    if isinstance(value, str):
+        match = _NUMBER.search(value)
+        if match:
+            return float(match.group())
+    return value
+
+
+def _coerce_meal(meal: dict) -> dict:
+    """Fix common type slips: "25 minutes", "450 kcal", newline-separated lists"""
+    meal = dict(meal)
+    for key in ("ingredients", "instructions"):
+        if key in meal:
+            meal[key] = _as_list(meal[key])
+    if "prep_time" in meal:
+        prep_time = _as_number(meal["prep_time"])
+        meal["prep_time"] = round(prep_time) if isinstance(prep_time, float) else prep_time
+    if isinstance(meal.get("nutrition"), dict):
+        meal["nutrition"] = {key: _as_number(value) for key, value in meal["nutrition"].items()}
+    return meal
+
+
+def _expected_slots(meal_frequency: MealFrequency) -> List[Tuple[str, float]]:
+    slots = MEAL_SLOTS.get(meal_frequency, MEAL_SLOTS[MealFrequency.THREE_MEALS])
+    return [(label, share) for label, _, share in slots]
+
+
+def repair_daily_data(data: Any, meal_frequency: MealFrequency,
+                      report: Optional[RepairReport] = None) -> Tuple[List[Meal], Dict[str, Any], List[Tuple[str, float]]]:
+    """Apply local fixes to one day's decoded JSON.
+
+    Returns the valid meals (meal types normalized), the totals the response supplied, and the
+    (meal_type, calorie share) of every slot of the meal structure still missing a valid meal.
+    """
+    report = report if report is not None else RepairReport()
+    if not isinstance(data, dict):
+        raise ValueError("Daily plan is not a JSON object")
+    raw_meals = data.get("meals")
+    if not isinstance(raw_meals, list):
+        # Already grouped, e.g. {"breakfast": {...}, "lunch": {...}, "snacks": [...]}
+        raw_meals = [data[slot] for slot in REQUIRED_SLOTS if isinstance(data.get(slot), dict)]
+        raw_meals += [snack for snack in data.get("snacks") or [] if isinstance(snack, dict)]
+
+    open_slots = _expected_slots(meal_frequency)
+    placed: List[Tuple[Meal, Optional[str]]] = []
+    for raw_meal in raw_meals:
+        if not isinstance(raw_meal, dict):
+            report.fixes.append("dropped a meal that is not an object")
+            continue
+        raw_type = raw_meal.get("meal_type")
+        meal_type = canonical_meal_type(raw_type)
+        try:
+            meal = Meal.model_validate(_coerce_meal(dict(raw_meal, meal_type=raw_type if isinstance(raw_type, str) else "")))
+        except ValidationError:
+            report.fixes.append(f"dropped invalid meal {raw_meal.get('name') or raw_meal.get('meal_type')!r}")
+            continue
+        placed.append((meal, meal_type))
+
+    meals = []
+    # Known meal types claim their slot first, so positional placement only fills the gaps
+    for meal, meal_type in placed:
+        if meal_type is None:
+            continue
+        match = next((slot for slot in open_slots if canonical_meal_type(slot[0]) == meal_type), None)
+        if match is None:
+            match = next((slot for slot in open_slots if _slot_of(canonical_meal_type(slot[0])) == _slot_of(meal_type)), None)
+        if match is not None:
+            open_slots.remove(match)
+        if meal.meal_type.lower() != meal_type:
+            report.fixes.append(f"mapped meal_type {meal.meal_type!r} to {meal_type!r}")
+            meal = meal.model_copy(update={"meal_type": match[0] if match else meal_type.title()})
+        meals.append(meal)
+    for meal, meal_type in placed:
+        if meal_type is not None:
+            continue
+        if not open_slots:
+            report.fixes.append(f"dropped extra meal {meal.name!r} with unknown meal_type {meal.meal_type!r}")
+            continue
+        label, _ = open_slots.pop(0)
+        report.fixes.append(f"assigned unknown meal_type {meal.meal_type!r} to {label!r}")
+        meals.append(meal.model_copy(update={"meal_type": label}))
+
+    totals = {}
+    for total in TOTAL_FIELDS:
+        value = _as_number(data.get(total))
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            totals[total] = value
+    return meals, totals, open_slots
+
+
+def repair_daily_plan(data: Any, meal_frequency: MealFrequency, request_meal: Optional[MealRequester] = None,
+                      report: Optional[RepairReport] = None) -> DailyMealPlan:
+    """Rebuild a valid DailyMealPlan from a broken response.
+
+    Local fixes come first; only slots still missing a valid meal are sent to request_meal, one
+    meal per call. Totals missing from the response, or invalidated by a replaced meal, are
+    recomputed from the meals' nutrition.
+    """
+    report = report if report is not None else RepairReport()
+    if isinstance(data, (str, bytes)):
+        data = parse_lenient(data, report)
+    meals, totals, missing = repair_daily_data(data, meal_frequency, report)
+
+    # A slot the plan cannot be built without must be regenerated; optional snacks only if possible
+    slots_filled = {_slot_of(canonical_meal_type(meal.meal_type)) for meal in meals}
+    required_missing = [slot for slot in REQUIRED_SLOTS if slot not in slots_filled]
+    if required_missing and request_meal is None:
+        raise ValueError(f"Meal plan is missing {', '.join(required_missing)} and no meal requester is available")
+    if request_meal is not None:
+        for meal_type, share in missing:
+            meal = request_meal(meal_type, share, list(meals))
+            meals.append(meal.model_copy(update={"meal_type": meal_type}))
+            report.regenerated_meals.append(meal_type)
+
+    recomputed = sum_totals(meals)
+    for total in TOTAL_FIELDS:
+        if total not in totals or report.regenerated_meals:
+            totals[total] = recomputed[total]
+            if not report.regenerated_meals:
+                report.fixes.append(f"filled {total} from meal nutrition")
+
+    return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **totals)
+
+
+def repair_weekly_plan(data: Any, meal_frequency: MealFrequency, days: int,
+                       request_meal: Optional[MealRequester] = None,
+                       report: Optional[RepairReport] = None) -> List[Optional[DailyMealPlan]]:
+    """Repair each day of a weekly response independently.
+
+    Returns exactly `days` entries; days that are absent or cannot be repaired are None so the
+    caller can regenerate just those days.
+    """
+    report = report if report is not None else RepairReport()
+    if isinstance(data, (str, bytes)):
+        data = parse_lenient(data, report)
+    raw_days = data.get("daily_plans") if isinstance(data, dict) else data
+    if not isinstance(raw_days, list):
+        raise ValueError("Weekly plan has no daily_plans list")
+    if len(raw_days) > days:
+        report.fixes.append(f"dropped {len(raw_days) - days} extra days")
+        raw_days = raw_days[:days]
+
+    daily_plans: List[Optional[DailyMealPlan]] = []
+    for day in range(days):
+        if day >= len(raw_days):
+            daily_plans.append(None)
+            report.dropped_days.append(day)
+            continue
+        try:
+            daily_plans.append(DailyMealPlan.model_validate(raw_days[day]))
+            continue
+        except (ValidationError, KeyError, AttributeError, TypeError):
+            pass
+        try:
+            daily_plans.append(repair_daily_plan(raw_days[day], meal_frequency, request_meal, report))
+        except Exception:
+            daily_plans.append(None)
+            report.dropped_days.append(day)
+    return daily_plans
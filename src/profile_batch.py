@@ -0,0 +1,130 @@
+from typing import Dict, Iterable, Optional, Sequence
+from enum import Enum
+
+import numpy as np
+
+from user_profile import (
+    UserProfile,
+    ActivityLevel,
+    HealthGoal,
+    ACTIVITY_MULTIPLIERS,
+    GOAL_ADJUSTMENTS,
+    MACRO_RATIOS,
+)
+
+
+def _lookup(values: Sequence, enum_type, table: dict) -> np.ndarray:
+    """Map a column of enum members (or their values) through a lookup table with one vectorized pass per member"""
+    values = np.asarray(values, dtype=object)
+    if values.size and isinstance(values[0], Enum):
+        values = np.array([value.value for value in values], dtype=object)
+    result = np.full(values.shape, np.nan)
+    for member, mapped in table.items():
+        result[values == member.value] = mapped
+    if np.isnan(result).any():
+        unknown = values[np.isnan(result)][0]
+        raise ValueError(f"{unknown!r} is not a valid {enum_type.__name__}")
+    return result
+
+
+def _is_male(gender: Sequence[str]) -> np.ndarray:
+    """Vectorized equivalent of gender.lower() == "male" """
+    gender = np.asarray(gender, dtype=object)
+    is_male = (gender == "male") | (gender == "Male") | (gender == "MALE")
+    # Only rows in an unusual casing fall back to a per-row lower()
+    unusual = ~(is_male | (gender == "female") | (gender == "Female") | (gender == "FEMALE"))
+    if unusual.any():
+        is_male[unusual] = [str(value).lower() == "male" for value in gender[unusual]]
+    return is_male
+
+
+class UserProfileBatch:
+    """Columnar counterpart of UserProfile for energy and macro calculations over many profiles.
+
+    Each calculate_* method is a handful of vectorized NumPy passes and returns exactly the
+    values the scalar UserProfile methods would, row for row.
+    """
+
+    def __init__(self, age: Sequence[float], gender: Sequence[str], weight: Sequence[float],
+                 height: Sequence[float], activity_level: Sequence, health_goal: Sequence):
+        self.age = np.asarray(age, dtype=np.float64)
+        self.weight = np.asarray(weight, dtype=np.float64)
+        self.height = np.asarray(height, dtype=np.float64)
+        sizes = {len(self.age), len(self.weight), len(self.height), len(gender), len(activity_level), len(health_goal)}
+        if len(sizes) != 1:
+            raise ValueError("All profile columns must have the same length")
+
+        self.is_male = _is_male(gender)
+        self.activity_multiplier = _lookup(activity_level, ActivityLevel, ACTIVITY_MULTIPLIERS)
+        self.goal_adjustment = _lookup(health_goal, HealthGoal, GOAL_ADJUSTMENTS)
+        self.protein_ratio = _lookup(health_goal, HealthGoal, {goal: ratios[0] for goal, ratios in MACRO_RATIOS.items()})
+        self.carb_ratio = _lookup(health_goal, HealthGoal, {goal: ratios[1] for goal, ratios in MACRO_RATIOS.items()})
+        self.fat_ratio = _lookup(health_goal, HealthGoal, {goal: ratios[2] for goal, ratios in MACRO_RATIOS.items()})
+
+    def __len__(self) -> int:
+        return len(self.age)
+
+    @classmethod
+    def from_profiles(cls, profiles: Iterable[UserProfile]) -> "UserProfileBatch":
+        profiles = list(profiles)
+        return cls(
+            age=[profile.age for profile in profiles],
+            gender=[profile.gender for profile in profiles],
+            weight=[profile.weight for profile in profiles],
+            height=[profile.height for profile in profiles],
+            activity_level=[profile.activity_level.value for profile in profiles],
+            health_goal=[profile.health_goal.value for profile in profiles],
+        )
+
+    @classmethod
+    def from_dataframe(cls, df) -> "UserProfileBatch":
+        """Build from a pandas DataFrame with UserProfile column names"""
+        return cls(
+            age=df["age"].to_numpy(),
+            gender=df["gender"].to_numpy(),
+            weight=df["weight"].to_numpy(),
+            height=df["height"].to_numpy(),
+            activity_level=df["activity_level"].to_numpy(),
+            health_goal=df["health_goal"].to_numpy(),
+        )
+
+    def calculate_bmr(self) -> np.ndarray:
+        """Calculate Basal Metabolic Rate using Mifflin-St Jeor Equation"""
+        base = (10 * self.weight) + (6.25 * self.height) - (5 * self.age)
+        return np.where(self.is_male, base + 5, base - 161)
+
+    def calculate_tdee(self, bmr: Optional[np.ndarray] = None) -> np.ndarray:
+        """Calculate Total Daily Energy Expenditure"""
+        if bmr is None:
+            bmr = self.calculate_bmr()
+        return bmr * self.activity_multiplier
+
+    def calculate_target_calories(self, tdee: Optional[np.ndarray] = None) -> np.ndarray:
+        """Calculate target calories based on health goal"""
+        if tdee is None:
+            tdee = self.calculate_tdee()
+        return tdee + self.goal_adjustment
+
+    def calculate_macros(self, target_calories: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Calculate recommended macronutrient distribution"""
+        if target_calories is None:
+            target_calories = self.calculate_target_calories()
+        return {
+            "protein": (target_calories * self.protein_ratio) / 4,
+            "carbs": (target_calories * self.carb_ratio) / 4,
+            "fats": (target_calories * self.fat_ratio) / 9
+        }
+
+    def calculate_all(self) -> Dict[str, np.ndarray]:
+        """Compute BMR, TDEE, target calories and macros in one chained pass"""
+        bmr = self.calculate_bmr()
+        tdee = self.calculate_tdee(bmr)
+        target_calories = self.calculate_target_calories(tdee)
+        results = {"bmr": bmr, "tdee": tdee, "target_calories": target_calories}
+        results.update(self.calculate_macros(target_calories))
+        return results
+
+    def to_dataframe(self):
+        """Return calculate_all() as a pandas DataFrame"""
+        import pandas as pd
+        return pd.DataFrame(self.calculate_all())
@@ -0,0 +1,447 @@
+"""Client-side rate limiting for LLM calls.
+
+RateLimiter keeps token buckets for requests and tokens per minute, keeps them in step with the
+provider's x-ratelimit-* response headers, and sizes the number of calls in flight with AIMD:
+each success adds 1/limit to the concurrency limit (about +1 per round of calls) and a 429
+halves it. RateLimitedLLM wraps a LangChain chat model so every invoke and stream goes through
+the limiter, and retries 429s with jittered exponential backoff.
+"""
+from typing import Any, Iterator, Mapping, Optional
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+from meal_prompts import estimate_tokens, prompt_text
+
+# Completion tokens reserved for a call until the provider reports the real usage
+DEFAULT_COMPLETION_TOKENS = 1024
+# Share of a configured quota actually used, so other clients of the same key do not tip us into 429s
+DEFAULT_HEADROOM = 0.9
+# With less than this share of a quota left, the concurrency limit stops growing
+NEAR_QUOTA_FRACTION = 0.1
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_SECONDS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+class RateLimitExceeded(ValueError):
+    """The provider still answered 429 after every backoff attempt"""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def parse_duration(value: Any) -> Optional[float]:
+    """Seconds in a rate-limit header value: "7.66s", "2m59.56s", "120ms" or a bare number"""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(number) * _DURATION_SECONDS[unit] for number, unit in parts)
+
+
+def parse_retry_after(value: Any) -> Optional[float]:
+    """Seconds to wait from a Retry-After header, given as a delay or an HTTP date"""
+    seconds = parse_duration(value)
+    if seconds is None and value:
+        try:
+            seconds = parsedate_to_datetime(str(value)).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return None
+    return max(seconds, 0.0) if seconds is not None else None
+
+
+@dataclass
+class RateLimitHeaders:
+    """Quota state reported with a provider response; None where a header was absent"""
+    limit_requests: Optional[float] = None
+    remaining_requests: Optional[float] = None
+    reset_requests: Optional[float] = None
+    limit_tokens: Optional[float] = None
+    remaining_tokens: Optional[float] = None
+    reset_tokens: Optional[float] = None
+    retry_after: Optional[float] = None
+
+
+def parse_rate_limit_headers(headers: Mapping[str, str]) -> RateLimitHeaders:
+    headers = {key.lower(): value for key, value in headers.items()}
+    return RateLimitHeaders(
+        limit_requests=parse_duration(headers.get("x-ratelimit-limit-requests")),
+        remaining_requests=parse_duration(headers.get("x-ratelimit-remaining-requests")),
+        reset_requests=parse_duration(headers.get("x-ratelimit-reset-requests")),
+        limit_tokens=parse_duration(headers.get("x-ratelimit-limit-tokens")),
+        remaining_tokens=parse_duration(headers.get("x-ratelimit-remaining-tokens")),
+        reset_tokens=parse_duration(headers.get("x-ratelimit-reset-tokens")),
+        retry_after=parse_retry_after(headers.get("retry-after")),
+    )
+
+
+def _error_chain(error: BaseException) -> Iterator[BaseException]:
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _is_provider_rate_limit(error: BaseException) -> bool:
+    # An error raised by the Groq SDK means the SDK is already imported, so this never loads it
+    groq = sys.modules.get("groq")
+    return groq is not None and isinstance(error, groq.RateLimitError)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Return how long to wait if error is a provider rate limit, else None.
+
+    Only an HTTP 429 status or the SDK's RateLimitError counts; error messages are not inspected,
+    so an unrelated failure that mentions "429" or "rate limit" is not retried as one.
+    """
+    for e in _error_chain(error):
+        if isinstance(e, RateLimitExceeded):
+            return e.retry_after or 0.0
+        response = getattr(e, "response", None)
+        status = getattr(e, "status_code", None) or getattr(response, "status_code", None)
+        if status == 429 or _is_provider_rate_limit(e):
+            headers = getattr(response, "headers", None) or {}
+            return parse_retry_after(headers.get("retry-after")) or 0.0
+    return None
+
+
+def limiter_gave_up(error: BaseException) -> bool:
+    """True if error, or one it was raised from, is a RateLimitedLLM's RateLimitExceeded.
+
+    Those 429s were already retried with backoff, so callers should not retry them again.
+    """
+    return any(isinstance(e, RateLimitExceeded) for e in _error_chain(error))
+
+
+def _total_tokens(response) -> Optional[int]:
+    """Tokens the provider billed for a response or stream chunk, if it reported them"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        return usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    return token_usage.get("total_tokens")
+
+
+class TokenBucket:
+    """Refills at rate_per_minute up to capacity.
+
+    reserve() takes its amount immediately and returns how long the caller must wait for it, so
+    the level can go negative and concurrent callers queue up in order without polling.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute must be positive")
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self._level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._level = min(self.capacity, self._level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._level
+
+    def reserve(self, amount: float) -> float:
+        """Take amount from the bucket and return the seconds to wait before spending it"""
+        with self._lock:
+            self._refill()
+            # A single call larger than the bucket would otherwise never fit
+            self._level -= min(amount, self.capacity)
+            return max(0.0, -self._level / self.rate)
+
+    def adjust(self, amount: float) -> None:
+        """Take a further amount, or give some back when negative, e.g. once actual usage is known"""
+        with self._lock:
+            self._refill()
+            self._level = min(self.capacity, self._level - amount)
+
+    def sync(self, remaining: float) -> None:
+        """Lower the level to what the provider says is left; calls still in flight keep it from rising"""
+        with self._lock:
+            self._refill()
+            self._level = min(self._level, remaining)
+
+
+class AIMDConcurrency:
+    """Concurrency limit that grows additively on success and shrinks multiplicatively on throttling"""
+
+    def __init__(self, initial: float, minimum: int = 1, maximum: Optional[int] = None,
+                 increase: float = 1.0, decrease: float = 0.5):
+        if minimum < 1:
+            raise ValueError("minimum must be at least 1")
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self._limit = max(float(minimum), float(initial) if maximum is None else min(float(initial), maximum))
+        self._in_flight = 0
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def acquire(self) -> float:
+        """Block until a slot is free; returns the start time to pass back to on_throttle"""
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                self._condition.wait()
+            self._in_flight += 1
+            return time.monotonic()
+
+    def release(self) -> None:
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self) -> None:
+        with self._condition:
+            limit = self._limit + self.increase / self._limit
+            self._limit = limit if self.maximum is None else min(limit, self.maximum)
+            self._condition.notify_all()
+
+    def on_throttle(self, started: float) -> None:
+        """Back off once per congestion event: calls started before the last decrease do not shrink it again"""
+        with self._condition:
+            if started < self._last_decrease:
+                return
+            self._limit = max(float(self.minimum), self._limit * self.decrease)
+            self._last_decrease = time.monotonic()
+
+
+@dataclass
+class Permit:
+    started: float
+    reserved_tokens: float
+
+
+class RateLimiter:
+    """Shared pacing state for every call made with one API key"""
+
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None,
+                 max_concurrency: int = 20, initial_concurrency: Optional[int] = None, min_concurrency: int = 1,
+                 headroom: float = DEFAULT_HEADROOM, completion_tokens: int = DEFAULT_COMPLETION_TOKENS,
+                 max_retries: int = 5, base_backoff: float = 1.0, max_backoff: float = 60.0):
+        """
+        requests_per_minute / tokens_per_minute: the key's quotas; None paces by response headers
+            only (the token quota is learned from x-ratelimit-limit-tokens)
+        headroom: share of each quota to use, so throughput sits just under it
+        max_concurrency / initial_concurrency / min_concurrency: bounds and start of the AIMD limit
+        completion_tokens: tokens reserved per call for the response until actual usage is known
+        max_retries, base_backoff, max_backoff: retries of a 429, with jittered exponential backoff
+        """
+        if not 0 < headroom <= 1:
+            raise ValueError("headroom must be in (0, 1]")
+        self.headroom = headroom
+        self.completion_tokens = completion_tokens
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.requests = TokenBucket(requests_per_minute * headroom) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute * headroom) if tokens_per_minute else None
+        self.concurrency = AIMDConcurrency(initial_concurrency or max_concurrency, minimum=min_concurrency,
+                                           maximum=max_concurrency)
+        self.throttles = 0
+        self.wait_seconds = 0.0
+        self._near_quota = False
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **options) -> "RateLimiter":
+        """Quotas from GROQ_REQUESTS_PER_MINUTE and GROQ_TOKENS_PER_MINUTE when set"""
+        requests_per_minute = os.getenv("GROQ_REQUESTS_PER_MINUTE")
+        tokens_per_minute = os.getenv("GROQ_TOKENS_PER_MINUTE")
+        return cls(requests_per_minute=float(requests_per_minute) if requests_per_minute else None,
+                   tokens_per_minute=float(tokens_per_minute) if tokens_per_minute else None, **options)
+
+    @property
+    def near_quota(self) -> bool:
+        """Whether the provider's last rate-limit headers showed a quota nearly used up"""
+        return self._near_quota
+
+    def estimate_tokens(self, prompt) -> int:
+        text = prompt if isinstance(prompt, str) else prompt_text(prompt)
+        return estimate_tokens(text) + self.completion_tokens
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            with self._lock:
+                self.wait_seconds += seconds
+            time.sleep(seconds)
+
+    def acquire(self, estimated_tokens: int) -> Permit:
+        """Wait for a concurrency slot and for quota, then return the permit to release after the call"""
+        self._sleep(self._resume_at - time.monotonic())
+        started = self.concurrency.acquire()
+        wait = 0.0
+        if self.requests is not None:
+            wait = self.requests.reserve(1)
+        tokens = self.tokens
+        if tokens is not None:
+            wait = max(wait, tokens.reserve(estimated_tokens))
+        # A 429 elsewhere may have paused everyone while this call waited for its slot
+        wait = max(wait, self._resume_at - time.monotonic())
+        self._sleep(wait)
+        return Permit(started=started, reserved_tokens=estimated_tokens if tokens is not None else 0)
+
+    def release(self, permit: Permit, used_tokens: Optional[int] = None) -> None:
+        """Finish a successful call, correcting the token reservation to the usage actually billed"""
+        self.concurrency.release()
+        if used_tokens is not None and self.tokens is not None and permit.reserved_tokens:
+            self.tokens.adjust(used_tokens - permit.reserved_tokens)
+        if not self._near_quota:
+            self.concurrency.on_success()
+
+    def release_failed(self, permit: Permit) -> None:
+        """Finish a call that failed for a reason other than rate limiting"""
+        self.concurrency.release()
+
+    def release_throttled(self, permit: Permit, retry_after: Optional[float] = None) -> None:
+        """Finish a call the provider rejected with a 429: shrink concurrency and pause new calls"""
+        self.concurrency.release()
+        self.concurrency.on_throttle(permit.started)
+        if self.tokens is not None and permit.reserved_tokens:
+            # A rejected call is not billed
+            self.tokens.adjust(-permit.reserved_tokens)
+        with self._lock:
+            self.throttles += 1
+            if retry_after:
+                self._resume_at = max(self._resume_at, time.monotonic() + retry_after)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Exponential backoff with jitter, never shorter than the provider's Retry-After"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** attempt))
+        return max(retry_after or 0.0, random.uniform(delay / 2, delay))
+
+    def observe_headers(self, headers: Mapping[str, str]) -> None:
+        """Bring the buckets in line with the quota state the provider reported"""
+        state = parse_rate_limit_headers(headers)
+        resume_at = 0.0
+        near_quota = False
+        if state.limit_tokens and self.tokens is None:
+            with self._lock:
+                if self.tokens is None:
+                    self.tokens = TokenBucket(state.limit_tokens * self.headroom)
+        for bucket, limit, remaining, reset in (
+            (self.requests, state.limit_requests, state.remaining_requests, state.reset_requests),
+            (self.tokens, state.limit_tokens, state.remaining_tokens, state.reset_tokens),
+        ):
+            if remaining is None:
+                continue
+            if bucket is not None:
+                bucket.sync(remaining)
+            if limit:
+                near_quota = near_quota or remaining < limit * NEAR_QUOTA_FRACTION
+            if remaining <= 0 and reset:
+                resume_at = max(resume_at, time.monotonic() + reset)
+        with self._lock:
+            self._near_quota = near_quota
+            self._resume_at = max(self._resume_at, resume_at)
+
+    def observe_response(self, response) -> None:
+        """httpx response event hook"""
+        self.observe_headers(response.headers)
+
+    def snapshot(self) -> dict:
+        return {
+            "concurrency_limit": self.concurrency.limit,
+            "in_flight": self.concurrency.in_flight,
+            "throttles": self.throttles,
+            "wait_seconds": round(self.wait_seconds, 3),  # spent pacing and backing off
+            "requests_available": None if self.requests is None else self.requests.available,
+            "tokens_available": None if self.tokens is None else self.tokens.available,
+            "near_quota": self._near_quota,
+        }
+
+
+class RateLimitedLLM:
+    """Wraps a LangChain chat model so invoke() and stream() are paced by a RateLimiter.
+
+    Everything else is delegated to the wrapped model.
+    """
+
+    def __init__(self, llm, limiter: RateLimiter):
+        self.llm = llm
+        self.limiter = limiter
+
+    def __getattr__(self, name):
+        return getattr(self.llm, name)
+
+    def _throttled(self, attempt: int, retry_after: float, error: Exception) -> None:
+        if attempt >= self.limiter.max_retries:
+            raise RateLimitExceeded(f"Rate limited by the LLM provider after {attempt + 1} attempts: {str(error)}",
+                                    retry_after=retry_after) from error
+        self.limiter._sleep(self.limiter.backoff_delay(attempt, retry_after))
+
+    def invoke(self, prompt, **kwargs):
+        estimated_tokens = self.limiter.estimate_tokens(prompt)
+        for attempt in range(self.limiter.max_retries + 1):
+            permit = self.limiter.acquire(estimated_tokens)
+            try:
+                response = self.llm.invoke(prompt, **kwargs)
+            except Exception as e:
+                retry_after = retry_after_seconds(e)
+                if retry_after is None:
+                    self.limiter.release_failed(permit)
+                    raise
+                self.limiter.release_throttled(permit, retry_after)
+                self._throttled(attempt, retry_after, e)
+                continue
+            self.limiter.release(permit, _total_tokens(response))
+            return response
+
+    def stream(self, prompt, **kwargs):
+        estimated_tokens = self.limiter.estimate_tokens(prompt)
+        for attempt in range(self.limiter.max_retries + 1):
+            permit = self.limiter.acquire(estimated_tokens)
+            used_tokens = None
+            yielded = False
+            try:
+                for chunk in self.llm.stream(prompt, **kwargs):
+                    chunk_tokens = _total_tokens(chunk)
+                    if chunk_tokens:
+                        used_tokens = (used_tokens or 0) + chunk_tokens
+                    yielded = True
+                    yield chunk
+            except Exception as e:
+                # Chunks already handed out cannot be taken back, so only a 429 before the first chunk is retried
+                retry_after = None if yielded else retry_after_seconds(e)
+                if retry_after is None:
+                    self.limiter.release_failed(permit)
+                    raise
+                self.limiter.release_throttled(permit, retry_after)
+                self._throttled(attempt, retry_after, e)
+                continue
+            except GeneratorExit:
+                self.limiter.release_failed(permit)
+                raise
+            self.limiter.release(permit, used_tokens)
+            return
@@ -0,0 +1,182 @@
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+import json
+import os
+
+import numpy as np
+
+from user_profile import UserProfile, MealFrequency
+from meal_models import Meal, DailyMealPlan, WeeklyMealPlan, sum_totals
+from recipe_index import RecipeIndex, CATEGORY_MEAL_TYPES
+from variety import exclusion_list
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "recipes.json")
+
+NUTRIENTS = ("calories", "protein", "carbs", "fats")
+
+# (meal_type label, recipe category, share of daily calories) for each meal schedule
+MEAL_SLOTS = {
+    MealFrequency.THREE_MEALS: [
+        ("Breakfast", "breakfast", 0.30),
+        ("Lunch", "lunch", 0.35),
+        ("Dinner", "dinner", 0.35),
+    ],
+    MealFrequency.FIVE_MEALS: [
+        ("Breakfast", "breakfast", 0.25),
+        ("Morning Snack", "snack", 0.10),
+        ("Lunch", "lunch", 0.30),
+        ("Afternoon Snack", "snack", 0.10),
+        ("Dinner", "dinner", 0.25),
+    ],
+    MealFrequency.INTERMITTENT_FASTING: [
+        ("First Meal", "breakfast", 0.30),
+        ("Second Meal", "lunch", 0.35),
+        ("Final Meal", "dinner", 0.35),
+    ],
+    MealFrequency.CUSTOM: [
+        ("Early Morning Meal", "breakfast", 0.20),
+        ("Mid-Morning Meal", "snack", 0.15),
+        ("Midday Meal", "lunch", 0.25),
+        ("Afternoon Meal", "snack", 0.15),
+        ("Evening Meal", "dinner", 0.25),
+    ],
+}
+
+# Portions are scaled to hit each slot's calories, within these bounds
+MIN_PORTION = 0.5
+MAX_PORTION = 2.0
+# Penalty for reusing a recipe already picked for the same day
+REPEAT_PENALTY = 1.0
+# Score bonus for recipes from one of the user's preferred cuisines
+CUISINE_BONUS = 0.05
+# Days rotate through this many best-scoring candidates per slot
+VARIETY_WINDOW = 3
+
+
+def meal_type_category(meal_type: str) -> str:
+    """Recipe category that serves a meal_type label, e.g. "First Meal" -> "breakfast" """
+    label = meal_type.lower()
+    for slots in MEAL_SLOTS.values():
+        for slot_label, category, _ in slots:
+            if slot_label.lower() == label:
+                return category
+    for category, meal_types in CATEGORY_MEAL_TYPES.items():
+        if label in meal_types:
+            return category
+    return "snack"
+
+
+def load_catalog(path: str = DEFAULT_CATALOG_PATH) -> List[dict]:
+    """Load the bundled recipe catalog"""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)["recipes"]
+
+
+class RecipeEngine:
+    """Deterministic local meal planner that builds plans from a recipe catalog without an LLM"""
+
+    def __init__(self, recipes: Optional[List[dict]] = None, catalog_path: str = DEFAULT_CATALOG_PATH,
+                 index: Optional[RecipeIndex] = None, index_path: Optional[str] = None):
+        """
+        index: prebuilt constraint index over recipes
+        index_path: directory of a persisted index, memory-mapped if current and rebuilt otherwise
+        """
+        self.recipes = recipes if recipes is not None else load_catalog(catalog_path)
+        if not self.recipes:
+            raise ValueError("Recipe catalog is empty")
+        if index is None:
+            index = RecipeIndex.load_or_build(self.recipes, index_path) if index_path else RecipeIndex.build(self.recipes)
+        if index.num_recipes != len(self.recipes):
+            raise ValueError("Recipe index does not match the catalog")
+        self.index = index
+        self._nutrition = np.array(
+            [[recipe["nutrition"][nutrient] for nutrient in NUTRIENTS] for recipe in self.recipes],
+            dtype=np.float64,
+        )
+
+    def candidates(self, user_profile: UserProfile, category: str) -> np.ndarray:
+        """Return ids of the recipes in a category for the profile, relaxing prep time, skill and
+        disliked foods (in that order) when no recipe meets all of them"""
+        return self.index.candidates(user_profile, category, relax=True)
+
+    def _pick(self, candidate_ids: np.ndarray, target: np.ndarray, used: Set[int],
+              preferred_cuisines: Set[str], day: int) -> Tuple[int, float]:
+        """Score all candidates for one slot in a single vectorized pass and return (recipe_id, portion)"""
+        base = self._nutrition[candidate_ids]
+        portions = np.clip(target[0] / base[:, 0], MIN_PORTION, MAX_PORTION)
+        relative_error = (base * portions[:, None] - target) / target
+        scores = np.square(relative_error).sum(axis=1)
+        if used:
+            scores += REPEAT_PENALTY * np.isin(candidate_ids, list(used))
+        if preferred_cuisines:
+            scores -= CUISINE_BONUS * np.array(
+                [self.recipes[recipe_id]["cuisine"].lower() in preferred_cuisines for recipe_id in candidate_ids]
+            )
+        ranked = np.argsort(scores, kind="stable")
+        choice = ranked[day % min(VARIETY_WINDOW, len(ranked))]
+        return int(candidate_ids[choice]), float(portions[choice])
+
+    def _build_meal(self, recipe_id: int, meal_type: str, portion: float) -> Meal:
+        recipe = self.recipes[recipe_id]
+        return Meal(
+            name=recipe["name"],
+            meal_type=meal_type,
+            ingredients=list(recipe["ingredients"]),
+            instructions=list(recipe["instructions"]),
+            nutrition=dict(recipe["nutrition"]),
+            prep_time=recipe["prep_time"],
+        ).scaled(portion)
+
+    def generate_meal(self, user_profile: UserProfile, meal_type: str, budget: Dict[str, float],
+                      avoid_names: Sequence[str] = ()) -> Meal:
+        """Pick one meal for a slot, portioned to a calorie/macro budget keyed like NUTRIENTS"""
+        category = meal_type_category(meal_type)
+        candidate_ids = self.candidates(user_profile, category)
+        avoid = {name.lower() for name in avoid_names}
+        fresh = np.array([self.recipes[recipe_id]["name"].lower() not in avoid for recipe_id in candidate_ids], dtype=bool)
+        if fresh.any():
+            candidate_ids = candidate_ids[fresh]
+        if len(candidate_ids) == 0:
+            raise ValueError(f"No {category} recipes in the catalog fit this diet and these allergies")
+        preferred_cuisines = {cuisine.lower() for cuisine in (user_profile.preferred_cuisines or [])}
+        target = np.array([budget[nutrient] for nutrient in NUTRIENTS])
+        recipe_id, portion = self._pick(candidate_ids, target, set(), preferred_cuisines, day=0)
+        return self._build_meal(recipe_id, meal_type, portion)
+
+    def generate_daily_plan(self, user_profile: UserProfile, day: int = 0,
+                            avoid_names: Sequence[str] = ()) -> DailyMealPlan:
+        """Build a daily plan whose meals are portioned to the profile's calorie and macro targets.
+
+        Recipes named in avoid_names (meals other days already use) are picked only when nothing else fits.
+        """
+        macros = user_profile.calculate_macros()
+        daily_target = np.array(
+            [user_profile.calculate_target_calories(), macros["protein"], macros["carbs"], macros["fats"]]
+        )
+        preferred_cuisines = {cuisine.lower() for cuisine in (user_profile.preferred_cuisines or [])}
+        slots = MEAL_SLOTS.get(user_profile.meal_frequency, MEAL_SLOTS[MealFrequency.THREE_MEALS])
+
+        avoid = {name.lower() for name in avoid_names}
+        candidates_by_category: Dict[str, np.ndarray] = {}
+        used: Set[int] = set()
+        meals = []
+        for meal_type, category, share in slots:
+            if category not in candidates_by_category:
+                candidate_ids = self.candidates(user_profile, category)
+                fresh = np.array([self.recipes[recipe_id]["name"].lower() not in avoid
+                                  for recipe_id in candidate_ids], dtype=bool)
+                candidates_by_category[category] = candidate_ids[fresh] if fresh.any() else candidate_ids
+            candidate_ids = candidates_by_category[category]
+            if len(candidate_ids) == 0:
+                raise ValueError(f"No {category} recipes in the catalog fit this diet and these allergies")
+            recipe_id, portion = self._pick(candidate_ids, daily_target * share, used, preferred_cuisines, day)
+            used.add(recipe_id)
+            meals.append(self._build_meal(recipe_id, meal_type, portion))
+
+        return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **sum_totals(meals))
+
+    def generate_weekly_plan(self, user_profile: UserProfile, days: int = 7) -> WeeklyMealPlan:
+        """Build a weekly plan, rotating through the best candidates and avoiding earlier days' meals"""
+        daily_plans: List[DailyMealPlan] = []
+        for day in range(days):
+            daily_plans.append(self.generate_daily_plan(user_profile, day=day, avoid_names=exclusion_list(daily_plans)))
+        return WeeklyMealPlan(daily_plans=daily_plans)
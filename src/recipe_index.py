@@ -0,0 +1,263 @@
+from typing import Dict, Iterable, List, Optional, Sequence
+import hashlib
+import json
+import os
+import re
+
+import numpy as np
+
+from user_profile import UserProfile, DietaryPreference, CookingSkill
+from meal_models import meal_order
+
+INDEX_VERSION = 1
+
+SKILL_RANK = {
+    CookingSkill.BEGINNER.value: 0,
+    CookingSkill.INTERMEDIATE.value: 1,
+    CookingSkill.ADVANCED.value: 2,
+}
+
+# Catalog categories mapped onto meal_order meal types
+CATEGORY_MEAL_TYPES = {
+    "breakfast": ("breakfast",),
+    "lunch": ("lunch",),
+    "dinner": ("dinner",),
+    "snack": ("morning snack", "afternoon snack"),
+}
+
+# Free-text allergy terms mapped onto the catalog's allergen tags
+ALLERGEN_ALIASES = {
+    "milk": ("dairy",),
+    "lactose": ("dairy",),
+    "cheese": ("dairy",),
+    "wheat": ("gluten",),
+    "nut": ("tree_nut", "peanut"),
+    "tree nut": ("tree_nut",),
+    "almond": ("tree_nut",),
+    "walnut": ("tree_nut",),
+    "shrimp": ("shellfish",),
+    "prawn": ("shellfish",),
+    "crab": ("shellfish",),
+    "tofu": ("soy",),
+}
+
+# Upper bounds (minutes) of the cumulative prep-time buckets
+PREP_TIME_BUCKETS = tuple(range(5, 181, 5))
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def normalize_term(text: str) -> str:
+    """Lowercase, trim and naively singularize a food or allergy term"""
+    term = " ".join(text.lower().replace("_", " ").split())
+    if term.endswith("ies") and len(term) > 4:
+        return term[:-3] + "y"
+    if term.endswith("oes") and len(term) > 4:
+        return term[:-2]
+    if term.endswith("s") and not term.endswith("ss") and len(term) > 3:
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str) -> List[str]:
+    """Split free text into normalized word tokens"""
+    return [normalize_term(word) for word in _WORD.findall(text.lower())]
+
+
+def catalog_digest(recipes: Sequence[dict]) -> str:
+    """Stable hash of a recipe catalog, used to detect stale persisted indexes"""
+    encoded = json.dumps(recipes, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+class RecipeIndex:
+    """Constraint index over a recipe catalog.
+
+    Low-cardinality attributes (diet tag, allergen, meal type, skill, prep-time bucket) are
+    packed bitmaps, so a profile's candidate set is a handful of bitwise ANDs. Ingredient
+    tokens use inverted posting lists, which are cheaper for the sparse "exclude" lookups.
+    Persisted indexes are memory-mapped, so loading one does no work proportional to the catalog.
+    """
+
+    def __init__(self, num_recipes: int, bitmap_keys: Dict[str, int], bitmaps: np.ndarray,
+                 token_offsets: Dict[str, List[int]], postings: np.ndarray, prep_times: np.ndarray,
+                 digest: str = ""):
+        self.num_recipes = num_recipes
+        self.bitmap_keys = bitmap_keys
+        self.bitmaps = bitmaps
+        self.token_offsets = token_offsets
+        self.postings = postings
+        self.prep_times = prep_times
+        self.digest = digest
+        self._empty = np.zeros(bitmaps.shape[1], dtype=np.uint8)
+
+    @classmethod
+    def build(cls, recipes: Sequence[dict]) -> "RecipeIndex":
+        """Build an index from catalog records"""
+        num_recipes = len(recipes)
+        members: Dict[str, List[int]] = {}
+        token_postings: Dict[str, List[int]] = {}
+
+        def add(key: str, recipe_id: int):
+            members.setdefault(key, []).append(recipe_id)
+
+        for recipe_id, recipe in enumerate(recipes):
+            for meal_type in CATEGORY_MEAL_TYPES[recipe["category"]]:
+                add(f"meal:{meal_order[meal_type]}", recipe_id)
+            for diet in recipe["diets"]:
+                add(f"diet:{diet}", recipe_id)
+            for allergen in recipe["allergens"]:
+                add(f"allergen:{allergen}", recipe_id)
+            # Skill and prep-time bitmaps are cumulative: "skill:1" holds every recipe a rank-1 cook can make
+            for rank in range(SKILL_RANK[recipe["skill"]], len(SKILL_RANK)):
+                add(f"skill:{rank}", recipe_id)
+            for bucket in PREP_TIME_BUCKETS:
+                if recipe["prep_time"] <= bucket:
+                    add(f"prep:{bucket}", recipe_id)
+            for token in set(tokenize(" ".join([recipe["name"]] + recipe["ingredients"]))):
+                token_postings.setdefault(token, []).append(recipe_id)
+
+        bitmap_keys = {key: row for row, key in enumerate(sorted(members))}
+        dense = np.zeros((max(len(bitmap_keys), 1), num_recipes), dtype=bool)
+        for key, row in bitmap_keys.items():
+            dense[row, members[key]] = True
+        bitmaps = np.packbits(dense, axis=1)
+
+        token_offsets = {}
+        flat: List[int] = []
+        for token in sorted(token_postings):
+            token_offsets[token] = [len(flat), len(flat) + len(token_postings[token])]
+            flat.extend(token_postings[token])
+
+        return cls(
+            num_recipes=num_recipes,
+            bitmap_keys=bitmap_keys,
+            bitmaps=bitmaps,
+            token_offsets=token_offsets,
+            postings=np.array(flat, dtype=np.int32),
+            prep_times=np.array([recipe["prep_time"] for recipe in recipes], dtype=np.int32),
+            digest=catalog_digest(recipes),
+        )
+
+    def save(self, path: str) -> None:
+        """Persist the index as a directory of .npy arrays plus a JSON key table"""
+        os.makedirs(path, exist_ok=True)
+        np.save(os.path.join(path, "bitmaps.npy"), self.bitmaps)
+        np.save(os.path.join(path, "postings.npy"), self.postings)
+        np.save(os.path.join(path, "prep_times.npy"), self.prep_times)
+        meta = {
+            "version": INDEX_VERSION,
+            "num_recipes": self.num_recipes,
+            "digest": self.digest,
+            "bitmap_keys": self.bitmap_keys,
+            "token_offsets": self.token_offsets,
+        }
+        with open(os.path.join(path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def load(cls, path: str) -> "RecipeIndex":
+        """Open a persisted index; the arrays are memory-mapped rather than read into memory"""
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported recipe index version: {meta.get('version')}")
+        return cls(
+            num_recipes=meta["num_recipes"],
+            bitmap_keys=meta["bitmap_keys"],
+            bitmaps=np.load(os.path.join(path, "bitmaps.npy"), mmap_mode="r"),
+            token_offsets=meta["token_offsets"],
+            postings=np.load(os.path.join(path, "postings.npy"), mmap_mode="r"),
+            prep_times=np.load(os.path.join(path, "prep_times.npy"), mmap_mode="r"),
+            digest=meta["digest"],
+        )
+
+    @classmethod
+    def load_or_build(cls, recipes: Sequence[dict], path: str) -> "RecipeIndex":
+        """Load the index at path, rebuilding and saving it if missing or built from another catalog"""
+        digest = catalog_digest(recipes)
+        if os.path.exists(os.path.join(path, "meta.json")):
+            try:
+                index = cls.load(path)
+                if index.digest == digest:
+                    return index
+            except ValueError:
+                pass
+        index = cls.build(recipes)
+        index.save(path)
+        return index
+
+    def _bitmap(self, key: str) -> np.ndarray:
+        row = self.bitmap_keys.get(key)
+        return self._empty if row is None else self.bitmaps[row]
+
+    def _token_postings(self, token: str) -> np.ndarray:
+        offsets = self.token_offsets.get(token)
+        if offsets is None:
+            return self.postings[:0]
+        return self.postings[offsets[0]:offsets[1]]
+
+    def _term_matches(self, term: str) -> np.ndarray:
+        """Recipe ids whose name or ingredients contain every word of term"""
+        matches: Optional[np.ndarray] = None
+        for token in tokenize(term):
+            postings = self._token_postings(token)
+            matches = postings if matches is None else np.intersect1d(matches, postings, assume_unique=True)
+            if len(matches) == 0:
+                break
+        return matches if matches is not None else self.postings[:0]
+
+    def _clear(self, mask: np.ndarray, recipe_ids: Iterable[int]) -> None:
+        recipe_ids = np.asarray(recipe_ids, dtype=np.int64)
+        if len(recipe_ids):
+            np.bitwise_and.at(mask, recipe_ids >> 3, ~(np.uint8(0x80) >> (recipe_ids & 7).astype(np.uint8)))
+
+    def _filter(self, user_profile: UserProfile, category: str, max_prep_time: Optional[int], skill_rank: int,
+                avoid_disliked: bool) -> np.ndarray:
+        meal_type = CATEGORY_MEAL_TYPES[category][0]
+        mask = self._bitmap(f"meal:{meal_order[meal_type]}").copy()
+        if user_profile.dietary_preference != DietaryPreference.NONE:
+            mask &= self._bitmap(f"diet:{user_profile.dietary_preference.value}")
+        mask &= self._bitmap(f"skill:{skill_rank}")
+        if max_prep_time:
+            # Narrow to the smallest bucket covering the limit; the exact check runs on the survivors
+            bucket = next((bucket for bucket in PREP_TIME_BUCKETS if bucket >= max_prep_time), None)
+            if bucket is not None:
+                mask &= self._bitmap(f"prep:{bucket}")
+
+        for value in user_profile.allergies or []:
+            if not value or not value.strip():
+                continue
+            term = normalize_term(value)
+            for allergen in ALLERGEN_ALIASES.get(term, ()) + (term.replace(" ", "_"),):
+                mask &= ~self._bitmap(f"allergen:{allergen}")
+            self._clear(mask, self._term_matches(term))
+        if avoid_disliked:
+            for value in user_profile.disliked_foods or []:
+                if value and value.strip():
+                    self._clear(mask, self._term_matches(value))
+
+        candidate_ids = np.flatnonzero(np.unpackbits(mask, count=self.num_recipes))
+        if max_prep_time:
+            candidate_ids = candidate_ids[self.prep_times[candidate_ids] <= max_prep_time]
+        return candidate_ids
+
+    def candidates(self, user_profile: UserProfile, category: str, relax: bool = False) -> np.ndarray:
+        """Return ids of the recipes in a category that satisfy every constraint of the profile.
+
+        With relax, a profile nothing satisfies gets the nearest recipes instead: the prep-time
+        limit is raised to the quickest matching recipes, then the skill level, then disliked
+        foods are allowed back. Diet and allergies are never relaxed, so the result can still be empty.
+        """
+        skill_rank = SKILL_RANK[user_profile.cooking_skill.value]
+        candidate_ids = self._filter(user_profile, category, user_profile.meal_prep_time, skill_rank, True)
+        if len(candidate_ids) or not relax:
+            return candidate_ids
+        for avoid_disliked in (True, False):
+            for rank in range(skill_rank, len(SKILL_RANK)):
+                candidate_ids = self._filter(user_profile, category, None, rank, avoid_disliked)
+                if len(candidate_ids):
+                    quickest = int(self.prep_times[candidate_ids].min())
+                    limit = max(quickest, user_profile.meal_prep_time or 0)
+                    return candidate_ids[self.prep_times[candidate_ids] <= limit]
+        return candidate_ids
@@ -0,0 +1,386 @@
+"""Consolidated shopping lists and batch-prep tasks for daily and weekly plans.
+
+Usage (on the output of batch.py):
+    python src/shopping.py plans.jsonl -o shopping.jsonl [--min-meals 2]
+
+Ingredient lines are free text ("2 cups spinach", "spinach, chopped", "1 garlic clove, minced").
+parse_ingredient splits one into quantity, unit and a canonical item name using a word index
+built once at import (unit aliases and their conversions, size and preparation words), and is
+memoized: plans repeat the same lines across days and users, so a batch mostly hits the cache.
+shopping_list then merges a week in one pass, summing each item in grams, millilitres or its
+count unit; batch_prep groups the knife work and cooking that several meals share.
+"""
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple, Union
+from dataclasses import asdict, dataclass, field
+from functools import lru_cache
+import argparse
+import csv
+import io
+import json
+import math
+import re
+import sys
+
+from meal_models import Meal, DailyMealPlan, WeeklyMealPlan, parse_amount
+from recipe_index import normalize_term
+
+Plan = Union[DailyMealPlan, WeeklyMealPlan]
+
+# Distinct ingredient lines and instructions remembered by the parsers
+PARSE_CACHE_SIZE = 65536
+
+# canonical unit -> (base unit, base units per unit, aliases); base units are what lines are summed in
+UNITS = {
+    "g": ("g", 1.0, ("g", "gr", "gram")),
+    "kg": ("g", 1000.0, ("kg", "kilogram")),
+    "oz": ("g", 28.3495, ("oz", "ounce")),
+    "lb": ("g", 453.592, ("lb", "lbs", "pound")),
+    "ml": ("ml", 1.0, ("ml", "milliliter", "millilitre")),
+    "l": ("ml", 1000.0, ("l", "liter", "litre")),
+    "tsp": ("ml", 4.92892, ("tsp", "teaspoon")),
+    "tbsp": ("ml", 14.7868, ("tbsp", "tbs", "tablespoon")),
+    "cup": ("ml", 236.588, ("cup",)),
+}
+# Units that are counted rather than converted
+COUNT_UNITS = ("clove", "slice", "piece", "can", "jar", "bunch", "sprig", "stalk", "head", "fillet",
+               "scoop", "handful", "pinch", "dash", "packet")
+# Counted units that may follow the item, as in "1 garlic clove"
+TRAILING_UNITS = frozenset({"clove", "slice", "piece", "sprig", "stalk", "head", "fillet"})
+
+# Preparation word (participle or imperative) -> action
+PREP_ACTIONS = {
+    "chop": ("chopped", "chop"),
+    "dice": ("diced", "dice"),
+    "slice": ("sliced", "slice"),
+    "mince": ("minced", "mince"),
+    "grate": ("grated", "grate"),
+    "shred": ("shredded", "shred"),
+    "cube": ("cubed", "cube"),
+    "peel": ("peeled", "peel"),
+    "halve": ("halved", "halve"),
+    "cook": ("cooked", "cook"),
+    "boil": ("boiled", "boil"),
+    "roast": ("roasted", "roast"),
+    "bake": ("baked", "bake"),
+    "grill": ("grilled", "grill"),
+    "toast": ("toasted", "toast"),
+    "marinate": ("marinated", "marinate"),
+    "soak": ("soaked", "soak"),
+    "rinse": ("rinsed", "rinse"),
+}
+# Words about size, freshness or quantity that are not part of the item
+_FILLER_WORDS = ("small", "medium", "large", "fresh", "raw", "optional", "about", "approx", "of", "a", "an",
+                 "the", "heaped", "level", "scant", "generous", "for", "serving")
+
+# Canonical spellings for common synonyms, after singularizing
+ITEM_ALIASES = {
+    "garbanzo bean": "chickpea",
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "coriander leaf": "cilantro",
+    "feta cheese": "feta",
+    "parmesan cheese": "parmesan",
+    "whole egg": "egg",
+    "courgette": "zucchini",
+    "aubergine": "eggplant",
+}
+
+# Items that come from the pantry and are never prepped ahead; matched on the whole item or its last word
+PANTRY_ITEMS = frozenset({"salt", "pepper", "black pepper", "salt and pepper", "water", "honey", "cumin",
+                          "turmeric", "paprika", "smoked paprika", "cinnamon", "oregano", "mirin"})
+PANTRY_HEADS = frozenset({"oil", "sauce", "syrup", "vinegar", "paste", "powder", "flake", "seasoning", "spice",
+                          "juice", "stock", "broth", "dressing"})
+
+_UNICODE_FRACTIONS = {"½": " 1/2", "⅓": " 1/3", "⅔": " 2/3", "¼": " 1/4", "¾": " 3/4", "⅛": " 1/8"}
+_NUMBER = r"\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?"
+_QUANTITY = re.compile(rf"^\s*(?P<low>{_NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{_NUMBER}))?\s*")
+_WORD = re.compile(r"[a-z]+(?:['-][a-z]+)*")
+_PARENTHETICAL = re.compile(r"\([^)]*\)")
+# How or whether to use an item ("salt and pepper to taste", "basil for garnish"); the rest of the line is dropped
+_USAGE_NOTE = re.compile(r"\b(?:to taste|as needed|as required|if desired|if needed|optional|"
+                         r"for (?:garnish|garnishing|serving|drizzling|topping|dusting|greasing|frying))\b.*$")
+
+
+# Plurals normalize_term gets wrong
+_IRREGULAR_PLURALS = {"leaves": "leaf", "loaves": "loaf", "halves": "half", "knives": "knife"}
+
+
+def _singular(word: str) -> str:
+    if word in _IRREGULAR_PLURALS:
+        return _IRREGULAR_PLURALS[word]
+    # normalize_term would turn "hummus" into "hummu"
+    if word.endswith(("us", "is", "ss")):
+        return word
+    return normalize_term(word)
+
+
+def _build_word_index() -> Dict[str, Tuple[str, str]]:
+    """word -> (role, canonical form), for every spelling the parser recognizes"""
+    index: Dict[str, Tuple[str, str]] = {}
+    for word in _FILLER_WORDS:
+        index[word] = ("filler", word)
+    for action, words in PREP_ACTIONS.items():
+        for word in words:
+            index.setdefault(word, ("prep", action))
+    for unit, (_, _, aliases) in UNITS.items():
+        for alias in aliases:
+            index[alias] = index[alias + "s"] = ("unit", unit)
+    for unit in COUNT_UNITS:
+        index[unit] = index[unit + "s"] = index[unit + "es"] = ("unit", unit)
+    return index
+
+
+_WORD_INDEX = _build_word_index()
+# Instructions are imperative, so "Slice the banana" is an action even though "slice" is also a unit
+_ACTION_WORDS = {word: action for action, words in PREP_ACTIONS.items() for word in words}
+
+
+@dataclass(frozen=True)
+class Ingredient:
+    """One parsed ingredient line; amount is the quantity in base_unit ("g", "ml", a count unit or "")"""
+    item: str
+    quantity: Optional[float] = None
+    unit: Optional[str] = None
+    prep: Optional[str] = None
+    base_unit: str = ""
+    amount: Optional[float] = None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_ingredient(text: str) -> Ingredient:
+    """Parse a free-text ingredient line, e.g. "1/4 onion, diced" -> 0.25 x onion, prep "dice"
+
+    A range ("1-2 cups") counts as its upper end, so the list buys enough.
+    """
+    line = text.lower()
+    for fraction, replacement in _UNICODE_FRACTIONS.items():
+        line = line.replace(fraction, replacement)
+    line = _PARENTHETICAL.sub(" ", line)
+    main, _, note = line.partition(",")
+
+    quantity = None
+    match = _QUANTITY.match(main)
+    if match:
+        quantity = parse_amount(match.group("high") or match.group("low"))
+        main = main[match.end():]
+    main = _USAGE_NOTE.sub("", main)
+
+    unit = prep = None
+    words = []
+    for word in _WORD.findall(main):
+        role, canonical = _WORD_INDEX.get(word, ("item", None))
+        if role == "unit" and unit is None and (not words or canonical in TRAILING_UNITS):
+            unit = canonical
+        elif role == "prep":
+            prep = prep or canonical
+        elif role != "filler":
+            words.append(_singular(word))
+    if quantity is None and unit is not None:
+        # "pinch of chili flakes"
+        quantity = 1.0
+    for word in _WORD.findall(note):
+        role, canonical = _WORD_INDEX.get(word, ("item", None))
+        if role == "prep":
+            prep = prep or canonical
+    item = " ".join(words) or " ".join(_WORD.findall(line))
+    item = ITEM_ALIASES.get(item, item)
+
+    base_unit, factor = (UNITS[unit][0], UNITS[unit][1]) if unit in UNITS else (unit or "", 1.0)
+    amount = quantity * factor if quantity is not None else None
+    return Ingredient(item=item, quantity=quantity, unit=unit, prep=prep, base_unit=base_unit, amount=amount)
+
+
+def _is_pantry(item: str) -> bool:
+    return item in PANTRY_ITEMS or item.rsplit(" ", 1)[-1] in PANTRY_HEADS
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _instruction_action(instruction: str) -> Tuple[Optional[str], FrozenSet[str]]:
+    """(action a prep instruction starts with, or None; its singularized words)"""
+    words = _WORD.findall(instruction.lower())
+    if not words:
+        return None, frozenset()
+    return _ACTION_WORDS.get(words[0]), frozenset(_singular(word) for word in words)
+
+
+@dataclass(frozen=True)
+class ParsedMeal:
+    """What the shopping list and batch prep need from one meal"""
+    lines: Tuple[Tuple[Tuple[str, str], Optional[float]], ...]   # ((item, base unit), amount)
+    prep: Tuple[Tuple[Tuple[str, str], str, Optional[float]], ...]   # ((action, item), base unit, amount);
+                                                                     # pantry items left out
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse_meal(ingredients: Tuple[str, ...], instructions: Tuple[str, ...]) -> ParsedMeal:
+    parsed = [parse_ingredient(line) for line in ingredients]
+    needed = {(ingredient.prep, ingredient.item) for ingredient in parsed if ingredient.prep is not None}
+    for instruction in instructions:
+        action, words = _instruction_action(instruction)
+        if action is not None:
+            needed.update((action, ingredient.item) for ingredient in parsed
+                          if words.issuperset(ingredient.item.split()))
+    lines = tuple(((ingredient.item, ingredient.base_unit), ingredient.amount) for ingredient in parsed)
+    prep = []
+    for step in sorted(needed):
+        if _is_pantry(step[1]):
+            continue
+        # The amount to prep is the item's first measured unit, summed over the meal's lines in that unit
+        measured = [(base_unit, amount) for (item, base_unit), amount in lines if item == step[1] and amount is not None]
+        if measured:
+            base_unit = measured[0][0]
+            prep.append((step, base_unit, sum(amount for unit, amount in measured if unit == base_unit)))
+        else:
+            prep.append((step, "", None))
+    return ParsedMeal(lines=lines, prep=tuple(prep))
+
+
+def parse_meal(meal: Meal) -> ParsedMeal:
+    """Parse a meal's ingredients and instructions; memoized, as meals repeat across days and users"""
+    return _parse_meal(tuple(meal.ingredients), tuple(meal.instructions))
+
+
+def display_quantity(amount: float, base_unit: str) -> Tuple[float, str]:
+    """A summed amount in the unit a shopper would read: kg/l past 1000, whole counts rounded up"""
+    if base_unit in ("g", "ml"):
+        if amount >= 1000:
+            return round(amount / 1000, 2), "kg" if base_unit == "g" else "l"
+        return round(amount, 1), base_unit
+    return float(math.ceil(amount - 1e-9)), base_unit
+
+
+@dataclass
+class ShoppingItem:
+    """One line of a shopping list; quantity is None when no line for the item gave an amount"""
+    item: str
+    quantity: Optional[float]
+    unit: str
+    uses: int           # ingredient lines merged into this item
+    unmeasured: int     # of which had no amount ("salt, to taste")
+
+
+def _daily_plans(plan: Plan) -> List[DailyMealPlan]:
+    return plan.daily_plans if isinstance(plan, WeeklyMealPlan) else [plan]
+
+
+def shopping_list(plans: Union[Plan, Iterable[Plan]]) -> List[ShoppingItem]:
+    """Every ingredient of one or more plans merged into one list, sorted by item.
+
+    Lines for the same item are summed when their units convert to the same base unit; an item
+    bought by weight and by volume ("100 g spinach", "1 cup spinach") gets a line for each.
+    """
+    plans = [plans] if isinstance(plans, (DailyMealPlan, WeeklyMealPlan)) else plans
+    # (item, base unit) -> [amount, uses, unmeasured]
+    totals: Dict[Tuple[str, str], list] = {}
+    for plan in plans:
+        for daily_plan in _daily_plans(plan):
+            for meal in daily_plan.meals:
+                for key, amount in parse_meal(meal).lines:
+                    entry = totals.get(key)
+                    if entry is None:
+                        entry = totals[key] = [0.0, 0, 0]
+                    entry[1] += 1
+                    if amount is None:
+                        entry[2] += 1
+                    else:
+                        entry[0] += amount
+
+    items = []
+    for (item, base_unit), (amount, uses, unmeasured) in sorted(totals.items()):
+        if uses == unmeasured:
+            items.append(ShoppingItem(item, None, base_unit, uses, unmeasured))
+        else:
+            quantity, unit = display_quantity(amount, base_unit)
+            items.append(ShoppingItem(item, quantity, unit, uses, unmeasured))
+    return items
+
+
+@dataclass
+class PrepTask:
+    """Preparation several meals share, e.g. dice onion for three dinners, done once ahead"""
+    action: str
+    item: str
+    meals: List[Tuple[int, int]] = field(default_factory=list)   # (day, meal index), as find_repeats
+    quantity: Optional[float] = None
+    unit: str = ""
+
+    @property
+    def description(self) -> str:
+        amount = f" ({self.quantity:g} {self.unit})".replace(" )", ")") if self.quantity is not None else ""
+        return f"{self.action.capitalize()} {self.item}{amount} for {len(self.meals)} meals"
+
+
+def batch_prep(plan: Plan, min_meals: int = 2) -> List[PrepTask]:
+    """Preparation steps shared by at least min_meals meals of a plan, most shared first.
+
+    A meal needs "dice onion" when an ingredient line says so ("1/4 onion, diced") or an
+    instruction starts with the action and names the item ("Dice the onion"). Pantry items
+    (oils, spices, sauces) are never prepped ahead.
+    """
+    # (action, item) -> task
+    tasks: Dict[Tuple[str, str], PrepTask] = {}
+    for day, daily_plan in enumerate(_daily_plans(plan)):
+        for meal_index, meal in enumerate(daily_plan.meals):
+            for step, base_unit, amount in parse_meal(meal).prep:
+                task = tasks.get(step)
+                if task is None:
+                    task = tasks[step] = PrepTask(*step)
+                task.meals.append((day, meal_index))
+                if amount is None:
+                    continue
+                if task.quantity is None:
+                    task.quantity, task.unit = 0.0, base_unit
+                if base_unit == task.unit:
+                    task.quantity += amount
+
+    shared = [task for task in tasks.values() if len(task.meals) >= min_meals]
+    for task in shared:
+        if task.quantity is not None:
+            task.quantity, task.unit = display_quantity(task.quantity, task.unit)
+    shared.sort(key=lambda task: (-len(task.meals), task.action, task.item))
+    return shared
+
+
+def shopping_list_csv(items: Sequence[ShoppingItem]) -> str:
+    """A shopping list as CSV text, one row per item"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(["item", "quantity", "unit"])
+    for item in items:
+        writer.writerow([item.item, "" if item.quantity is None else f"{item.quantity:g}", item.unit])
+    return output.getvalue()
+
+
+def _read_plan(data: dict) -> Plan:
+    return WeeklyMealPlan.model_validate(data) if "daily_plans" in data else DailyMealPlan.model_validate(data)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Shopping lists and batch-prep tasks for a batch.py output file")
+    parser.add_argument("plans", help="JSONL output of batch.py")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to write one shopping list per id to")
+    parser.add_argument("--min-meals", type=int, default=2, help="meals that must share a prep task to list it")
+    args = parser.parse_args(argv)
+
+    written = 0
+    with open(args.plans, encoding="utf-8") as source, open(args.output, "w", encoding="utf-8") as output:
+        for line in source:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("status") != "ok":
+                continue
+            plan = _read_plan(record["plan"])
+            output.write(json.dumps({
+                "id": record["id"],
+                "plan_key": record.get("plan_key"),
+                "items": [asdict(item) for item in shopping_list(plan)],
+                "prep": [asdict(task) for task in batch_prep(plan, min_meals=args.min_meals)],
+            }) + "\n")
+            written += 1
+    print(f"[shopping] {written} shopping lists written to {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
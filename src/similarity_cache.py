@@ -0,0 +1,124 @@
+"""Near-match plan cache keyed by the rounded calorie target and the discrete preferences.
+
+The exact plan cache keys on the rendered prompt, so two users whose weights differ by 300 g
+never share a plan: their calorie and macro targets, and so their prompts, differ by a rounding
+error. SimilarityPlanCache keys instead on the profile's categorical fields, matched exactly as
+hard constraints (diet, meal frequency, goal, allergies, disliked foods, ...), and on its calorie
+target rounded to a bucket; age, weight, height and activity only matter through that target.
+A lookup also tries the neighbouring bucket on the target's side, so two targets a few kcal
+apart match even across a bucket edge. A hit is rescaled to the new calorie target before it
+is served: macro targets are fixed shares of the calorie target for a given health goal, so
+scaling every meal's portion by the calorie ratio lands the macros on target too.
+"""
+from typing import Dict, List, Optional, Type, Union
+from pydantic import BaseModel
+import hashlib
+import json
+
+from user_profile import UserProfile
+from meal_models import DailyMealPlan, WeeklyMealPlan
+from plan_cache import PlanCache, LRUPlanCache
+
+Plan = Union[DailyMealPlan, WeeklyMealPlan]
+
+# Width of the calorie-target buckets; targets within half a bucket of each other always match
+CALORIE_BUCKET_KCAL = 100.0
+
+
+class CachedDailyPlan(BaseModel):
+    """A daily plan together with the calorie target it was generated for"""
+    target_calories: float
+    plan: DailyMealPlan
+
+
+class CachedWeeklyPlan(BaseModel):
+    """A weekly plan together with the calorie target it was generated for"""
+    target_calories: float
+    plan: WeeklyMealPlan
+
+
+_ENTRY_TYPES = {DailyMealPlan: CachedDailyPlan, WeeklyMealPlan: CachedWeeklyPlan}
+_SCOPES = {DailyMealPlan: "daily", WeeklyMealPlan: "weekly"}
+
+
+def _normalized(items: Optional[list]) -> list:
+    return sorted({item.strip().lower() for item in items or [] if item.strip()})
+
+
+def scale_plan(plan: Plan, portion: float) -> Plan:
+    """Copy of a daily or weekly plan with every meal's portion scaled"""
+    if isinstance(plan, WeeklyMealPlan):
+        return WeeklyMealPlan(daily_plans=[daily_plan.scaled(portion) for daily_plan in plan.daily_plans])
+    return plan.scaled(portion)
+
+
+class SimilarityPlanCache:
+    """Serves a plan generated for a similar profile, rescaled to the requesting profile's targets"""
+
+    def __init__(self, backend: Optional[PlanCache] = None, calorie_bucket: float = CALORIE_BUCKET_KCAL):
+        """
+        backend: where entries are stored; defaults to an in-process LRUPlanCache. Keys do not
+            collide with make_cache_key's, so the exact cache's backend can be shared.
+        calorie_bucket: bucket width in kcal; wider buckets hit more often but rescale portions further
+        """
+        if calorie_bucket <= 0:
+            raise ValueError("calorie_bucket must be positive")
+        self.backend = backend if backend is not None else LRUPlanCache()
+        self.calorie_bucket = calorie_bucket
+
+    def features(self, user_profile: UserProfile) -> Dict[str, object]:
+        """The profile's categorical fields, which a near match must share exactly"""
+        return {
+            "dietary_preference": user_profile.dietary_preference.value,
+            "meal_frequency": user_profile.meal_frequency.value,
+            "health_goal": user_profile.health_goal.value,
+            "food_preference": user_profile.food_preference.value,
+            "cooking_skill": user_profile.cooking_skill.value,
+            "meal_prep_time": user_profile.meal_prep_time,
+            "allergies": _normalized(user_profile.allergies),
+            "disliked_foods": _normalized(user_profile.disliked_foods),
+            "preferred_cuisines": _normalized(user_profile.preferred_cuisines),
+        }
+
+    def buckets(self, target_calories: float) -> List[int]:
+        """Calorie buckets to look in: the target's own (nearest multiple of the width), then the
+        neighbour on the side the target lies"""
+        position = target_calories / self.calorie_bucket
+        bucket = round(position)
+        return [bucket, bucket + 1 if position >= bucket else bucket - 1]
+
+    def key(self, user_profile: UserProfile, plan_type: Type[BaseModel], model: str, temperature: float,
+            bucket: Optional[int] = None) -> str:
+        """Cache key for the profile, in its own calorie bucket unless bucket is given"""
+        if bucket is None:
+            bucket = self.buckets(user_profile.calculate_target_calories())[0]
+        payload = {
+            "scope": f"similar-{_SCOPES[plan_type]}",
+            "model": model,
+            "temperature": temperature,
+            "features": self.features(user_profile),
+            "calories": bucket,
+        }
+        encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, user_profile: UserProfile, plan_type: Type[BaseModel], model: str,
+            temperature: float) -> Optional[Plan]:
+        """A stored plan for the same preferences and a nearby calorie target, rescaled to this profile's"""
+        target_calories = user_profile.calculate_target_calories()
+        for bucket in self.buckets(target_calories):
+            entry = self.backend.get(self.key(user_profile, plan_type, model, temperature, bucket),
+                                     _ENTRY_TYPES[plan_type])
+            if entry is not None:
+                if entry.target_calories <= 0:
+                    return entry.plan
+                return scale_plan(entry.plan, target_calories / entry.target_calories)
+        return None
+
+    def set(self, user_profile: UserProfile, plan: Plan, model: str, temperature: float) -> None:
+        """Store a plan generated for user_profile"""
+        entry = _ENTRY_TYPES[type(plan)](target_calories=user_profile.calculate_target_calories(), plan=plan)
+        self.backend.set(self.key(user_profile, type(plan), model, temperature), entry)
+
+    def clear(self) -> None:
+        self.backend.clear()
@@ -0,0 +1,149 @@
+"""Speculative plan generation while the user is still filling in the form.
+
+The app reports the profile on every rerun. Once it has stopped changing for settle_seconds,
+a daily plan for it is queued as a low-priority job; an edit after that supersedes it (cancelled
+if it has not started, otherwise left to finish and fill the plan cache). When the user clicks
+Generate, the app adopts a finished speculative plan directly, and submitting the same plan
+adopts one still in flight (JobQueue.enqueue promotes it).
+
+Speculation spends tokens on plans nobody may ask for, so it draws on its own token budget, a
+fraction of the key's quota, and stops when the provider reports the quota nearly used up.
+"""
+from typing import Dict, Optional
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+
+from user_profile import UserProfile
+from jobs import Job, JobManager, DONE, QUEUED
+from meal_prompts import render_meal_plan_prompt
+from rate_limit import TokenBucket
+from metrics import Metrics
+
+# Seconds without an edit before the profile counts as settled
+SETTLE_SECONDS = 2.0
+# Speculative plans started per user before waiting for a click
+MAX_PER_USER = 5
+# Sessions tracked at once; the least recently active are forgotten first
+MAX_SESSIONS = 10_000
+
+
+@dataclass
+class _Session:
+    plan_key: str
+    job_id: Optional[str] = None
+    timer: Optional[threading.Timer] = None
+    started: int = 0
+
+
+class Speculator:
+    """Starts daily plans ahead of the Generate click, within a token budget"""
+
+    def __init__(self, manager: JobManager, tokens_per_minute: float, settle_seconds: float = SETTLE_SECONDS,
+                 max_per_user: int = MAX_PER_USER, metrics: Optional[Metrics] = None):
+        """
+        tokens_per_minute: estimated tokens speculation may spend per minute, across all users;
+            each plan is charged its prompt estimate plus the limiter's completion reserve
+        settle_seconds: how long the profile must stay unchanged before a plan is started
+        max_per_user: speculative plans per user, so one user editing all day can't drain the budget
+        """
+        if settle_seconds < 0:
+            raise ValueError("settle_seconds cannot be negative")
+        self.manager = manager
+        self.settle_seconds = settle_seconds
+        self.max_per_user = max_per_user
+        self.metrics = metrics if metrics is not None else manager.planner.metrics
+        self.budget = TokenBucket(tokens_per_minute)
+        self._sessions: "OrderedDict[str, _Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _record(self, result: str) -> None:
+        self.metrics.inc("speculations_total", labels=(("result", result),))
+
+    def observe(self, user_id: str, user_profile: UserProfile, plan_key: str, edited: bool = False) -> None:
+        """Report the form's current profile; call on every rerun.
+
+        The first profile seen for a user is the form's defaults, so it only starts a plan when
+        edited is set (e.g. speculation was just switched on for a filled-in form).
+        """
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and session.plan_key == plan_key:
+                self._sessions.move_to_end(user_id)
+                return
+            if session is not None:
+                self._supersede(session)
+                edited = True
+            else:
+                session = self._sessions[user_id] = _Session(plan_key)
+                while len(self._sessions) > MAX_SESSIONS:
+                    self._supersede(self._sessions.popitem(last=False)[1])
+            session.plan_key = plan_key
+            if edited and session.started < self.max_per_user:
+                session.timer = threading.Timer(self.settle_seconds, self._start, (user_id, user_profile, plan_key))
+                session.timer.daemon = True
+                session.timer.start()
+
+    def forget(self, user_id: str) -> None:
+        """Stop speculating for a user, e.g. when they switch it off"""
+        with self._lock:
+            session = self._sessions.pop(user_id, None)
+            if session is not None:
+                self._supersede(session)
+
+    def _supersede(self, session: _Session) -> None:
+        if session.timer is not None:
+            session.timer.cancel()
+            session.timer = None
+        if session.job_id is not None:
+            # A running job has spent its tokens already; its plan still lands in the plan cache
+            job = self.manager.status(session.job_id)
+            if job is not None and job.status == QUEUED:
+                self.manager.cancel(session.job_id)
+            self._record("superseded")
+            session.job_id = None
+
+    def _start(self, user_id: str, user_profile: UserProfile, plan_key: str) -> None:
+        limiter = self.manager.planner.rate_limiter
+        estimate = limiter.estimate_tokens(render_meal_plan_prompt(user_profile)) if limiter is not None else 0
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None or session.plan_key != plan_key or session.job_id is not None:
+                return
+            session.timer = None
+            # A plan larger than the whole budget fits once the bucket is full
+            affordable = self.budget.available >= min(estimate, self.budget.capacity)
+            if not affordable or (limiter is not None and limiter.near_quota):
+                self._record("over_budget")
+                return
+            self.budget.reserve(estimate)
+            session.job_id = self.manager.submit(user_id, user_profile, speculative=True)
+            session.started += 1
+        self._record("started")
+
+    def adopt(self, user_id: str, plan_key: str) -> Optional[Job]:
+        """The user's speculative job for plan_key, if there is one; call when they click Generate.
+
+        A finished job carries its plan. One still running is adopted by submitting the same plan.
+        """
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is None:
+                return None
+            if session.timer is not None:
+                session.timer.cancel()
+                session.timer = None
+            if session.plan_key != plan_key or session.job_id is None:
+                return None
+            job = self.manager.status(session.job_id)
+            session.job_id = None
+            session.started = 0
+        if job is None or (job.finished and job.status != DONE):
+            return None
+        self._record("adopted")
+        return job
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            pending = sum(1 for session in self._sessions.values() if session.job_id is not None)
+        return {"sessions": len(self._sessions), "pending": pending, "budget_tokens": self.budget.available}
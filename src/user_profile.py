@@ -1,6 +1,6 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from enum import Enum
-from typing import Optional
+from typing import Optional, Union
 
 class ActivityLevel(Enum):
     SEDENTARY = "sedentary"
@@ -43,6 +43,26 @@ class CookingSkill(Enum):
     INTERMEDIATE = "intermediate"
     ADVANCED = "advanced"
 
+ACTIVITY_MULTIPLIERS = {
+    ActivityLevel.SEDENTARY: 1.2,
+    ActivityLevel.LIGHT: 1.375,
+    ActivityLevel.MODERATE: 1.55,
+    ActivityLevel.VERY_ACTIVE: 1.725
+}
+
+GOAL_ADJUSTMENTS = {
+    HealthGoal.WEIGHT_LOSS: -500,  # Caloric deficit
+    HealthGoal.MUSCLE_GAIN: 300,   # Caloric surplus
+    HealthGoal.MAINTENANCE: 0      # Maintain current weight
+}
+
+# Default macro ratios (protein/carbs/fats)
+MACRO_RATIOS = {
+    HealthGoal.WEIGHT_LOSS: (0.40, 0.35, 0.25),
+    HealthGoal.MUSCLE_GAIN: (0.30, 0.50, 0.20),
+    HealthGoal.MAINTENANCE: (0.30, 0.40, 0.30)
+}
+
 @dataclass
 class UserProfile:
     age: int
@@ -60,6 +80,40 @@ class UserProfile:
     disliked_foods: Optional[list[str]] = None
     meal_prep_time: Optional[int] = None  # in minutes
 
+    def to_dict(self) -> dict:
+        """Serialize to plain JSON-compatible values (enums become their values)"""
+        data = {}
+        for f in fields(self):
+            value = getattr(self, f.name)
+            data[f.name] = value.value if isinstance(value, Enum) else value
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "UserProfile":
+        """Build a profile from a dict of plain values, e.g. a JSON object or a CSV row.
+
+        List fields may be given as lists or as strings separated by ';' or ','.
+        """
+        known = {f.name for f in fields(cls)}
+        unknown = set(data) - known - {"id"}
+        if unknown:
+            raise ValueError(f"Unknown profile fields: {', '.join(sorted(unknown))}")
+
+        values = {}
+        for name, value in data.items():
+            if name not in known or value is None or value == "":
+                continue
+            if name in _ENUM_FIELDS:
+                value = _ENUM_FIELDS[name](value)
+            elif name in _LIST_FIELDS:
+                value = _parse_list(value)
+            elif name in ("age", "meal_prep_time"):
+                value = int(float(value))
+            elif name in ("weight", "height"):
+                value = float(value)
+            values[name] = value
+        return cls(**values)
+
     def calculate_bmr(self) -> float:
         """Calculate Basal Metabolic Rate using Mifflin-St Jeor Equation"""
         if self.gender.lower() == "male":
@@ -69,39 +123,38 @@ class UserProfile:
 
     def calculate_tdee(self) -> float:
         """Calculate Total Daily Energy Expenditure"""
-        activity_multipliers = {
-            ActivityLevel.SEDENTARY: 1.2,
-            ActivityLevel.LIGHT: 1.375,
-            ActivityLevel.MODERATE: 1.55,
-            ActivityLevel.VERY_ACTIVE: 1.725
-        }
-        return self.calculate_bmr() * activity_multipliers[self.activity_level]
+        return self.calculate_bmr() * ACTIVITY_MULTIPLIERS[self.activity_level]
 
     def calculate_target_calories(self) -> float:
         """Calculate target calories based on health goal"""
         tdee = self.calculate_tdee()
-        goal_adjustments = {
-            HealthGoal.WEIGHT_LOSS: -500,  # Caloric deficit
-            HealthGoal.MUSCLE_GAIN: 300,   # Caloric surplus
-            HealthGoal.MAINTENANCE: 0      # Maintain current weight
-        }
-        return tdee + goal_adjustments[self.health_goal]
+        return tdee + GOAL_ADJUSTMENTS[self.health_goal]
 
     def calculate_macros(self) -> dict:
         """Calculate recommended macronutrient distribution"""
         target_calories = self.calculate_target_calories()
-        
-        # Default macro ratios (protein/carbs/fats)
-        macro_ratios = {
-            HealthGoal.WEIGHT_LOSS: (0.40, 0.35, 0.25),
-            HealthGoal.MUSCLE_GAIN: (0.30, 0.50, 0.20),
-            HealthGoal.MAINTENANCE: (0.30, 0.40, 0.30)
-        }
-        
-        protein_ratio, carb_ratio, fat_ratio = macro_ratios[self.health_goal]
+        protein_ratio, carb_ratio, fat_ratio = MACRO_RATIOS[self.health_goal]
         
         return {
             "protein": (target_calories * protein_ratio) / 4,  # 4 calories per gram of protein
             "carbs": (target_calories * carb_ratio) / 4,    # 4 calories per gram of carbs
             "fats": (target_calories * fat_ratio) / 9      # 9 calories per gram of fat
-        }
\ No newline at end of file
+        }
+
+_ENUM_FIELDS = {
+    "activity_level": ActivityLevel,
+    "dietary_preference": DietaryPreference,
+    "health_goal": HealthGoal,
+    "meal_frequency": MealFrequency,
+    "food_preference": FoodPreference,
+    "cooking_skill": CookingSkill,
+}
+
+_LIST_FIELDS = ("allergies", "preferred_cuisines", "disliked_foods")
+
+def _parse_list(value: Union[str, list]) -> Optional[list]:
+    if isinstance(value, str):
+        separator = ";" if ";" in value else ","
+        value = [item.strip() for item in value.split(separator)]
+    items = [item for item in value if item]
+    return items or None
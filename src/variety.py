@@ -0,0 +1,76 @@
+from typing import FrozenSet, Iterable, List, Sequence, Tuple
+
+from meal_models import Meal, DailyMealPlan
+from recipe_index import tokenize
+
+# Meals on different days at least this similar (Jaccard over ingredient sets) count as repeats
+DEFAULT_SIMILARITY_THRESHOLD = 0.6
+# Longest "already used" list sent with a day's prompt
+MAX_EXCLUDED_MEALS = 25
+
+# Words in an ingredient line that describe the amount or preparation rather than the food
+_NON_FOOD_WORDS = frozenset(tokenize(
+    "cup tablespoon tbsp teaspoon tsp g gram kg oz ounce lb pound ml l liter litre clove slice piece "
+    "handful pinch dash can jar bunch sprig stalk small medium large whole fresh dried frozen raw "
+    "chopped diced sliced minced grated shredded cooked to taste of and or for a an the optional "
+    "serving scoop about cubed halved peeled"
+))
+
+
+def ingredient_set(meal: Meal) -> FrozenSet[str]:
+    """Food words of a meal's ingredients, e.g. "2 cups chopped spinach" -> {"spinach"}"""
+    return frozenset(
+        token
+        for ingredient in meal.ingredients
+        for token in tokenize(ingredient)
+        if token not in _NON_FOOD_WORDS and len(token) > 1
+    )
+
+
+def jaccard(first: FrozenSet[str], second: FrozenSet[str]) -> float:
+    if not first and not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def _name_key(meal: Meal) -> str:
+    return " ".join(tokenize(meal.name))
+
+
+def find_repeats(daily_plans: Sequence[DailyMealPlan],
+                 threshold: float = DEFAULT_SIMILARITY_THRESHOLD) -> List[Tuple[int, int]]:
+    """Return (day, meal_index) of every meal that repeats a meal from an earlier day.
+
+    A meal repeats another when the names match or their ingredient sets have a Jaccard
+    similarity of at least threshold. A week has a few dozen meals, so exact pairwise
+    comparison is cheaper than maintaining MinHash signatures.
+    """
+    repeats = []
+    seen_names = set()
+    seen_sets: List[FrozenSet[str]] = []
+    for day, daily_plan in enumerate(daily_plans):
+        kept = []
+        for meal_index, meal in enumerate(daily_plan.meals):
+            name, ingredients = _name_key(meal), ingredient_set(meal)
+            if name in seen_names or any(jaccard(ingredients, seen) >= threshold for seen in seen_sets):
+                repeats.append((day, meal_index))
+            else:
+                kept.append((name, ingredients))
+        # Meals within one day never repeat each other; only later days are checked against this one
+        for name, ingredients in kept:
+            seen_names.add(name)
+            seen_sets.append(ingredients)
+    return repeats
+
+
+def exclusion_list(daily_plans: Iterable[DailyMealPlan], limit: int = MAX_EXCLUDED_MEALS) -> List[str]:
+    """Compact "already used" list: distinct meal names across the plans, most recent days first"""
+    names = []
+    seen = set()
+    for daily_plan in reversed(list(daily_plans)):
+        for meal in daily_plan.meals:
+            key = _name_key(meal)
+            if key not in seen:
+                seen.add(key)
+                names.append(meal.name)
+    return names[:limit]
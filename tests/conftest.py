@@ -0,0 +1,16 @@
+import os
+import sys
+
+# The app's modules import each other by bare name from src/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from user_profile import UserProfile, ActivityLevel, DietaryPreference, HealthGoal, MealFrequency
+
+
+def make_profile(**overrides) -> UserProfile:
+    """A valid profile for tests; pass UserProfile fields to change any of them"""
+    fields = dict(age=30, gender="Female", weight=65.0, height=168.0, activity_level=ActivityLevel.MODERATE,
+                  dietary_preference=DietaryPreference.NONE, health_goal=HealthGoal.MAINTENANCE,
+                  meal_frequency=MealFrequency.THREE_MEALS)
+    fields.update(overrides)
+    return UserProfile(**fields)
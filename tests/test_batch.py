@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from batch import BatchRunner, read_profiles
+from llm_backends import StubLLM, StubLLMError
+from meal_planner import MealPlanner
+from metrics import Metrics
+from rate_limit import RateLimiter
+
+PROFILE = {"age": 30, "gender": "Female", "weight": 62, "height": 168, "activity_level": "moderate",
+           "dietary_preference": "vegetarian", "health_goal": "maintenance", "meal_frequency": "three_meals"}
+
+
+@pytest.fixture
+def profiles_path(tmp_path):
+    lines = [
+        json.dumps({"id": "a", **PROFILE}),
+        json.dumps({"id": "b", **PROFILE, "age": "thirty"}),
+        "{not json",
+        json.dumps({"id": "d", **PROFILE, "weight": 70}),
+        json.dumps({"id": "e", **PROFILE, "favourite_colour": "blue"}),
+        json.dumps({"id": "f", **PROFILE}),
+    ]
+    path = tmp_path / "profiles.jsonl"
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def read_output(path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return {record["id"]: record for record in map(json.loads, f)}
+
+
+def read_profile(profiles_path):
+    return next(profile for _, profile in read_profiles(profiles_path))
+
+
+def make_runner(llm, chunk_size: int) -> BatchRunner:
+    return BatchRunner(MealPlanner(llm=llm, metrics=Metrics()), max_concurrency=2, chunk_size=chunk_size,
+                       progress=lambda message: None)
+
+
+def test_invalid_rows_are_yielded_as_errors(profiles_path):
+    rows = dict(read_profiles(profiles_path))
+    assert [row_id for row_id, row in rows.items() if isinstance(row, ValueError)] == ["b", "3", "e"]
+    assert "row 3" in str(rows["3"])
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 1000])
+def test_invalid_rows_do_not_stop_the_batch(profiles_path, tmp_path, chunk_size):
+    output_path = tmp_path / "plans.jsonl"
+    summary = make_runner(StubLLM(), chunk_size).run(read_profiles(profiles_path), str(output_path))
+
+    records = read_output(output_path)
+    assert {row_id: record["status"] for row_id, record in records.items()} == {
+        "a": "ok", "b": "error", "3": "error", "d": "ok", "e": "error", "f": "ok"}
+    assert "Unknown profile fields" in records["e"]["error"]
+    assert (summary.total, summary.succeeded, summary.failed) == (6, 3, 3)
+
+
+def test_profiles_are_read_one_chunk_at_a_time(profiles_path, tmp_path):
+    consumed = []
+
+    def tracked():
+        for row in read_profiles(profiles_path):
+            consumed.append(row[0])
+            yield row
+
+    llm = StubLLM()
+    runner = make_runner(llm, chunk_size=2)
+    calls_when_read = {}
+    generate = runner._generate
+
+    def generate_and_record(profile):
+        calls_when_read.setdefault(len(consumed), 0)
+        calls_when_read[len(consumed)] += 1
+        return generate(profile)
+
+    runner._generate = generate_and_record
+    runner.run(tracked(), str(tmp_path / "plans.jsonl"))
+    # Plans for a chunk are generated before the next chunk is read
+    assert sorted(calls_when_read) == [2, 4, 6]
+
+
+def test_resume_retries_invalid_rows_only(profiles_path, tmp_path):
+    output_path = str(tmp_path / "plans.jsonl")
+    llm = StubLLM()
+    make_runner(llm, chunk_size=2).run(read_profiles(profiles_path), output_path)
+    calls = llm.calls
+    summary = make_runner(llm, chunk_size=2).run(read_profiles(profiles_path), output_path)
+    assert llm.calls == calls
+    assert (summary.skipped, summary.failed) == (3, 3)
+
+
+def test_limiter_rate_limits_are_not_retried_again(profiles_path, tmp_path):
+    limiter = RateLimiter(max_retries=1, base_backoff=0.0, max_backoff=0.0)
+    limiter._sleep = lambda seconds: None
+    llm = StubLLM(rate_limit_rate=1.0)
+    planner = MealPlanner(llm=llm, rate_limiter=limiter, metrics=Metrics(), max_retries=0)
+    runner = BatchRunner(planner, max_attempts=5, base_backoff=0.0, progress=lambda message: None)
+    summary = runner.run([("a", read_profile(profiles_path))], str(tmp_path / "plans.jsonl"))
+
+    assert summary.failed == 1
+    # The limiter's two attempts, not five batch attempts of two each
+    assert llm.calls == 2
+
+
+class FlakyPlanner:
+    """Planner stand-in whose first call fails with a raw 429, as a client without a limiter would"""
+
+    def __init__(self):
+        self.calls = 0
+        self.planner = MealPlanner(llm=StubLLM(), metrics=Metrics())
+
+    def plan_key(self, profile, weekly=False):
+        return self.planner.plan_key(profile, weekly)
+
+    def generate_meal_plan(self, profile):
+        self.calls += 1
+        if self.calls == 1:
+            raise StubLLMError("Too many requests", status_code=429)
+        return self.planner.generate_meal_plan(profile)
+
+
+def test_raw_rate_limits_are_retried(profiles_path, tmp_path):
+    planner = FlakyPlanner()
+    runner = BatchRunner(planner, base_backoff=0.0, progress=lambda message: None)
+    summary = runner.run([("a", read_profile(profiles_path))], str(tmp_path / "plans.jsonl"))
+    assert (summary.succeeded, planner.calls) == (1, 2)
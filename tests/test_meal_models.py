@@ -0,0 +1,34 @@
+import pytest
+
+from meal_models import Meal, format_amount, scale_ingredient
+
+
+@pytest.mark.parametrize("line,portion,expected", [
+    ("1/2 cup rolled oats", 1.5, "3/4 cup rolled oats"),
+    ("150 g chicken breast", 1.2, "180 g chicken breast"),
+    ("150g firm tofu", 0.8, "120g firm tofu"),
+    ("1 1/2 cups milk", 2.0, "3 cups milk"),
+    ("1½ cups milk", 2.0, "3 cups milk"),
+    ("1-2 tbsp olive oil", 2.0, "2-4 tbsp olive oil"),
+    ("1/4 onion, diced", 2.0, "1/2 onion, diced"),
+    ("salt, to taste", 2.0, "salt, to taste"),
+    ("Juice of 1 lemon", 2.0, "Juice of 1 lemon"),
+])
+def test_scale_ingredient(line, portion, expected):
+    assert scale_ingredient(line, portion) == expected
+
+
+@pytest.mark.parametrize("value,expected", [(12.4, "12"), (2.98, "3"), (1.5, "1 1/2"), (0.33, "1/3"),
+                                            (1.6, "1.6"), (0.1, "0.1")])
+def test_format_amount(value, expected):
+    assert format_amount(value) == expected
+
+
+def test_scaled_meal_scales_ingredients_and_nutrition_only():
+    meal = Meal(name="Oats", meal_type="Breakfast", ingredients=["1/2 cup oats", "1 cup milk", "pinch of salt"],
+                instructions=["Simmer for 5 minutes"], nutrition={"calories": 300, "protein": 12}, prep_time=5)
+    scaled = meal.scaled(2.0)
+    assert scaled.ingredients == ["1 cup oats", "2 cup milk", "pinch of salt"]
+    assert scaled.instructions == meal.instructions
+    assert scaled.nutrition == {"calories": 600, "protein": 24}
+    assert meal.ingredients[0] == "1/2 cup oats"
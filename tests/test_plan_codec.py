@@ -0,0 +1,90 @@
+import math
+import struct
+
+import pytest
+
+from conftest import make_profile
+from user_profile import MealFrequency
+from meal_models import DailyMealPlan, Meal, WeeklyMealPlan, sum_totals
+from plan_codec import FORMAT_VERSION, PlanFile, decode_plans, encode_plans, write_plan_file
+from recipe_engine import RecipeEngine
+
+
+@pytest.fixture(scope="module")
+def weekly_plans():
+    engine = RecipeEngine()
+    return [engine.generate_weekly_plan(make_profile(meal_frequency=frequency))
+            for frequency in (MealFrequency.THREE_MEALS, MealFrequency.FIVE_MEALS, MealFrequency.INTERMITTENT_FASTING)]
+
+
+def make_meal(meal_type: str, nutrition: dict, name: str = "Porridge") -> Meal:
+    return Meal(name=name, meal_type=meal_type, ingredients=["½ cup oats", "1 cup milk"],
+                instructions=["Simmer for 5 minutes", "Serve warm"], nutrition=nutrition, prep_time=10)
+
+
+def make_day(breakfast: Meal, *snacks: Meal) -> DailyMealPlan:
+    nutrition = {"calories": 500.0, "protein": 30.0, "carbs": 50.0, "fats": 15.0}
+    meals = [breakfast, make_meal("Lunch", nutrition, "Salad"), make_meal("Dinner", nutrition, "Stew"), *snacks]
+    return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **sum_totals(meals))
+
+
+def test_weekly_round_trip(weekly_plans):
+    assert decode_plans(encode_plans(weekly_plans)) == weekly_plans
+
+
+def test_daily_round_trip(weekly_plans):
+    daily_plans = [day for plan in weekly_plans for day in plan.daily_plans]
+    assert decode_plans(encode_plans(daily_plans)) == daily_plans
+
+
+def test_nutrition_keys_round_trip():
+    breakfast = make_meal("Breakfast", {"calories": 350.0, "protein": 12.0, "fiber": 8.0, "carbs": math.nan})
+    (decoded,) = decode_plans(encode_plans([make_day(breakfast)]))
+    nutrition = decoded.breakfast.nutrition
+    # A missing fats value stays missing, a NaN stays NaN and extra keys are kept
+    assert set(nutrition) == {"calories", "protein", "carbs", "fiber"}
+    assert math.isnan(nutrition["carbs"])
+    assert (nutrition["calories"], nutrition["protein"], nutrition["fiber"]) == (350.0, 12.0, 8.0)
+
+
+@pytest.mark.parametrize("meal_type", ["breakfast", "BREAKFAST", "Brunch snack", "Post-workout Shake"])
+def test_meal_type_spelling_is_kept(meal_type):
+    nutrition = {"calories": 200.0, "protein": 10.0, "carbs": 20.0, "fats": 5.0}
+    day = make_day(make_meal("Breakfast", nutrition), make_meal(meal_type, nutrition, "Shake"))
+    (decoded,) = decode_plans(encode_plans([day]))
+    assert [meal.meal_type for meal in decoded.meals] == [meal.meal_type for meal in day.meals]
+    assert decoded == day
+
+
+def test_empty_file():
+    assert decode_plans(encode_plans([])) == []
+
+
+def test_mixed_plan_kinds_are_rejected(weekly_plans):
+    with pytest.raises(ValueError):
+        encode_plans([weekly_plans[0], weekly_plans[0].daily_plans[0]])
+
+
+def test_unknown_version_is_rejected(weekly_plans):
+    data = bytearray(encode_plans(weekly_plans))
+    struct.pack_into("<H", data, 4, FORMAT_VERSION + 1)
+    with pytest.raises(ValueError, match="version"):
+        PlanFile(bytes(data))
+
+
+@pytest.mark.parametrize("corrupt", [lambda data: b"XXXX" + data[4:], lambda data: data[:-3], lambda data: data[:8]])
+def test_corrupt_files_are_rejected(weekly_plans, corrupt):
+    with pytest.raises(ValueError):
+        PlanFile(corrupt(encode_plans(weekly_plans)))
+
+
+def test_memory_mapped_file_decodes_plans_on_access(weekly_plans, tmp_path):
+    path = str(tmp_path / "plans.bin")
+    write_plan_file(path, weekly_plans)
+    with PlanFile.open(path) as plan_file:
+        assert len(plan_file) == len(weekly_plans)
+        assert plan_file.weekly
+        assert plan_file[-1] == weekly_plans[-1]
+        assert isinstance(plan_file[0], WeeklyMealPlan)
+        with pytest.raises(IndexError):
+            plan_file[len(weekly_plans)]
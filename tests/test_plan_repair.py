@@ -0,0 +1,137 @@
+import json
+
+import pytest
+
+from user_profile import MealFrequency
+from meal_models import Meal
+from plan_repair import (RepairReport, canonical_meal_type, fix_trailing_commas, parse_lenient, repair_daily_plan,
+                         repair_weekly_plan)
+
+NUTRITION = {"calories": 500, "protein": 30, "carbs": 50, "fats": 15}
+
+
+def raw_meal(meal_type, name=None, **overrides) -> dict:
+    meal = {"name": name or f"{meal_type} dish", "meal_type": meal_type, "ingredients": ["1 cup oats"],
+            "instructions": ["Cook"], "nutrition": dict(NUTRITION), "prep_time": 10}
+    meal.update(overrides)
+    return meal
+
+
+def raw_day(*meal_types) -> dict:
+    return {"meals": [raw_meal(meal_type) for meal_type in meal_types or ("Breakfast", "Lunch", "Dinner")],
+            "total_calories": 1500, "total_protein": 90, "total_carbs": 150, "total_fats": 45}
+
+
+class Requester:
+    """MealRequester that records its calls and answers with a fixed meal"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, meal_type, share, existing_meals):
+        self.calls.append((meal_type, share, [meal.meal_type for meal in existing_meals]))
+        return Meal.model_validate(raw_meal("anything", name=f"New {meal_type}"))
+
+
+def test_fix_trailing_commas_leaves_strings_alone():
+    assert fix_trailing_commas('{"a": [1, 2,], "b": "x,]",}') == '{"a": [1, 2], "b": "x,]"}'
+
+
+def test_parse_lenient_strips_fences_and_trailing_commas():
+    report = RepairReport()
+    assert parse_lenient('```json\n{"meals": [1, 2,],}\n```', report) == {"meals": [1, 2]}
+    assert report.fixes == ["removed trailing commas"]
+
+
+def test_parse_lenient_raises_on_broken_json():
+    with pytest.raises(ValueError):
+        parse_lenient('{"meals": [1, 2')
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("Breakfast", "breakfast"),
+    ("SUPPER", "dinner"),
+    ("mid_morning snack", "morning snack"),
+    ("Healthy Breakfast Bowl", "breakfast"),
+    ("2nd Meal", "second meal"),
+    ("Elevenses", None),
+    (42, None),
+])
+def test_canonical_meal_type(value, expected):
+    assert canonical_meal_type(value) == expected
+
+
+def test_valid_fields_are_coerced_locally():
+    day = raw_day()
+    day["meals"][0].update(prep_time="25 minutes", ingredients="- 1 cup oats\n- 1 banana",
+                           nutrition={**NUTRITION, "calories": "450 kcal"})
+    del day["total_fats"]
+    report = RepairReport()
+    plan = repair_daily_plan(json.dumps(day), MealFrequency.THREE_MEALS, report=report)
+
+    assert plan.breakfast.prep_time == 25
+    assert plan.breakfast.ingredients == ["1 cup oats", "1 banana"]
+    assert plan.breakfast.nutrition["calories"] == 450.0
+    assert plan.total_fats == 45.0
+    assert report.fixes == ["filled total_fats from meal nutrition"]
+    assert report.regenerated_meals == []
+
+
+def test_only_missing_meals_are_requested():
+    requester = Requester()
+    report = RepairReport()
+    plan = repair_daily_plan(raw_day("Breakfast", "Lunch"), MealFrequency.THREE_MEALS, requester, report)
+
+    assert requester.calls == [("Dinner", 0.35, ["Breakfast", "Lunch"])]
+    assert plan.dinner.name == "New Dinner"
+    assert report.regenerated_meals == ["Dinner"]
+    # Totals are recomputed once a meal was replaced
+    assert plan.total_calories == 1500.0
+
+
+def test_invalid_meal_is_dropped_and_regenerated():
+    day = raw_day()
+    del day["meals"][2]["ingredients"]
+    requester = Requester()
+    report = RepairReport()
+    plan = repair_daily_plan(day, MealFrequency.THREE_MEALS, requester, report)
+    assert [call[0] for call in requester.calls] == ["Dinner"]
+    assert plan.dinner.name == "New Dinner"
+    assert report.fixes[0] == "dropped invalid meal 'Dinner dish'"
+
+
+def test_missing_required_meal_without_requester_raises():
+    with pytest.raises(ValueError, match="dinner"):
+        repair_daily_plan(raw_day("Breakfast", "Lunch"), MealFrequency.THREE_MEALS)
+
+
+def test_meal_types_are_mapped_onto_the_meal_structure():
+    report = RepairReport()
+    plan = repair_daily_plan(raw_day("breakfast", "Brunch", "Supper", "Elevenses"), MealFrequency.THREE_MEALS,
+                             report=report)
+    # A known type in another case is left as written; aliases take the structure's label
+    assert [meal.meal_type for meal in plan.meals] == ["breakfast", "Lunch", "Dinner"]
+    assert "dropped extra meal 'Elevenses dish' with unknown meal_type 'Elevenses'" in report.fixes
+
+
+def test_unknown_meal_type_fills_an_open_slot():
+    plan = repair_daily_plan(raw_day("Breakfast", "Lunch", "Dinner", "Elevenses", "Afternoon Snack"),
+                             MealFrequency.FIVE_MEALS, Requester())
+    assert sorted(meal.meal_type for meal in plan.snacks) == ["Afternoon Snack", "Morning Snack"]
+
+
+def test_weekly_repair_reports_days_to_regenerate():
+    unrepairable = {"meals": "not a list"}
+    data = {"daily_plans": [raw_day(), raw_day("Breakfast", "Lunch"), unrepairable, raw_day()]}
+    report = RepairReport()
+    daily_plans = repair_weekly_plan(json.dumps(data), MealFrequency.THREE_MEALS, 5, report=report)
+
+    assert [plan is not None for plan in daily_plans] == [True, False, False, True, False]
+    assert report.dropped_days == [1, 2, 4]
+
+
+def test_weekly_repair_drops_extra_days():
+    report = RepairReport()
+    daily_plans = repair_weekly_plan([raw_day()] * 9, MealFrequency.THREE_MEALS, 7, Requester(), report)
+    assert len(daily_plans) == 7 and all(daily_plans)
+    assert report.fixes == ["dropped 2 extra days"]
@@ -0,0 +1,64 @@
+import itertools
+
+import pandas as pd
+import pytest
+
+from conftest import make_profile
+from user_profile import UserProfile, ActivityLevel, HealthGoal
+from profile_batch import UserProfileBatch
+
+GENDERS = ["Male", "Female", "male", "FEMALE", "mAlE", "Other"]
+
+
+def make_profiles() -> list:
+    """One profile per gender, activity level and goal, with body measurements varying from row to row"""
+    combinations = itertools.product(GENDERS, ActivityLevel, HealthGoal)
+    return [make_profile(age=18 + 3 * index, gender=gender, weight=50.0 + 1.7 * index, height=150.0 + 0.9 * index,
+                         activity_level=activity_level, health_goal=health_goal)
+            for index, (gender, activity_level, health_goal) in enumerate(combinations)]
+
+
+def expected(profile: UserProfile) -> dict:
+    return {"bmr": profile.calculate_bmr(), "tdee": profile.calculate_tdee(),
+            "target_calories": profile.calculate_target_calories(), **profile.calculate_macros()}
+
+
+def assert_matches_scalar(batch: UserProfileBatch, profiles: list) -> None:
+    results = batch.calculate_all()
+    assert len(batch) == len(profiles)
+    for row, profile in enumerate(profiles):
+        assert {name: results[name][row] for name in results} == pytest.approx(expected(profile), rel=1e-12)
+
+
+def test_calculate_all_matches_user_profile():
+    profiles = make_profiles()
+    assert_matches_scalar(UserProfileBatch.from_profiles(profiles), profiles)
+
+
+def test_from_dataframe_matches_user_profile():
+    profiles = make_profiles()
+    df = pd.DataFrame([profile.to_dict() for profile in profiles])
+    assert_matches_scalar(UserProfileBatch.from_dataframe(df), profiles)
+
+
+def test_from_dataframe_accepts_enum_members():
+    profiles = make_profiles()
+    df = pd.DataFrame({"age": [profile.age for profile in profiles],
+                       "gender": [profile.gender for profile in profiles],
+                       "weight": [profile.weight for profile in profiles],
+                       "height": [profile.height for profile in profiles],
+                       "activity_level": [profile.activity_level for profile in profiles],
+                       "health_goal": [profile.health_goal for profile in profiles]})
+    assert_matches_scalar(UserProfileBatch.from_dataframe(df), profiles)
+
+
+def test_unknown_enum_value_is_rejected():
+    with pytest.raises(ValueError, match="ActivityLevel"):
+        UserProfileBatch(age=[30], gender=["Male"], weight=[70.0], height=[175.0], activity_level=["extreme"],
+                         health_goal=["maintenance"])
+
+
+def test_columns_must_have_the_same_length():
+    with pytest.raises(ValueError):
+        UserProfileBatch(age=[30, 40], gender=["Male"], weight=[70.0], height=[175.0], activity_level=["light"],
+                         health_goal=["maintenance"])
@@ -0,0 +1,79 @@
+import httpx
+import pytest
+
+from conftest import make_profile
+from llm_backends import StubLLM, StubLLMError
+from meal_planner import MealPlanner
+from metrics import Metrics
+from rate_limit import RateLimiter, RateLimitExceeded, RateLimitedLLM, retry_after_seconds
+
+
+class StatusError(Exception):
+    def __init__(self, message: str, status_code: int = None, response=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.response = response
+
+
+def response(status: int, **headers) -> httpx.Response:
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://api.example.com/chat"))
+
+
+def chained(error: Exception) -> ValueError:
+    try:
+        raise ValueError("Failed to generate meal plan") from error
+    except ValueError as wrapped:
+        return wrapped
+
+
+@pytest.mark.parametrize("error, expected", [
+    (StubLLMError("Too many requests", status_code=429), 0.0),
+    (StatusError("throttled", response=response(429, **{"retry-after": "2"})), 2.0),
+    (StatusError("throttled", status_code=429, response=response(429, **{"retry-after": "1.5"})), 1.5),
+    (RateLimitExceeded("gave up", retry_after=5.0), 5.0),
+    (chained(StubLLMError("Too many requests", status_code=429)), 0.0),
+])
+def test_rate_limits_are_recognised(error, expected):
+    assert retry_after_seconds(error) == expected
+
+
+@pytest.mark.parametrize("error", [
+    ValueError("Row 429 has an invalid weight"),
+    RuntimeError("Please check the rate limit settings in your config"),
+    StubLLMError("Rate limit of the upstream cache reached", status_code=500),
+    StatusError("Service unavailable (429 retries left)", response=response(503)),
+    chained(RuntimeError("HTTP 429")),
+])
+def test_messages_mentioning_rate_limits_are_not_rate_limits(error):
+    assert retry_after_seconds(error) is None
+
+
+def test_groq_rate_limit_error_is_recognised():
+    groq = pytest.importorskip("groq")
+    error = groq.RateLimitError("Rate limit reached", response=response(429, **{"retry-after": "3"}), body=None)
+    assert retry_after_seconds(error) == 3.0
+
+
+def fast_limiter(max_retries: int = 1) -> RateLimiter:
+    limiter = RateLimiter(max_retries=max_retries, base_backoff=0.0, max_backoff=0.0)
+    limiter._sleep = lambda seconds: None
+    return limiter
+
+
+def test_other_errors_are_not_retried():
+    def respond(prompt, rng):
+        raise RuntimeError("HTTP 429 in upstream log")
+
+    llm = StubLLM(respond=respond)
+    with pytest.raises(RuntimeError):
+        RateLimitedLLM(llm, fast_limiter()).invoke("hello")
+    assert llm.calls == 1
+
+
+def test_planner_errors_keep_the_rate_limit_cause():
+    profile = make_profile()
+    planner = MealPlanner(llm=StubLLM(rate_limit_rate=1.0), rate_limiter=fast_limiter(), metrics=Metrics(),
+                          max_retries=0, retry_backoff=0.0)
+    with pytest.raises(ValueError) as raised:
+        planner.generate_weekly_meal_plan(profile, use_cache=False)
+    assert retry_after_seconds(raised.value) == 0.0
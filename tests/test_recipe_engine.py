@@ -0,0 +1,67 @@
+import itertools
+
+import pytest
+
+from conftest import make_profile
+from user_profile import DietaryPreference, MealFrequency, CookingSkill
+from recipe_engine import RecipeEngine, MEAL_SLOTS
+
+# The app's prep-time slider: 15 to 120 minutes in steps of 15
+PREP_TIMES = range(15, 121, 15)
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return RecipeEngine()
+
+
+@pytest.mark.parametrize("diet,skill", list(itertools.product(DietaryPreference, CookingSkill)))
+def test_every_form_combination_gets_a_plan(engine, diet, skill):
+    for prep_time, frequency in itertools.product(PREP_TIMES, MealFrequency):
+        profile = make_profile(dietary_preference=diet, cooking_skill=skill, meal_prep_time=prep_time,
+                               meal_frequency=frequency)
+        plan = engine.generate_daily_plan(profile)
+        assert len(plan.meals) == len(MEAL_SLOTS[frequency])
+
+
+def test_strict_matches_are_kept_when_there_are_any(engine):
+    profile = make_profile(meal_prep_time=30, cooking_skill=CookingSkill.BEGINNER)
+    for recipe_id in engine.candidates(profile, "dinner"):
+        recipe = engine.recipes[recipe_id]
+        assert recipe["prep_time"] <= 30 and recipe["skill"] == "beginner"
+
+
+def test_prep_time_relaxes_to_the_quickest_recipes(engine):
+    profile = make_profile(meal_prep_time=15, cooking_skill=CookingSkill.ADVANCED)
+    assert len(engine.index.candidates(profile, "dinner")) == 0
+    relaxed = engine.candidates(profile, "dinner")
+    quickest = min(recipe["prep_time"] for recipe in engine.recipes if recipe["category"] == "dinner")
+    assert len(relaxed) and all(engine.recipes[recipe_id]["prep_time"] == quickest for recipe_id in relaxed)
+
+
+def test_skill_relaxes_before_diet(engine):
+    profile = make_profile(dietary_preference=DietaryPreference.KETO, cooking_skill=CookingSkill.BEGINNER)
+    plan = engine.generate_daily_plan(profile)
+    catalog = {recipe["name"]: recipe for recipe in engine.recipes}
+    assert all("keto" in catalog[meal.name]["diets"] for meal in plan.meals)
+
+
+def test_allergies_are_never_relaxed(engine):
+    profile = make_profile(dietary_preference=DietaryPreference.KETO,
+                           allergies=["dairy", "egg", "fish", "tree nut", "peanut", "soy", "shellfish"])
+    for recipe_id in engine.candidates(profile, "dinner"):
+        assert not {"dairy", "egg", "fish", "tree_nut", "peanut", "soy", "shellfish"} & set(
+            engine.recipes[recipe_id]["allergens"])
+
+
+def test_excluding_every_recipe_raises(engine):
+    profile = make_profile(dietary_preference=DietaryPreference.KETO,
+                           allergies=[recipe["name"] for recipe in engine.recipes])
+    with pytest.raises(ValueError):
+        engine.generate_daily_plan(profile)
+
+
+def test_portions_hit_the_calorie_target(engine):
+    profile = make_profile()
+    plan = engine.generate_daily_plan(profile)
+    assert plan.total_calories == pytest.approx(profile.calculate_target_calories(), rel=0.15)
@@ -0,0 +1,79 @@
+import pytest
+
+from meal_models import DailyMealPlan, Meal, WeeklyMealPlan, sum_totals
+from shopping import ShoppingItem, batch_prep, parse_ingredient, shopping_list
+
+
+@pytest.mark.parametrize("line, item, quantity, unit, prep", [
+    ("2 cups spinach", "spinach", 2.0, "cup", None),
+    ("1/4 onion, diced", "onion", 0.25, None, "dice"),
+    ("1 1/2 tbsp olive oil", "olive oil", 1.5, "tbsp", None),
+    ("½ cup rolled oats", "rolled oat", 0.5, "cup", None),
+    ("1-2 cups broccoli florets", "broccoli floret", 2.0, "cup", None),
+    ("1 to 2 cups spinach", "spinach", 2.0, "cup", None),
+    ("1 garlic clove, minced", "garlic", 1.0, "clove", "mince"),
+    ("2 cloves garlic", "garlic", 2.0, "clove", None),
+    ("150 g chicken breast (skinless)", "chicken breast", 150.0, "g", None),
+    ("3 large eggs", "egg", 3.0, None, None),
+    ("1 cup chopped scallions", "green onion", 1.0, "cup", "chop"),
+    ("pinch of chili flakes", "chili flake", 1.0, "pinch", None),
+    ("spinach, chopped", "spinach", None, None, "chop"),
+])
+def test_parse_ingredient(line, item, quantity, unit, prep):
+    ingredient = parse_ingredient(line)
+    assert (ingredient.item, ingredient.quantity, ingredient.unit, ingredient.prep) == (item, quantity, unit, prep)
+
+
+@pytest.mark.parametrize("line, item", [
+    ("salt and pepper to taste", "salt and pepper"),
+    ("Salt and pepper, to taste", "salt and pepper"),
+    ("Fresh basil leaves for garnish", "basil leaf"),
+    ("Lemon wedges for serving", "lemon wedge"),
+    ("Hot sauce if desired", "hot sauce"),
+    ("Chili flakes (optional)", "chili flake"),
+    ("1 tbsp olive oil, plus more as needed", "olive oil"),
+])
+def test_usage_notes_are_not_part_of_the_item(line, item):
+    assert parse_ingredient(line).item == item
+
+
+def test_units_convert_to_base_units():
+    assert parse_ingredient("1 kg potatoes").amount == 1000.0
+    assert parse_ingredient("2 tbsp soy sauce").base_unit == "ml"
+    assert parse_ingredient("2 tbsp soy sauce").amount == pytest.approx(29.5736)
+
+
+def make_meal(name: str, ingredients, instructions=("Serve",), meal_type: str = "Lunch") -> Meal:
+    return Meal(name=name, meal_type=meal_type, ingredients=list(ingredients), instructions=list(instructions),
+                nutrition={"calories": 500.0, "protein": 30.0, "carbs": 50.0, "fats": 15.0}, prep_time=15)
+
+
+def make_day(lunch: Meal) -> DailyMealPlan:
+    """A day whose breakfast and dinner are a plain apple, around the lunch under test"""
+    meals = [make_meal("Apple", ["1 apple"], meal_type="Breakfast"), lunch,
+             make_meal("Apple", ["1 apple"], meal_type="Dinner")]
+    return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **sum_totals(meals))
+
+
+def test_shopping_list_sums_lines_per_base_unit():
+    week = WeeklyMealPlan(daily_plans=[
+        make_day(make_meal("Salad", ["100 g spinach", "1/2 onion, diced", "salt and pepper to taste"])),
+        make_day(make_meal("Curry", ["1 kg spinach", "1 onion, diced", "Salt and pepper, to taste"])),
+        make_day(make_meal("Soup", ["1 cup spinach"])),
+    ])
+    items = {(item.item, item.unit): item for item in shopping_list(week)}
+    assert items[("spinach", "kg")] == ShoppingItem("spinach", 1.1, "kg", 2, 0)
+    assert items[("spinach", "ml")].quantity == pytest.approx(236.6)
+    assert items[("onion", "")] == ShoppingItem("onion", 2.0, "", 2, 0)
+    assert items[("salt and pepper", "")] == ShoppingItem("salt and pepper", None, "", 2, 2)
+
+
+def test_batch_prep_groups_shared_steps_and_skips_pantry():
+    week = WeeklyMealPlan(daily_plans=[
+        make_day(make_meal("Chili", ["1 onion, diced", "1 tbsp olive oil"], ["Dice the onion", "Heat the oil"])),
+        make_day(make_meal("Stew", ["1/2 onion", "1 tsp paprika, toasted"], ["Dice the onion"])),
+        make_day(make_meal("Toast", ["1 slice bread, toasted"])),
+    ])
+    tasks = batch_prep(week)
+    assert [(task.action, task.item, task.meals, task.quantity) for task in tasks] == [
+        ("dice", "onion", [(0, 1), (1, 1)], 2.0)]   # 1.5 onions, rounded up to whole ones
@@ -0,0 +1,84 @@
+import pytest
+
+import conftest
+from user_profile import UserProfile, DietaryPreference, HealthGoal, MealFrequency
+from meal_models import DailyMealPlan, Meal, sum_totals
+from similarity_cache import SimilarityPlanCache, CALORIE_BUCKET_KCAL
+
+MODEL, TEMPERATURE = "test-model", 0.7
+
+
+def make_profile(**overrides) -> UserProfile:
+    fields = dict(gender="Male", weight=70.0, height=178.0, dietary_preference=DietaryPreference.VEGETARIAN)
+    fields.update(overrides)
+    return conftest.make_profile(**fields)
+
+
+def make_plan(calories: float) -> DailyMealPlan:
+    meals = [Meal(name=f"Meal {i}", meal_type=meal_type, ingredients=["100 g oats"], instructions=["Cook"],
+                  nutrition={"calories": calories / 3, "protein": 20.0, "carbs": 40.0, "fats": 10.0}, prep_time=10)
+             for i, meal_type in enumerate(("Breakfast", "Lunch", "Dinner"))]
+    return DailyMealPlan(meals=[meal.model_dump() for meal in meals], **sum_totals(meals))
+
+
+def store(cache: SimilarityPlanCache, profile: UserProfile) -> None:
+    cache.set(profile, make_plan(profile.calculate_target_calories()), MODEL, TEMPERATURE)
+
+
+def lookup(cache: SimilarityPlanCache, profile: UserProfile):
+    return cache.get(profile, DailyMealPlan, MODEL, TEMPERATURE)
+
+
+def profile_with_target(calories: float) -> UserProfile:
+    """A profile whose calorie target is close to calories, found by adjusting weight"""
+    base = make_profile()
+    weight = base.weight + (calories - base.calculate_target_calories()) / 15.0
+    for _ in range(50):
+        profile = make_profile(weight=weight)
+        error = calories - profile.calculate_target_calories()
+        if abs(error) < 0.01:
+            break
+        weight += error / 15.0
+    return profile
+
+
+def test_bucket_edges_match_both_ways():
+    edge = 25.5 * CALORIE_BUCKET_KCAL
+    below, above = profile_with_target(edge - 1), profile_with_target(edge + 1)
+    for stored, requested in ((below, above), (above, below)):
+        cache = SimilarityPlanCache()
+        store(cache, stored)
+        assert lookup(cache, requested) is not None
+
+
+def test_age_weight_and_height_only_matter_through_the_target():
+    cache = SimilarityPlanCache()
+    store(cache, make_profile())
+    assert lookup(cache, make_profile(age=31, weight=70.3, height=177.5)) is not None
+
+
+def test_far_targets_miss():
+    cache = SimilarityPlanCache()
+    store(cache, make_profile())
+    far = profile_with_target(make_profile().calculate_target_calories() + 3 * CALORIE_BUCKET_KCAL)
+    assert lookup(cache, far) is None
+
+
+@pytest.mark.parametrize("change", [dict(dietary_preference=DietaryPreference.VEGAN),
+                                    dict(health_goal=HealthGoal.WEIGHT_LOSS),
+                                    dict(allergies=["peanut"]),
+                                    dict(meal_frequency=MealFrequency.FIVE_MEALS)])
+def test_preferences_must_match_exactly(change):
+    cache = SimilarityPlanCache()
+    store(cache, make_profile())
+    assert lookup(cache, make_profile(**change)) is None
+
+
+def test_hit_is_rescaled_to_the_new_target():
+    cache = SimilarityPlanCache()
+    stored = make_profile()
+    store(cache, stored)
+    requested = make_profile(weight=72.0)
+    plan = lookup(cache, requested)
+    assert plan.total_calories == pytest.approx(requested.calculate_target_calories(), abs=0.5)
+    assert plan.meals[0].ingredients != ["100 g oats"]
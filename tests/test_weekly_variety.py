@@ -0,0 +1,114 @@
+import random
+import re
+import threading
+
+import pytest
+
+from conftest import make_profile
+from llm_backends import StubLLM, synthetic_response
+from meal_planner import GenerationStats, MealPlanner
+from meal_prompts import prompt_text
+from metrics import Metrics
+
+_DAY = re.compile(r"This is day (\d) of a 7-day plan")
+_AVOID = re.compile(r"Do not repeat these meals from other days: (.*)$")
+WAVES = [[0], [1, 2], [3, 4, 5, 6]]
+
+
+class ExclusionCapturingLLM(StubLLM):
+    """StubLLM that keeps the "already used" list each day's prompt was sent with"""
+
+    def __init__(self):
+        self.avoided = {}
+        super().__init__(respond=self._respond)
+
+    def _respond(self, prompt, rng):
+        text = prompt_text(prompt)
+        day = int(_DAY.search(text).group(1)) - 1
+        avoided = _AVOID.search(text).group(1)
+        self.avoided[day] = [] if avoided == "None" else avoided.split(", ")
+        return synthetic_response(prompt, rng)
+
+
+class RoundCountingLLM(StubLLM):
+    """StubLLM that notes how many calls had finished when each call started"""
+
+    def __init__(self):
+        super().__init__(latency=0.1)
+        self.finished = 0
+        self.finished_at_start = []
+        self._count_lock = threading.Lock()
+
+    @property
+    def rounds(self) -> int:
+        return len(set(self.finished_at_start))
+
+    def invoke(self, prompt, **kwargs):
+        with self._count_lock:
+            self.finished_at_start.append(self.finished)
+        try:
+            return super().invoke(prompt, **kwargs)
+        finally:
+            with self._count_lock:
+                self.finished += 1
+
+
+def make_planner(llm, **options) -> MealPlanner:
+    return MealPlanner(llm=llm, metrics=Metrics(), retry_backoff=0.0, **options)
+
+
+def test_later_waves_are_prompted_with_earlier_meals():
+    llm = ExclusionCapturingLLM()
+    stats = GenerationStats()
+    weekly_plan = make_planner(llm, steer_variety=True).generate_weekly_meal_plan(make_profile(), stats=stats,
+                                                                                 use_cache=False)
+
+    assert llm.calls == stats.llm_calls == 7
+    for wave_index, wave in enumerate(WAVES):
+        earlier = {meal.name for previous in WAVES[:wave_index] for day in previous
+                   for meal in weekly_plan.daily_plans[day].meals}
+        for day in wave:
+            assert set(llm.avoided[day]) == earlier
+
+
+@pytest.mark.parametrize("steer_variety", [False, True])
+def test_streamed_days_are_final(steer_variety):
+    planner = make_planner(ExclusionCapturingLLM(), steer_variety=steer_variety)
+    stream = planner.stream_weekly_meal_plan(make_profile(), use_cache=False)
+    streamed = dict(stream)
+    assert [streamed[day] for day in range(7)] == stream.plan.daily_plans
+
+
+@pytest.mark.parametrize("steer_variety", [False, True])
+@pytest.mark.parametrize("max_concurrency", [1, 7])
+def test_no_extra_calls_for_repeats(max_concurrency, steer_variety):
+    # Every day comes back identical, and the repeats are counted rather than regenerated
+    llm = StubLLM(respond=lambda prompt, rng: synthetic_response(prompt, random.Random(0)))
+    stats = GenerationStats()
+    make_planner(llm, steer_variety=steer_variety).generate_weekly_meal_plan(
+        make_profile(), max_concurrency=max_concurrency, stats=stats, use_cache=False)
+    assert llm.calls == 7
+    assert stats.repeated_meals == 6 * 3
+
+
+@pytest.mark.parametrize("steer_variety, rounds", [(False, 1), (True, 3)])
+def test_round_count(steer_variety, rounds):
+    llm = RoundCountingLLM()
+    make_planner(llm, steer_variety=steer_variety).generate_weekly_meal_plan(make_profile(), use_cache=False)
+    assert llm.calls == 7
+    assert llm.rounds == rounds
+
+
+def test_unsteered_days_start_without_exclusions():
+    llm = ExclusionCapturingLLM()
+    make_planner(llm).generate_weekly_meal_plan(make_profile(), use_cache=False)
+    assert llm.calls == 7
+    assert all(avoided == [] for avoided in llm.avoided.values())
+
+
+def test_repeat_count_is_independent_of_steering():
+    stats = GenerationStats()
+    llm = StubLLM(respond=lambda prompt, rng: synthetic_response(prompt, random.Random(0)))
+    make_planner(llm, steer_variety=True, variety_threshold=None).generate_weekly_meal_plan(
+        make_profile(), stats=stats, use_cache=False)
+    assert stats.repeated_meals == 0